@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of the CPU time botocore spends per request, with and without the trusted input client profile
+
+The HTTP round trip is replaced by a canned response, so the measured time is spent serializing, validating,
+signing and parsing the request in botocore, plus the work of dispatch itself.
+
+    python -m benchmarks.client --calls 20000
+"""
+import argparse
+import asyncio
+import binascii
+import time
+from unittest import mock
+
+from inpynamodb.connection import client_registry
+from inpynamodb.connection.base import AsyncConnection
+
+PATCH_METHOD = 'aiobotocore.endpoint.AioEndpoint._request'
+
+OPERATION_KWARGS = {
+    'TableName': 'Thread',
+    'Key': {'ForumName': {'S': 'forum'}, 'Subject': {'S': 'subject'}},
+    'ProjectionExpression': '#0, #1, #2',
+    'ExpressionAttributeNames': {'#0': 'ForumName', '#1': 'Subject', '#2': 'Views'},
+}
+
+BODY = (
+    b'{"Item": {"ForumName": {"S": "forum"}, "Subject": {"S": "subject"}, "Views": {"N": "1"}}, '
+    b'"ConsumedCapacity": {"TableName": "Thread", "CapacityUnits": 0.5}}'
+)
+
+
+class CannedResponse(object):
+    status_code = 200
+    raw_headers = [(b'content-type', b'application/x-amz-json-1.0')]
+    headers = {'x-amz-crc32': str(binascii.crc32(BODY))}
+    content = BODY
+
+    async def read(self):
+        return BODY
+
+
+async def fake_request(endpoint, method, url, headers, data, verify, stream):
+    return CannedResponse()
+
+
+async def measure(connection, calls):
+    """
+    Returns the mean CPU time of a GetItem request, in seconds
+    """
+    await connection.dispatch('GetItem', dict(OPERATION_KWARGS))
+    started_at = time.process_time()
+    for _ in range(calls):
+        await connection.dispatch('GetItem', dict(OPERATION_KWARGS))
+    return (time.process_time() - started_at) / calls
+
+
+async def run(calls, repeat):
+    results = {}
+    for trusted_input in (False, True):
+        connection = AsyncConnection(
+            region='us-east-1', aws_access_key_id='key', aws_secret_access_key='secret', lean_dispatch=True,
+            trusted_input=trusted_input
+        )
+        results[trusted_input] = min([await measure(connection, calls) for _ in range(repeat)])
+    await client_registry.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with mock.patch(PATCH_METHOD, new=fake_request):
+        results = asyncio.get_event_loop().run_until_complete(run(args.calls, args.repeat))
+
+    default, trusted = results[False], results[True]
+    print('default client:       {:.2f} us/request'.format(default * 1e6))
+    print('trusted input client: {:.2f} us/request'.format(trusted * 1e6))
+    print('saved:                {:.2f} us/request ({:.0%})'.format(
+        (default - trusted) * 1e6, (default - trusted) / default
+    ))
+    print('at 1000 requests/s:   {:.0f} ms of CPU saved per second'.format((default - trusted) * 1000 * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark of aggregating scanned attributes from columns, against aggregating them from models
+
+The scan reads a string, a number and a boolean attribute of each item. The Scan call is replaced by a coroutine
+returning canned pages holding only these attributes, as DynamoDB returns them with a projection, so only the
+work done on the client is measured. The aggregate is the sum of the number attribute over the active items,
+computed with NumPy when it is installed.
+
+    python -m benchmarks.columns --pages 100
+"""
+import argparse
+import asyncio
+import time
+from unittest import mock
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute
+
+from inpynamodb.connection import client_registry
+from inpynamodb.models import Model
+
+PATCH_METHOD = 'aiobotocore.client.AioBaseClient._make_api_call'
+
+PAGE_SIZE = 1000
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class EventModel(Model):
+    class Meta:
+        table_name = 'Events'
+        local_meta_table = True
+        region = 'us-east-1'
+        aws_access_key_id = 'key'
+        aws_secret_access_key = 'secret'
+
+    user_id = UnicodeAttribute(hash_key=True)
+    amount = NumberAttribute(null=True)
+    active = BooleanAttribute(null=True)
+
+
+def get_page(index, pages):
+    items = [
+        {
+            'user_id': {'S': 'user-{}-{}'.format(index, offset)},
+            'amount': {'N': str(offset * 7 % 1000)},
+            'active': {'BOOL': bool(offset % 3)},
+        }
+        for offset in range(PAGE_SIZE)
+    ]
+    page = {'Items': items, 'Count': len(items), 'ScannedCount': len(items)}
+    if index + 1 < pages:
+        page['LastEvaluatedKey'] = {'user_id': {'S': 'user-{}'.format(index)}}
+    return page
+
+
+async def sum_from_models():
+    total = 0
+    async for events in (await EventModel.scan()).pages():
+        total += sum(event.amount for event in events if event.active)
+    return total
+
+
+async def sum_from_columns():
+    batch = await EventModel.scan_columns(['user_id', 'amount', 'active'])
+    if numpy is not None:
+        arrays = batch.to_numpy()
+        return float(arrays['amount'][arrays['active'] == 1].sum())
+    return sum(amount for amount, active in zip(batch['amount'], batch['active']) if active == 1)
+
+
+async def measure(aggregate, pages, repeat):
+    """
+    Returns the least time per item of scanning the pages and aggregating them, and the aggregate
+    """
+    canned_pages = [get_page(index, pages) for index in range(pages)]
+    seconds = []
+    for _ in range(repeat):
+        responses = iter(canned_pages)
+
+        async def fake_api_call(client, operation_name, operation_kwargs):
+            return next(responses)
+
+        with mock.patch(PATCH_METHOD, new=fake_api_call):
+            started_at = time.process_time()
+            total = await aggregate()
+            seconds.append(time.process_time() - started_at)
+    return min(seconds) / (pages * PAGE_SIZE), total
+
+
+async def run(pages, repeat):
+    results = {}
+    for name, aggregate in (('models', sum_from_models), ('columns', sum_from_columns)):
+        results[name] = await measure(aggregate, pages, repeat)
+    await client_registry.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(run(args.pages, args.repeat))
+    (models, models_total), (columns, columns_total) = results['models'], results['columns']
+    assert models_total == columns_total
+    print('models:  {:.2f} us/item'.format(models * 1e6))
+    print('columns: {:.2f} us/item ({})'.format(columns * 1e6, 'numpy' if numpy is not None else 'no numpy'))
+    print('{:.1f}x faster'.format(models / columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the per-call overhead of AsyncConnection.dispatch, with and without lean_dispatch
+
+The botocore call is replaced by a coroutine returning a canned response, so only the work done by
+dispatch itself is measured.
+
+    python -m benchmarks.dispatch --calls 100000
+"""
+import argparse
+import asyncio
+import time
+from unittest import mock
+
+from inpynamodb.connection import client_registry
+from inpynamodb.connection.base import AsyncConnection
+
+PATCH_METHOD = 'aiobotocore.client.AioBaseClient._make_api_call'
+
+OPERATION_KWARGS = {
+    'TableName': 'Thread',
+    'Key': {'ForumName': {'S': 'forum'}, 'Subject': {'S': 'subject'}},
+}
+
+RESPONSE = {
+    'Item': {'ForumName': {'S': 'forum'}, 'Subject': {'S': 'subject'}, 'Views': {'N': '1'}},
+    'ConsumedCapacity': {'TableName': 'Thread', 'CapacityUnits': 0.5},
+}
+
+
+async def fake_api_call(client, operation_name, operation_kwargs):
+    return RESPONSE
+
+
+async def measure(connection, calls):
+    """
+    Returns the mean time of a GetItem dispatch, in seconds
+    """
+    await connection.client
+    started_at = time.perf_counter()
+    for _ in range(calls):
+        await connection.dispatch('GetItem', dict(OPERATION_KWARGS))
+    return (time.perf_counter() - started_at) / calls
+
+
+async def run(calls, repeat):
+    results = {}
+    for lean_dispatch in (False, True):
+        connection = AsyncConnection(
+            region='us-east-1', aws_access_key_id='key', aws_secret_access_key='secret', lean_dispatch=lean_dispatch
+        )
+        results[lean_dispatch] = min([await measure(connection, calls) for _ in range(repeat)])
+    await client_registry.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with mock.patch(PATCH_METHOD, new=fake_api_call):
+        results = asyncio.get_event_loop().run_until_complete(run(args.calls, args.repeat))
+
+    default, lean = results[False], results[True]
+    print('default dispatch: {:.2f} us/call'.format(default * 1e6))
+    print('lean dispatch:    {:.2f} us/call'.format(lean * 1e6))
+    print('saved:            {:.2f} us/call ({:.0%})'.format((default - lean) * 1e6, (default - lean) / default))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark of building models from wide items, with and without lazy attributes
+
+Each item has 40 attributes: strings, numbers, dates, binary blobs, maps and lists. The consumer reads two of them,
+as a scan computing an aggregate would. CPU time is measured per item, and memory as the allocations made to build
+and hold all of the models at once.
+
+    python -m benchmarks.lazy --items 20000
+"""
+import argparse
+import base64
+import time
+import tracemalloc
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BinaryAttribute, UTCDateTimeAttribute, \
+    MapAttribute, ListAttribute
+
+from inpynamodb.models import Model
+
+WIDTH = 8
+
+
+class Address(MapAttribute):
+    street = UnicodeAttribute()
+    city = UnicodeAttribute()
+    zip_code = UnicodeAttribute()
+    lat = NumberAttribute()
+    lng = NumberAttribute()
+
+
+def get_attributes():
+    attributes = {'user_id': UnicodeAttribute(hash_key=True)}
+    for index in range(WIDTH):
+        attributes['name_{}'.format(index)] = UnicodeAttribute(null=True)
+        attributes['count_{}'.format(index)] = NumberAttribute(null=True)
+        attributes['updated_at_{}'.format(index)] = UTCDateTimeAttribute(null=True)
+        attributes['blob_{}'.format(index)] = BinaryAttribute(null=True)
+        attributes['address_{}'.format(index)] = Address(null=True)
+    attributes['history'] = ListAttribute(null=True)
+    return attributes
+
+
+def get_model(lazy_attributes):
+    meta = type('Meta', (), {'table_name': 'Wide', 'local_meta_table': True, 'lazy_attributes': lazy_attributes})
+    return type('WideModel', (Model,), dict(get_attributes(), Meta=meta))
+
+
+def get_item(index):
+    item = {'user_id': {'S': 'user-{}'.format(index)}}
+    for width in range(WIDTH):
+        item['name_{}'.format(width)] = {'S': 'name {} of user {}'.format(width, index)}
+        item['count_{}'.format(width)] = {'N': str(index * width)}
+        item['updated_at_{}'.format(width)] = {'S': '2020-01-02T03:04:05.000000+0000'}
+        item['blob_{}'.format(width)] = {'B': base64.b64encode(bytes(range(256)) * 4).decode()}
+        item['address_{}'.format(width)] = {'M': {
+            'street': {'S': '{} Main Street'.format(index)},
+            'city': {'S': 'Seoul'},
+            'zip_code': {'S': '04524'},
+            'lat': {'N': '37.5665'},
+            'lng': {'N': '126.978'},
+        }}
+    item['history'] = {'L': [{'M': {'event': {'S': 'login'}, 'at': {'N': str(n)}}} for n in range(20)]}
+    return item
+
+
+def consume(model, items):
+    """
+    Builds a model per item and reads two attributes, as an aggregating scan would
+    """
+    models = [model.from_raw_data(item) for item in items]
+    total = sum(item.count_0 for item in models)
+    return models, total
+
+
+def measure(model, items, repeat):
+    seconds = []
+    for _ in range(repeat):
+        started_at = time.process_time()
+        consume(model, items)
+        seconds.append(time.process_time() - started_at)
+    tracemalloc.start()
+    models, _ = consume(model, items)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del models
+    return min(seconds) / len(items), memory / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    items = [get_item(index) for index in range(args.items)]
+    eager_seconds, eager_memory = measure(get_model(False), items, args.repeat)
+    lazy_seconds, lazy_memory = measure(get_model(True), items, args.repeat)
+
+    print('eager: {:.2f} us/item, {:.0f} bytes/item'.format(eager_seconds * 1e6, eager_memory))
+    print('lazy:  {:.2f} us/item, {:.0f} bytes/item'.format(lazy_seconds * 1e6, lazy_memory))
+    print('cpu saved:    {:.0%}'.format((eager_seconds - lazy_seconds) / eager_seconds))
+    print('memory saved: {:.0%}, not counting the raw items, which the lazy models keep alive'.format(
+        (eager_memory - lazy_memory) / eager_memory
+    ))
+
+
+if __name__ == '__main__':
+    main()
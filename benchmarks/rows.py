@@ -0,0 +1,77 @@
+"""
+Benchmark of the memory taken by items held as models and as read-only rows
+
+The items have 20 attributes of the types an analytics scan typically reads: short strings, numbers and booleans.
+Memory is measured as the allocations made to build and hold all of the items at once.
+
+    python -m benchmarks.rows --items 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute
+
+from inpynamodb.models import Model
+from inpynamodb.rows import get_row_class
+
+
+def get_attributes():
+    attributes = {'user_id': UnicodeAttribute(hash_key=True)}
+    for index in range(6):
+        attributes['category_{}'.format(index)] = UnicodeAttribute(null=True)
+    for index in range(10):
+        attributes['count_{}'.format(index)] = NumberAttribute(null=True)
+    for index in range(3):
+        attributes['flag_{}'.format(index)] = BooleanAttribute(null=True)
+    return attributes
+
+
+Meta = type('Meta', (), {'table_name': 'Events'})
+EventModel = type('EventModel', (Model,), dict(get_attributes(), Meta=Meta))
+
+
+def get_item(index):
+    item = {'user_id': {'S': 'user-{}'.format(index)}}
+    for width in range(6):
+        item['category_{}'.format(width)] = {'S': 'category-{}'.format(width)}
+    for width in range(10):
+        item['count_{}'.format(width)] = {'N': str(width)}
+    for width in range(3):
+        item['flag_{}'.format(width)] = {'BOOL': bool(width % 2)}
+    return item
+
+
+def measure(from_raw_data, items):
+    """
+    Returns the CPU time and the memory per item of building and holding all of the items
+    """
+    started_at = time.process_time()
+    tracemalloc.start()
+    held = [from_raw_data(item) for item in items]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    seconds = time.process_time() - started_at
+    del held
+    return seconds / len(items), memory / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--items', type=int, default=50000)
+    args = parser.parse_args()
+
+    items = [get_item(index) for index in range(args.items)]
+    # builds the generated functions before measuring
+    EventModel.from_raw_data(items[0])
+    row_class = get_row_class(EventModel)
+
+    model_seconds, model_memory = measure(EventModel.from_raw_data, items)
+    row_seconds, row_memory = measure(row_class.from_raw_data, items)
+    print('models: {:.0f} bytes/item, {:.2f} us/item'.format(model_memory, model_seconds * 1e6))
+    print('rows:   {:.0f} bytes/item, {:.2f} us/item'.format(row_memory, row_seconds * 1e6))
+    print('memory: {:.1f}x less'.format(model_memory / row_memory))
+
+
+if __name__ == '__main__':
+    main()
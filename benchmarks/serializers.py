@@ -0,0 +1,99 @@
+"""
+Benchmark of the serialize and deserialize functions generated per Model class, against the generic Model methods
+
+The model has 30 attributes: strings, numbers, booleans, dates, a set, a map and a list.
+
+    python -m benchmarks.serializers --items 20000
+"""
+import argparse
+import time
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute, UTCDateTimeAttribute, \
+    UnicodeSetAttribute, MapAttribute, ListAttribute
+from pynamodb.models import Model as PynamoDBModel
+
+from inpynamodb.models import Model
+
+
+class Address(MapAttribute):
+    street = UnicodeAttribute()
+    city = UnicodeAttribute()
+
+
+def get_attributes():
+    attributes = {'user_id': UnicodeAttribute(hash_key=True), 'created_at': NumberAttribute(range_key=True)}
+    for index in range(10):
+        attributes['name_{}'.format(index)] = UnicodeAttribute(null=True)
+    for index in range(9):
+        attributes['count_{}'.format(index)] = NumberAttribute(default=0)
+    for index in range(4):
+        attributes['flag_{}'.format(index)] = BooleanAttribute(null=True)
+    attributes['updated_at'] = UTCDateTimeAttribute(null=True)
+    attributes['tags'] = UnicodeSetAttribute(null=True)
+    attributes['address'] = Address(null=True)
+    attributes['history'] = ListAttribute(null=True)
+    return attributes
+
+
+Meta = type('Meta', (), {'table_name': 'Wide'})
+WideModel = type('WideModel', (Model,), dict(get_attributes(), Meta=Meta))
+
+
+def get_item(index):
+    item = {'user_id': {'S': 'user-{}'.format(index)}, 'created_at': {'N': str(index)}}
+    for width in range(10):
+        item['name_{}'.format(width)] = {'S': 'name {} of user {}'.format(width, index)}
+    for width in range(9):
+        item['count_{}'.format(width)] = {'N': str(index * width)}
+    for width in range(4):
+        item['flag_{}'.format(width)] = {'BOOL': bool(width % 2)}
+    item['updated_at'] = {'S': '2020-01-02T03:04:05.000000+0000'}
+    item['tags'] = {'SS': ['a', 'b', 'c']}
+    item['address'] = {'M': {'street': {'S': '{} Main Street'.format(index)}, 'city': {'S': 'Seoul'}}}
+    item['history'] = {'L': [{'S': 'login'}, {'N': str(index)}]}
+    return item
+
+
+def measure(function, values, repeat):
+    """
+    Returns the least CPU time per value of calling `function` on every value
+    """
+    seconds = []
+    for _ in range(repeat):
+        started_at = time.process_time()
+        for value in values:
+            function(value)
+        seconds.append(time.process_time() - started_at)
+    return min(seconds) / len(values)
+
+
+def report(name, generic, compiled):
+    print('{}: generic {:.2f} us/item, generated {:.2f} us/item, {:.1f}x faster'.format(
+        name, generic * 1e6, compiled * 1e6, generic / compiled
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    items = [get_item(index) for index in range(args.items)]
+    generic_from_raw_data = PynamoDBModel.from_raw_data.__func__
+    report(
+        'deserialize',
+        measure(lambda item: generic_from_raw_data(WideModel, item), items, args.repeat),
+        measure(WideModel.from_raw_data, items, args.repeat),
+    )
+
+    models = [WideModel.from_raw_data(item) for item in items]
+    report(
+        'serialize  ',
+        measure(lambda model: PynamoDBModel._serialize(model, attr_map=True), models, args.repeat),
+        measure(lambda model: model._serialize(attr_map=True), models, args.repeat),
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Attribute value storage of the models built from DynamoDB items
+"""
+from collections.abc import Mapping
+
+from pynamodb.attributes import MapAttribute
+
+
+class LazyAttributeValues(dict):
+    """
+    The `attribute_values` of a model whose attributes are deserialized when they are first accessed
+
+    It holds the raw DynamoDB values of the attributes which were not accessed yet. Reading an attribute
+    deserializes and stores its value, setting it discards the raw value. Iterating over the values, as
+    serializing the model does, deserializes every one of them first.
+    """
+    __slots__ = ('_raw_values', '_attributes')
+
+    def __init__(self, raw_values, attributes):
+        """
+        :param raw_values: The raw DynamoDB values, by python attribute name
+        :param attributes: The attributes of the model, by python attribute name
+        """
+        super(LazyAttributeValues, self).__init__()
+        self._raw_values = raw_values
+        self._attributes = attributes
+
+    def _load(self, name):
+        attr = self._attributes[name]
+        value = attr.deserialize(attr.get_value(self._raw_values.pop(name)))
+        if isinstance(attr, MapAttribute) and isinstance(value, Mapping):
+            # as MapAttribute.__set__ stores the dict deserialized by a raw MapAttribute
+            value = type(attr)(**value)
+        dict.__setitem__(self, name, value)
+
+    def _load_all(self):
+        for name in list(self._raw_values):
+            self._load(name)
+
+    def __getitem__(self, name):
+        if name in self._raw_values:
+            self._load(name)
+        return dict.__getitem__(self, name)
+
+    def get(self, name, default=None):
+        if name in self._raw_values:
+            self._load(name)
+        return dict.get(self, name, default)
+
+    def __setitem__(self, name, value):
+        self._raw_values.pop(name, None)
+        dict.__setitem__(self, name, value)
+
+    def __delitem__(self, name):
+        if name in self._raw_values:
+            del self._raw_values[name]
+        else:
+            dict.__delitem__(self, name)
+
+    def __contains__(self, name):
+        return name in self._raw_values or dict.__contains__(self, name)
+
+    def __len__(self):
+        return len(self._raw_values) + dict.__len__(self)
+
+    def __iter__(self):
+        self._load_all()
+        return dict.__iter__(self)
+
+    def __eq__(self, other):
+        self._load_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self._load_all()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        # copies and pickles are plain dicts
+        self._load_all()
+        return dict, (dict(self),)
+
+    def keys(self):
+        self._load_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._load_all()
+        return dict.values(self)
+
+    def items(self):
+        self._load_all()
+        return dict.items(self)
+
+    def copy(self):
+        self._load_all()
+        return dict(self)
+
+    def pop(self, name, *default):
+        if name in self._raw_values:
+            self._load(name)
+        return dict.pop(self, name, *default)
+
+    def popitem(self):
+        self._load_all()
+        return dict.popitem(self)
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, value in dict(*args, **kwargs).items():
+            self[name] = value
+
+    def clear(self):
+        self._raw_values.clear()
+        dict.clear(self)
@@ -0,0 +1,205 @@
+"""
+In-process caches of DynamoDB items
+"""
+import base64
+import collections
+import copy
+import json
+import time
+
+
+def encode_binary(value):
+    """
+    Encodes the binary values of a raw item as base64, as they are sent to DynamoDB
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+def get_size(value):
+    """
+    Returns the size of a raw item, or of a page of them, serialized as JSON
+    """
+    return len(json.dumps(value, default=encode_binary))
+
+
+def freeze(value):
+    """
+    Returns a hashable form of a raw attribute value, or of a map of them, with the maps as sorted tuples
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def get_condition_key(*conditions):
+    """
+    Returns a hashable key of the conditions of a request, made of their expressions as serialized for the request
+    with their ExpressionAttributeNames and ExpressionAttributeValues
+
+    Conditions which are None are keyed as None.
+    """
+    name_placeholders = {}
+    expression_attribute_values = {}
+    expressions = tuple(
+        condition.serialize(name_placeholders, expression_attribute_values) if condition is not None else None
+        for condition in conditions
+    )
+    expression_attribute_names = {placeholder: name for name, placeholder in name_placeholders.items()}
+    return expressions, freeze(expression_attribute_names), freeze(expression_attribute_values)
+
+
+class ItemCache(object):
+    """
+    A read-through cache of raw item attribute maps, bounded in size and age
+
+    Entries expire `ttl_seconds` after they were stored, and the least recently used entries are evicted
+    once there are more than `max_items` entries or, if set, more than `max_bytes` of serialized items.
+
+    Example:
+        class Thread(Model):
+            class Meta:
+                table_name = 'Thread'
+                item_cache = ItemCache(max_items=10000, ttl_seconds=30)
+
+        Hits, misses and evictions are counted in
+            Thread.Meta.item_cache.stats
+    """
+    def __init__(self, max_items=1000, max_bytes=None, ttl_seconds=60, time_module=None):
+        """
+        :param max_items: The number of entries kept
+        :param max_bytes: Optional: the total size of the entries kept, measured as serialized JSON
+        :param ttl_seconds: The time an entry is used for
+        :param time_module: Optional: the module responsible for calculating time. Intended to be used for testing.
+        """
+        if max_items is not None and max_items < 1:
+            raise ValueError("max_items must be greater than zero")
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be greater than zero")
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._time_module = time_module or time
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self.generation = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key):
+        """
+        Returns the cached value of `key`, or None
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at, size = entry
+            if expires_at > self._time_module.monotonic():
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return value
+            self._remove(key)
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, key, value, generation=None):
+        """
+        Caches `value` for `key`
+
+        :param generation: Optional: the `generation` read before `value` was fetched. The value is not
+            cached if an entry was invalidated since, as it may have been fetched before a local write.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        if key in self._entries:
+            self._remove(key)
+        size = get_size(value) if self.max_bytes is not None else 0
+        self._entries[key] = (value, self._time_module.monotonic() + self.ttl_seconds, size)
+        self._size += size
+        while (self.max_items is not None and len(self._entries) > self.max_items) or \
+                (self.max_bytes is not None and self._size > self.max_bytes and self._entries):
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def invalidate(self, key):
+        """
+        Forgets the entry of `key`, after a local write to that item
+        """
+        self.generation += 1
+        if key in self._entries:
+            self._remove(key)
+            self.stats['invalidations'] += 1
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._size = 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class QueryCache(ItemCache):
+    """
+    A cache of Query result pages, bounded in size and age
+
+    Keys are tuples whose first element is the (index name, serialized hash key) queried, so that every
+    page of a hash key can be forgotten at once when this process writes an item under it.
+    Pages are copied when they are stored and when they are returned, so that consumers of raw pages
+    may modify them without changing the cached pages.
+
+    Example:
+        class Thread(Model):
+            class Meta:
+                table_name = 'Thread'
+                query_cache = QueryCache(max_items=1000, ttl_seconds=1)
+    """
+    def __init__(self, max_items=1000, max_bytes=None, ttl_seconds=60, invalidate_on_write=True, time_module=None):
+        """
+        :param invalidate_on_write: If True, writes of this process forget the pages of the hash keys they write to
+        """
+        super(QueryCache, self).__init__(
+            max_items=max_items, max_bytes=max_bytes, ttl_seconds=ttl_seconds, time_module=time_module
+        )
+        self.invalidate_on_write = invalidate_on_write
+        self._keys_by_hash_key = {}
+
+    def get(self, key):
+        page = super(QueryCache, self).get(key)
+        return copy.deepcopy(page) if page is not None else None
+
+    def set(self, key, value, generation=None):
+        if generation is not None and generation != self.generation:
+            return
+        super(QueryCache, self).set(key, copy.deepcopy(value), generation=generation)
+        if key in self._entries:
+            self._keys_by_hash_key.setdefault(key[0], set()).add(key)
+
+    def invalidate_hash_key(self, hash_key):
+        """
+        Forgets every page queried for `hash_key`
+
+        :param hash_key: The (index name, serialized hash key) tuple, with None as the index name of the table
+        """
+        self.generation += 1
+        for key in self._keys_by_hash_key.pop(hash_key, ()):
+            if key in self._entries:
+                super(QueryCache, self)._remove(key)
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        super(QueryCache, self).clear()
+        self._keys_by_hash_key.clear()
+
+    def _remove(self, key):
+        super(QueryCache, self)._remove(key)
+        keys = self._keys_by_hash_key.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_hash_key[key[0]]
@@ -0,0 +1,155 @@
+"""
+Accounting of the capacity consumed within a scope of code, such as an API request handler
+"""
+try:
+    import contextvars
+except ImportError:  # Python 3.6
+    # makes asyncio tasks inherit the context of the code which creates them, then provides the backport
+    import aiocontextvars  # noqa: F401
+    import contextvars
+
+from pynamodb.constants import CONSUMED_CAPACITY, CAPACITY_UNITS, TABLE_NAME, GLOBAL_SECONDARY_INDEXES, \
+    LOCAL_SECONDARY_INDEXES, GET_ITEM, BATCH_GET_ITEM, QUERY, SCAN, TRANSACT_GET_ITEMS, PUT_ITEM, UPDATE_ITEM, \
+    DELETE_ITEM, BATCH_WRITE_ITEM, TRANSACT_WRITE_ITEMS
+
+from inpynamodb.exceptions import CapacityBudgetExceededError
+from inpynamodb.pagination import READ, WRITE, RateLimiter
+
+# The operations which consume read and write capacity, shared by the connection's rate limiting and metrics
+READ_OPERATIONS = frozenset([GET_ITEM, BATCH_GET_ITEM, QUERY, SCAN, TRANSACT_GET_ITEMS])
+WRITE_OPERATIONS = frozenset([PUT_ITEM, UPDATE_ITEM, DELETE_ITEM, BATCH_WRITE_ITEM, TRANSACT_WRITE_ITEMS])
+
+_current_scope = contextvars.ContextVar('inpynamodb_capacity_scope', default=None)
+
+
+def get_capacity_type(operation_name):
+    """
+    Returns READ or WRITE for the operations which consume capacity, None for any other
+    """
+    if operation_name in READ_OPERATIONS:
+        return READ
+    if operation_name in WRITE_OPERATIONS:
+        return WRITE
+    return None
+
+
+def get_capacity_scope():
+    """
+    Returns the innermost CapacityScope of the running code, or None
+    """
+    return _current_scope.get()
+
+
+class CapacityScope(object):
+    """
+    Collects the capacity consumed by every request sent within it, per table and index
+
+    The scope follows the code through the asyncio tasks it creates, so batch operations, prefetched pages
+    and parallel scans are accounted for. Scopes can be nested, each one accounting for its own requests
+    and every enclosing scope for the requests of the scopes it contains.
+
+    Once a budget is consumed, the following requests of that capacity type raise CapacityBudgetExceededError,
+    or, with `over_budget_rate_limit`, are slowed down to that many units per second.
+
+    Example:
+        with CapacityScope(read_budget=100) as scope:
+            async for thread in await Thread.query('forum'):
+                ...
+
+        scope.read_capacity_units, scope.tables['Thread'], scope.indexes[('Thread', 'email_index')]
+    """
+    def __init__(self, read_budget=None, write_budget=None, over_budget_rate_limit=None):
+        """
+        :param read_budget: Optional: the read capacity units the requests of the scope may consume
+        :param write_budget: Optional: the write capacity units the requests of the scope may consume
+        :param over_budget_rate_limit: Optional: the rate in units per second requests are slowed down to once
+            a budget is consumed, instead of raising
+        """
+        self.read_budget = read_budget
+        self.write_budget = write_budget
+        self.over_budget_rate_limit = over_budget_rate_limit
+        self.read_capacity_units = 0
+        self.write_capacity_units = 0
+        self.tables = {}
+        self.indexes = {}
+        self._rate_limiters = {}
+        self._parent = None
+        self._token = None
+
+    def __enter__(self):
+        self._parent = _current_scope.get()
+        self._token = _current_scope.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_scope.reset(self._token)
+        self._token = None
+
+    def _get_consumed(self, capacity_type):
+        if capacity_type == READ:
+            return self.read_capacity_units, self.read_budget
+        return self.write_capacity_units, self.write_budget
+
+    async def acquire(self, operation_name):
+        """
+        Raises or waits if this scope or an enclosing one is over its budget for the capacity type of the operation
+        """
+        capacity_type = get_capacity_type(operation_name)
+        if capacity_type is None:
+            return
+        scope = self
+        while scope is not None:
+            consumed, budget = scope._get_consumed(capacity_type)
+            if budget is not None and consumed >= budget:
+                if scope.over_budget_rate_limit is None:
+                    raise CapacityBudgetExceededError(
+                        "The {} capacity budget of {} units is consumed".format(capacity_type, budget),
+                        capacity_type=capacity_type,
+                        budget=budget,
+                        consumed=consumed,
+                    )
+                await scope._get_rate_limiter(capacity_type).acquire()
+            scope = scope._parent
+
+    def consume(self, operation_name, data):
+        """
+        Adds the ConsumedCapacity of a response to this scope and every enclosing one
+        """
+        capacity_type = get_capacity_type(operation_name)
+        capacity = data.get(CONSUMED_CAPACITY) if data else None
+        if capacity_type is None or not capacity:
+            return
+        if isinstance(capacity, dict):
+            capacity = [capacity]
+        scope = self
+        while scope is not None:
+            for table_capacity in capacity:
+                scope._add(capacity_type, table_capacity)
+            scope = scope._parent
+
+    def _add(self, capacity_type, table_capacity):
+        table_name = table_capacity.get(TABLE_NAME, '')
+        units = table_capacity.get(CAPACITY_UNITS, 0)
+        key = 'read_capacity_units' if capacity_type == READ else 'write_capacity_units'
+        if capacity_type == READ:
+            self.read_capacity_units += units
+        else:
+            self.write_capacity_units += units
+        table = self.tables.setdefault(table_name, {'read_capacity_units': 0, 'write_capacity_units': 0})
+        table[key] += units
+        for indexes_key in (GLOBAL_SECONDARY_INDEXES, LOCAL_SECONDARY_INDEXES):
+            for index_name, index_capacity in (table_capacity.get(indexes_key) or {}).items():
+                index = self.indexes.setdefault(
+                    (table_name, index_name), {'read_capacity_units': 0, 'write_capacity_units': 0}
+                )
+                index[key] += index_capacity.get(CAPACITY_UNITS, 0)
+
+        consumed, budget = self._get_consumed(capacity_type)
+        if budget is not None and consumed >= budget and self.over_budget_rate_limit is not None:
+            self._get_rate_limiter(capacity_type).consume(units)
+
+    def _get_rate_limiter(self, capacity_type):
+        rate_limiter = self._rate_limiters.get(capacity_type)
+        if rate_limiter is None:
+            rate_limiter = self._rate_limiters[capacity_type] = RateLimiter(self.over_budget_rate_limit)
+        return rate_limiter
@@ -0,0 +1,116 @@
+"""
+Coalescing of concurrent Model.get calls into BatchGetItem requests
+"""
+import asyncio
+import logging
+
+from pynamodb.constants import BATCH_GET_PAGE_LIMIT
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class GetCoalescer(object):
+    """
+    Groups the `get` calls of a model which arrive within `window` seconds into BatchGetItem requests
+
+    Calls are only grouped with calls of the same `consistent_read` and `attributes_to_get`.
+    A batch is sent when the window ends or when it holds 100 keys, whichever comes first.
+    Concurrent calls for the same key share one entry of the batch.
+
+    Example:
+        coalescer = GetCoalescer(Thread, window=0.002)
+
+        The raw attribute map of the item, or None if it does not exist
+            item_data = await coalescer.get(hash_key, range_key)
+    """
+    def __init__(self, model, window=0):
+        """
+        :param model: The Model class whose items are loaded
+        :param window: The time to wait for more calls before sending a batch, 0 waits for one event loop tick
+        """
+        if window < 0:
+            raise ValueError("window must not be negative")
+        self._model = model
+        self._window = window
+        self._batches = {}
+        # the tasks sending batches, referenced until they are done
+        self._sends = set()
+
+    async def get(self, hash_key, range_key=None, consistent_read=False, attributes_to_get=None):
+        """
+        Returns the raw attribute map of an item, or None if it does not exist
+
+        :param hash_key: The serialized hash key
+        :param range_key: The serialized range key, if the table has one
+        """
+        loop = asyncio.get_event_loop()
+        if attributes_to_get is not None:
+            attributes_to_get = tuple(attributes_to_get)
+        batch_key = (loop, bool(consistent_read), attributes_to_get)
+        batch = self._batches.get(batch_key)
+        if batch is None:
+            batch = self._batches[batch_key] = {}
+            self._start(self._send_later(batch_key, batch))
+
+        # numbers serialized differently, such as '1' and '1.0', are the same key
+        item_key = self._model._normalize_item_key(hash_key, range_key)
+        entry = batch.get(item_key)
+        if entry is not None:
+            future = entry[1]
+        else:
+            future = loop.create_future()
+            batch[item_key] = ((hash_key, range_key), future)
+            if len(batch) == BATCH_GET_PAGE_LIMIT:
+                del self._batches[batch_key]
+                self._start(self._send(batch_key, batch))
+        return await asyncio.shield(future)
+
+    def _start(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def _send_later(self, batch_key, batch):
+        await asyncio.sleep(self._window)
+        if self._batches.get(batch_key) is batch:
+            del self._batches[batch_key]
+            await self._send(batch_key, batch)
+
+    async def _send(self, batch_key, batch):
+        """
+        Loads the items of `batch` and resolves the future of every key
+        """
+        _, consistent_read, attributes_to_get = batch_key
+        model = self._model
+        hash_key_attribute = model._hash_key_attribute()
+        range_key_attribute = model._range_key_attribute()
+        if attributes_to_get is not None:
+            # the keys are needed to tell which item answers which call
+            attributes_to_get = list(attributes_to_get) + [
+                name for name in model._get_key_attr_names() if name not in attributes_to_get
+            ]
+
+        keys = []
+        for (hash_key, range_key), _ in batch.values():
+            key = {hash_key_attribute.attr_name: hash_key}
+            if range_key_attribute:
+                key[range_key_attribute.attr_name] = range_key
+            keys.append(key)
+
+        log.debug("Coalescing %s get calls of %s into a BatchGetItem request", len(keys), model)
+        try:
+            async for item_data in model._batch_get_raw(keys, consistent_read, attributes_to_get):
+                entry = batch.pop(model._normalize_item_key(*model._get_raw_item_key(item_data)), None)
+                if entry is not None and not entry[1].done():
+                    entry[1].set_result(item_data)
+        except Exception as e:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # mark the exception as retrieved in case every caller was cancelled
+                    future.exception()
+        else:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_result(None)
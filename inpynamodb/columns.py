@@ -0,0 +1,119 @@
+"""
+Columnar scan results, see `Model.scan_columns`
+"""
+from array import array
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute
+from pynamodb.constants import STRING_SHORT, NUMBER_SHORT, BOOLEAN
+
+NAN = float('nan')
+
+# The value of a missing boolean in a boolean column
+MISSING_BOOLEAN = -1
+
+
+def fill_numbers(column, attr_name, items):
+    values = [item.get(attr_name) for item in items]
+    column.extend([
+        NAN if value is None or NUMBER_SHORT not in value else float(value[NUMBER_SHORT]) for value in values
+    ])
+
+
+def fill_booleans(column, attr_name, items):
+    values = [item.get(attr_name) for item in items]
+    column.extend([
+        MISSING_BOOLEAN if value is None or BOOLEAN not in value else int(value[BOOLEAN]) for value in values
+    ])
+
+
+def fill_strings(column, attr_name, items):
+    values = [item.get(attr_name) for item in items]
+    column.extend([None if value is None else value.get(STRING_SHORT) for value in values])
+
+
+class ColumnFiller(object):
+    """
+    Appends the values of an attribute in the items of a page to its column
+    """
+    def __init__(self, attr):
+        self.attr = attr
+        self.attr_name = attr.attr_name
+        attr_type = type(attr)
+        if attr_type is NumberAttribute:
+            self.typecode, self._fill = 'd', fill_numbers
+        elif attr_type is BooleanAttribute:
+            self.typecode, self._fill = 'b', fill_booleans
+        elif attr_type is UnicodeAttribute:
+            self.typecode, self._fill = None, fill_strings
+        else:
+            self.typecode, self._fill = None, self._fill_values
+
+    def new_column(self):
+        return array(self.typecode) if self.typecode is not None else []
+
+    def fill(self, column, items):
+        self._fill(column, self.attr_name, items)
+
+    def _fill_values(self, column, attr_name, items):
+        attr = self.attr
+        for item in items:
+            value = item.get(attr_name)
+            column.append(None if value is None else attr.deserialize(attr.get_value(value)))
+
+
+class ColumnBatch(object):
+    """
+    The values of some attributes of the scanned items, as one column per attribute
+
+    Number attributes are held in `array('d')` columns, with NaN for missing values; integers past 2 ** 53 lose
+    precision. Boolean attributes are held in `array('b')` columns of 1 and 0, with -1 for missing values.
+    Other attributes are held in lists, with None for missing values.
+    """
+    def __init__(self, columns, count):
+        """
+        :param columns: The columns by python attribute name
+        :param count: The number of items, which is the length of every column
+        """
+        self.columns = columns
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __repr__(self):
+        return '{}({}, count={})'.format(type(self).__name__, list(self.columns), self.count)
+
+    def keys(self):
+        return self.columns.keys()
+
+    def items(self):
+        return self.columns.items()
+
+    def to_numpy(self):
+        """
+        Returns the columns as NumPy arrays, by python attribute name
+
+        Number and boolean columns are shared with the arrays, as float64 and int8 arrays, without copying.
+        Other columns are copied to object arrays.
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required for to_numpy(), install it with `pip install numpy`")
+        arrays = {}
+        for name, column in self.columns.items():
+            if isinstance(column, array):
+                arrays[name] = numpy.frombuffer(column, dtype=column.typecode) if column else \
+                    numpy.empty(0, dtype=column.typecode)
+            else:
+                arrays[name] = numpy.array(column, dtype=object)
+        return arrays
@@ -4,3 +4,7 @@ InPynamoDB lowest level connection
 
 from inpynamodb.connection.base import AsyncConnection
 from inpynamodb.connection.table import TableConnection
+from inpynamodb.connection.registry import ClientRegistry, client_registry
+from inpynamodb.connection.metrics import MetricsRegistry
+
+__all__ = ['AsyncConnection', 'TableConnection', 'ClientRegistry', 'client_registry', 'MetricsRegistry']
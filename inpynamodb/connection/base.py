@@ -7,7 +7,13 @@ from pynamodb.connection.util import pythonic
 from pynamodb.exceptions import TableError, TableDoesNotExist, DeleteError, UpdateError, PutError, TransactWriteError, \
     TransactGetError, GetError, ScanError, QueryError
 
+import asyncio
+import collections
+import copy
+import itertools
+import json
 import logging
+import time
 import uuid
 
 import aiobotocore
@@ -27,21 +33,115 @@ from pynamodb.constants import SERVICE_NAME, DESCRIBE_TABLE, LIST_TABLES, UPDATE
     TRANSACT_CONDITION_CHECK, TRANSACT_DELETE, TRANSACT_PUT, TRANSACT_UPDATE, TRANSACT_ITEMS, TRANSACT_WRITE_ITEMS, \
     TRANSACT_GET, TRANSACT_GET_ITEMS, REQUEST_ITEMS, PUT_REQUEST, DELETE_REQUEST, BATCH_WRITE_ITEM, KEYS, \
     BATCH_GET_ITEM, GET_ITEM, FILTER_EXPRESSION, SEGMENT, TOTAL_SEGMENTS, SCAN, KEY_CONDITION_EXPRESSION, SELECT_VALUES, \
-    SELECT, SCAN_INDEX_FORWARD, QUERY
+    SELECT, SCAN_INDEX_FORWARD, QUERY, INDEXES
 from pynamodb.expressions.operand import Path
 from pynamodb.expressions.projection import create_projection_expression
 from pynamodb.expressions.update import Update
+from pynamodb.signals import pre_dynamodb_send, post_dynamodb_send
+
+from inpynamodb.capacity import get_capacity_scope, get_capacity_type
+from inpynamodb.connection.registry import client_registry
+from inpynamodb.connection.retry import is_retryable, get_backoff_ms
+from inpynamodb.connection.trusted import trust_input
+from inpynamodb.pagination import get_table_rate_limiter
+from inpynamodb.profiling import BUILD_KWARGS, SERIALIZE_EXPRESSIONS, DISPATCH, mark_phase, profiled, is_profiling, \
+    instrument_client
 
 BOTOCORE_EXCEPTIONS = (BotoCoreError, ClientError)
 
+# Reads whose concurrent identical requests may share one response, see `deduplicate_reads`
+DEDUPLICATED_OPERATIONS = frozenset([GET_ITEM, QUERY, BATCH_GET_ITEM])
+
+# Table operations, which do not return consumed capacity
+TABLE_OPERATIONS = frozenset([
+    DESCRIBE_TABLE, LIST_TABLES, UPDATE_TABLE, UPDATE_TIME_TO_LIVE, DELETE_TABLE, CREATE_TABLE
+])
+
+TOTAL_CONSUMED_CAPACITY_MAP = {RETURN_CONSUMED_CAPACITY: TOTAL}
+INDEXES_CONSUMED_CAPACITY_MAP = {RETURN_CONSUMED_CAPACITY: INDEXES}
+
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
+# The logger of `Connection._log_debug`
+pynamodb_log = logging.getLogger(Connection.__module__)
+
+# Request ids of the lean dispatch mode
+_request_ids = itertools.count(1)
+
+
+def has_signal_receivers():
+    """
+    Returns True if a receiver is connected to the pre or post dynamodb send signals
+    """
+    return bool(getattr(pre_dynamodb_send, 'receivers', None) or getattr(post_dynamodb_send, 'receivers', None))
+
+
+def is_consistent_read(operation_kwargs):
+    """
+    Returns True if the request asks for a strongly consistent read of any table
+    """
+    if operation_kwargs.get(CONSISTENT_READ):
+        return True
+    request_items = operation_kwargs.get(REQUEST_ITEMS) or {}
+    return any(table_kwargs.get(CONSISTENT_READ) for table_kwargs in request_items.values())
+
+
+def get_consumed_capacity_units(data, table_name):
+    """
+    Returns the capacity units consumed on `table_name` according to the ConsumedCapacity of a response
+    """
+    capacity = data.get(CONSUMED_CAPACITY) if data else None
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    return sum(
+        item.get(CAPACITY_UNITS, 0) for item in capacity or [] if item.get(TABLE_NAME) == table_name
+    )
+
 
 class AsyncConnection(Connection):
     """
     A higher level abstraction over botocore
     """
+    def __init__(self, region=None, host=None,
+                 read_timeout_seconds=None, connect_timeout_seconds=None,
+                 max_retry_attempts=None, base_backoff_ms=None,
+                 max_pool_connections=None, extra_headers=None,
+                 aws_access_key_id=None, aws_secret_access_key=None, aws_session_token=None,
+                 deduplicate_reads=False, metrics=None, lean_dispatch=False, trusted_input=False):
+        """
+        :param deduplicate_reads: If True, concurrent identical GetItem, Query and BatchGetItem requests
+            which are not consistent reads share one response. `collapsed_reads` counts the shared calls.
+        :param metrics: Optional: a MetricsRegistry recording the requests of this connection
+        :param lean_dispatch: If True, `dispatch` skips the work nobody observes: the pre and post send signals
+            are only sent when they have receivers, requests are only logged when debug logging is enabled,
+            and request ids are counters rather than uuids.
+        :param trusted_input: If True, the client trusts the requests built by this library: botocore does not
+            validate their parameters, skips the handlers DynamoDB does not need and remembers the aliases of
+            its event names. Requests are still signed and the CRC32 checksums of the responses checked.
+        """
+        super(AsyncConnection, self).__init__(
+            region=region,
+            host=host,
+            read_timeout_seconds=read_timeout_seconds,
+            connect_timeout_seconds=connect_timeout_seconds,
+            max_retry_attempts=max_retry_attempts,
+            base_backoff_ms=base_backoff_ms,
+            max_pool_connections=max_pool_connections,
+            extra_headers=extra_headers
+        )
+        self._aws_access_key_id = aws_access_key_id
+        self._aws_secret_access_key = aws_secret_access_key
+        self._aws_session_token = aws_session_token
+        self._pending_tables = {}
+        self._refreshes = set()
+        self._deduplicate_reads = deduplicate_reads
+        self._pending_reads = {}
+        self.collapsed_reads = collections.Counter()
+        self.metrics = metrics
+        self._lean_dispatch = lean_dispatch
+        self._trusted_input = trusted_input
+
     def __repr__(self):
         return "AsyncConnection"
 
@@ -52,22 +152,64 @@ class AsyncConnection(Connection):
         """
         if getattr(self, '_session', None) is None:
             self._session = aiobotocore.get_session()
+            if self._aws_access_key_id and self._aws_secret_access_key:
+                self._session.set_credentials(self._aws_access_key_id,
+                                              self._aws_secret_access_key,
+                                              self._aws_session_token)
         return self._session
 
+    @property
+    def _client_key(self):
+        """
+        The settings which identify a shared client in the client registry
+        """
+        return (
+            self.region,
+            self.host,
+            self._aws_access_key_id,
+            self._aws_secret_access_key,
+            self._aws_session_token,
+            self._connect_timeout_seconds,
+            self._read_timeout_seconds,
+            self._max_pool_connections,
+            self._trusted_input,
+        )
+
     @async_property
     async def client(self):
         """
         Returns a aiobotocore dynamodb client
+
+        The client and its HTTP connection pool are shared, through the client registry, by every
+        connection with the same settings on the same event loop.
         """
-        if not self._client or (self._client._request_signer and not self._client._request_signer._credentials):
-            config = botocore.client.Config(
-                connect_timeout=self._connect_timeout_seconds,
-                read_timeout=self._read_timeout_seconds,
-                max_pool_connections=self._max_pool_connections)
-            self._client = (await self.session).create_client(
-                SERVICE_NAME, self.region, endpoint_url=self.host, config=config
-            )
-        return self._client
+        return await self._get_client()
+
+    async def _get_client(self):
+        client_key = self._client_key
+        client = await client_registry.get_client(client_key, self._create_client)
+        # botocore has a known issue where it will cache empty credentials
+        # if the client does not have credentials, we create a new client
+        if client._request_signer and not client._request_signer._credentials:
+            await client_registry.discard(client_key, client)
+            client = await client_registry.get_client(client_key, self._create_client)
+        self._client = client
+        return client
+
+    async def _create_client(self):
+        config = botocore.client.Config(
+            connect_timeout=self._connect_timeout_seconds,
+            read_timeout=self._read_timeout_seconds,
+            max_pool_connections=self._max_pool_connections,
+            # retries are handled by `dispatch`
+            retries={'max_attempts': 0},
+            parameter_validation=not self._trusted_input)
+        client = (await self.session).create_client(
+            SERVICE_NAME, self.region, endpoint_url=self.host, config=config
+        )
+        if self._trusted_input:
+            trust_input(client)
+        return client
 
     async def dispatch(self, operation_name, operation_kwargs):
         """
@@ -75,43 +217,226 @@ class AsyncConnection(Connection):
 
         Raises TableDoesNotExist if the specified table does not exist
         """
-        if operation_name not in [DESCRIBE_TABLE, LIST_TABLES, UPDATE_TABLE, UPDATE_TIME_TO_LIVE, DELETE_TABLE, CREATE_TABLE]:
-            if RETURN_CONSUMED_CAPACITY not in operation_kwargs:
-                operation_kwargs.update(self.get_consumed_capacity_map(TOTAL))
-        self._log_debug(operation_name, operation_kwargs)
+        mark_phase(BUILD_KWARGS)
+        if operation_name not in TABLE_OPERATIONS and RETURN_CONSUMED_CAPACITY not in operation_kwargs:
+            # a CapacityScope breaks the consumed capacity down per index
+            if get_capacity_scope() is None:
+                operation_kwargs.update(TOTAL_CONSUMED_CAPACITY_MAP)
+            else:
+                operation_kwargs.update(INDEXES_CONSUMED_CAPACITY_MAP)
+        if not self._lean_dispatch or pynamodb_log.isEnabledFor(logging.DEBUG):
+            self._log_debug(operation_name, operation_kwargs)
+
+        if self._deduplicate_reads and operation_name in DEDUPLICATED_OPERATIONS \
+                and not is_consistent_read(operation_kwargs):
+            return await self._send_deduplicated(operation_name, operation_kwargs)
+        return await self._send(operation_name, operation_kwargs)
+
+    async def _send_deduplicated(self, operation_name, operation_kwargs):
+        """
+        Sends the request, unless an identical one is in flight: its response is then shared
+
+        Each caller which joins a request in flight gets its own copy of the response.
+        """
+        loop = asyncio.get_event_loop()
+        key = (loop, operation_name, json.dumps(operation_kwargs, sort_keys=True, default=repr))
+        pending = self._pending_reads.get(key)
+        if pending is not None:
+            try:
+                data = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # only send our own request if the shared one was cancelled, not this caller
+                if not pending.cancelled():
+                    raise
+                return await self._send(operation_name, operation_kwargs)
+            self.collapsed_reads[operation_name] += 1
+            return copy.deepcopy(data)
+
+        pending = self._pending_reads[key] = loop.create_future()
+        try:
+            data = await self._send(operation_name, operation_kwargs)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as e:
+            pending.set_exception(e)
+            # mark the exception as retrieved in case nobody else was waiting
+            pending.exception()
+            raise
+        else:
+            pending.set_result(data)
+        finally:
+            del self._pending_reads[key]
+        return data
 
+    async def _send(self, operation_name, operation_kwargs):
+        """
+        Sends the request within the rate limit of its table
+        """
         table_name = operation_kwargs.get(TABLE_NAME)
-        req_uuid = uuid.uuid4()
+        req_uuid = next(_request_ids) if self._lean_dispatch else uuid.uuid4()
 
-        self.send_pre_boto_callback(operation_name, req_uuid, table_name)
-        data = await (await self.client)._make_api_call(operation_name, operation_kwargs)
-        self.send_post_boto_callback(operation_name, req_uuid, table_name)
+        capacity_scope = get_capacity_scope()
+        if capacity_scope is not None:
+            await capacity_scope.acquire(operation_name)
+        rate_limiter, limited_table_name = self._get_rate_limiter(operation_name, operation_kwargs)
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
 
-        if data and CONSUMED_CAPACITY in data:
+        data = await self._make_api_call_with_retries(operation_name, operation_kwargs, req_uuid, table_name)
+
+        if rate_limiter is not None:
+            rate_limiter.consume(get_consumed_capacity_units(data, limited_table_name))
+        if capacity_scope is not None:
+            capacity_scope.consume(operation_name, data)
+        if self.metrics is not None:
+            self.metrics.record_response(operation_name, operation_kwargs, data)
+
+        if data and CONSUMED_CAPACITY in data and log.isEnabledFor(logging.DEBUG):
             capacity = data.get(CONSUMED_CAPACITY)
             if isinstance(capacity, dict) and CAPACITY_UNITS in capacity:
                 capacity = capacity.get(CAPACITY_UNITS)
             log.debug("%s %s consumed %s units",  data.get(TABLE_NAME, ''), operation_name, capacity)
         return data
 
+    @staticmethod
+    def _get_rate_limiter(operation_name, operation_kwargs):
+        """
+        Returns the RateLimiter shared by operations of this kind on the table of this request, and the table name
+        """
+        capacity_type = get_capacity_type(operation_name)
+        if capacity_type is None:
+            return None, None
+        table_name = operation_kwargs.get(TABLE_NAME)
+        if table_name is None:
+            request_items = operation_kwargs.get(REQUEST_ITEMS) or {}
+            if len(request_items) != 1:
+                return None, None
+            table_name = next(iter(request_items))
+        return get_table_rate_limiter(table_name, capacity_type), table_name
+
+    async def _make_api_call_with_retries(self, operation_name, operation_kwargs, req_uuid, table_name):
+        """
+        Sends the request, retrying throttled and transient failures with backoff
+
+        Every attempt is reported to the pre/post boto callbacks with the same `req_uuid`,
+        so a receiver sees one pre/post pair per retry.
+        """
+        max_retry_attempts = self._max_retry_attempts_exception
+        metrics = self.metrics
+        send_signals = not self._lean_dispatch or has_signal_receivers()
+        attempt = 0
+        while True:
+            if send_signals:
+                self.send_pre_boto_callback(operation_name, req_uuid, table_name)
+            started_at = time.perf_counter() if metrics is not None else None
+            try:
+                # the async_property wrapper costs more than the lookup itself
+                client = await (self._get_client() if self._lean_dispatch else self.client)
+                if is_profiling():
+                    instrument_client(client)
+                    mark_phase(DISPATCH)
+                data = await client._make_api_call(operation_name, operation_kwargs)
+                if metrics is not None:
+                    metrics.record_attempt(operation_name, operation_kwargs, time.perf_counter() - started_at)
+                return data
+            except Exception as e:
+                retried = attempt < max_retry_attempts and is_retryable(e)
+                if metrics is not None:
+                    metrics.record_attempt(
+                        operation_name, operation_kwargs, time.perf_counter() - started_at, error=e, retried=retried
+                    )
+                if not retried:
+                    if attempt:
+                        log.debug('Giving up on (%s) after attempt %s: %s', operation_name, attempt + 1, e)
+                    raise
+                sleep_time_ms = get_backoff_ms(self._base_backoff_ms, attempt)
+                log.debug(
+                    'Retry with backoff needed for (%s) after attempt %s, '
+                    'sleeping for %s milliseconds, retryable %s caught: %s',
+                    operation_name,
+                    attempt + 1,
+                    sleep_time_ms,
+                    e.__class__.__name__,
+                    e
+                )
+            finally:
+                if send_signals:
+                    self.send_post_boto_callback(operation_name, req_uuid, table_name)
+            await asyncio.sleep(sleep_time_ms / 1000.0)
+            attempt += 1
+
     async def get_meta_table(self, table_name, refresh=False):
         """
         Returns a MetaTable
+
+        Concurrent callers share a single in-flight DescribeTable request.
+        If `refresh` is set while a MetaTable is already cached, the cached MetaTable is returned
+        and refreshed in the background.
         """
-        if table_name not in self._tables or refresh:
-            operation_kwargs = {
-                TABLE_NAME: table_name
-            }
+        tbl = self._tables.get(table_name)
+        if tbl is None:
+            return await self._describe_meta_table(table_name)
+        if refresh:
+            self._refresh_meta_table(table_name)
+        return tbl
+
+    def add_meta_table(self, table_name, meta_table):
+        """
+        Caches `meta_table` as the MetaTable of `table_name`, so that the table does not need to be described
+        """
+        self._tables[table_name] = meta_table
+
+    async def _describe_meta_table(self, table_name):
+        """
+        Describes the table, joining the DescribeTable request already in flight for it if there is one
+
+        A failure is raised to every caller waiting on the request.
+        """
+        pending_key = (asyncio.get_event_loop(), table_name)
+        pending = self._pending_tables.get(pending_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load_meta_table(table_name))
+            self._pending_tables[pending_key] = pending
+
+            def forget(future):
+                self._pending_tables.pop(pending_key, None)
+                if not future.cancelled():
+                    # the waiters may all be gone, mark the exception as retrieved
+                    future.exception()
+            pending.add_done_callback(forget)
+        return await asyncio.shield(pending)
+
+    def _refresh_meta_table(self, table_name):
+        """
+        Refreshes the cached MetaTable in the background
+        """
+        async def refresh():
             try:
-                data = await self.dispatch(DESCRIBE_TABLE, operation_kwargs)
-                self._tables[table_name] = MetaTable(data.get(TABLE_KEY))
-            except BotoCoreError as e:
-                raise TableError("Unable to describe table: {}".format(e))
-            except ClientError as e:
-                if 'ResourceNotFound' in e.response['Error']['Code']:
-                    raise TableDoesNotExist(e.response['Error']['Message'])
-                else:
-                    raise
+                await self._describe_meta_table(table_name)
+            except Exception as e:
+                log.warning("Unable to refresh table metadata of %s: %s", table_name, e)
+
+        if (asyncio.get_event_loop(), table_name) not in self._pending_tables:
+            # keep a reference, the event loop only holds a weak one to the task
+            task = asyncio.ensure_future(refresh())
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+
+    async def _load_meta_table(self, table_name):
+        operation_kwargs = {
+            TABLE_NAME: table_name
+        }
+        try:
+            data = await self.dispatch(DESCRIBE_TABLE, operation_kwargs)
+            self._tables[table_name] = MetaTable(data.get(TABLE_KEY))
+        except BotoCoreError as e:
+            raise TableError("Unable to describe table: {}".format(e))
+        except ClientError as e:
+            if 'ResourceNotFound' in e.response['Error']['Code']:
+                raise TableDoesNotExist(e.response['Error']['Message'])
+            else:
+                raise
         return self._tables[table_name]
 
     async def create_table(self,
@@ -284,7 +609,7 @@ class AsyncConnection(Connection):
         Performs the DescribeTable operation
         """
         try:
-            tbl = await self.get_meta_table(table_name, refresh=True)
+            tbl = await self._describe_meta_table(table_name)
             if tbl:
                 return tbl.data
         except ValueError:
@@ -356,12 +681,14 @@ class AsyncConnection(Connection):
         if attributes and operation_kwargs.get(ITEM) is not None:
             attrs = await self.get_item_attribute_map(table_name, attributes)
             operation_kwargs[ITEM].update(attrs[ITEM])
+        mark_phase(BUILD_KWARGS)
         if attributes_to_get is not None:
             projection_expression = create_projection_expression(attributes_to_get, name_placeholders)
             operation_kwargs[PROJECTION_EXPRESSION] = projection_expression
         if condition is not None:
             condition_expression = condition.serialize(name_placeholders, expression_attribute_values)
             operation_kwargs[CONDITION_EXPRESSION] = condition_expression
+        mark_phase(SERIALIZE_EXPRESSIONS)
         if consistent_read is not None:
             operation_kwargs[CONSISTENT_READ] = consistent_read
         if return_values is not None:
@@ -373,17 +700,20 @@ class AsyncConnection(Connection):
         if return_item_collection_metrics is not None:
             operation_kwargs.update(self.get_item_collection_map(return_item_collection_metrics))
         if actions is not None:
+            mark_phase(BUILD_KWARGS)
             update_expression = Update(*actions)
             operation_kwargs[UPDATE_EXPRESSION] = update_expression.serialize(
                 name_placeholders,
                 expression_attribute_values
             )
+            mark_phase(SERIALIZE_EXPRESSIONS)
         if name_placeholders:
             operation_kwargs[EXPRESSION_ATTRIBUTE_NAMES] = self._reverse_dict(name_placeholders)
         if expression_attribute_values:
             operation_kwargs[EXPRESSION_ATTRIBUTE_VALUES] = expression_attribute_values
         return operation_kwargs
 
+    @profiled(DELETE_ITEM)
     async def delete_item(self,
                           table_name,
                           hash_key,
@@ -409,6 +739,7 @@ class AsyncConnection(Connection):
         except BOTOCORE_EXCEPTIONS as e:
             raise DeleteError("Failed to delete item: {}".format(e)) from e
 
+    @profiled(UPDATE_ITEM)
     async def update_item(self,
                           table_name,
                           hash_key,
@@ -439,6 +770,7 @@ class AsyncConnection(Connection):
         except BOTOCORE_EXCEPTIONS as e:
             raise UpdateError("Failed to update item: {}".format(e)) from e
 
+    @profiled(PUT_ITEM)
     async def put_item(self,
                        table_name,
                        hash_key,
@@ -518,6 +850,7 @@ class AsyncConnection(Connection):
         except BOTOCORE_EXCEPTIONS as e:
             raise TransactGetError("Failed to get transaction items", e) from e
 
+    @profiled(BATCH_WRITE_ITEM)
     async def batch_write_item(self,
                                table_name,
                                put_items=None,
@@ -558,6 +891,7 @@ class AsyncConnection(Connection):
         except BOTOCORE_EXCEPTIONS as e:
             raise PutError("Failed to batch write items: {}".format(e)) from e
 
+    @profiled(BATCH_GET_ITEM)
     async def batch_get_item(self,
                              table_name,
                              keys,
@@ -580,8 +914,10 @@ class AsyncConnection(Connection):
         if return_consumed_capacity:
             operation_kwargs.update(self.get_consumed_capacity_map(return_consumed_capacity))
         if attributes_to_get is not None:
+            mark_phase(BUILD_KWARGS)
             projection_expression = create_projection_expression(attributes_to_get, name_placeholders)
             args_map[PROJECTION_EXPRESSION] = projection_expression
+            mark_phase(SERIALIZE_EXPRESSIONS)
         if name_placeholders:
             args_map[EXPRESSION_ATTRIBUTE_NAMES] = self._reverse_dict(name_placeholders)
         operation_kwargs[REQUEST_ITEMS][table_name].update(args_map)
@@ -597,6 +933,7 @@ class AsyncConnection(Connection):
         except BOTOCORE_EXCEPTIONS as e:
             raise GetError("Failed to batch get items: {}".format(e)) from e
 
+    @profiled(GET_ITEM)
     async def get_item(self,
                        table_name,
                        hash_key,
@@ -618,6 +955,7 @@ class AsyncConnection(Connection):
         except BOTOCORE_EXCEPTIONS as e:
             raise GetError("Failed to get item: {}".format(e)) from e
 
+    @profiled(SCAN)
     async def scan(self,
                    table_name,
                    filter_condition=None,
@@ -638,12 +976,14 @@ class AsyncConnection(Connection):
         name_placeholders = {}
         expression_attribute_values = {}
 
+        mark_phase(BUILD_KWARGS)
         if filter_condition is not None:
             filter_expression = filter_condition.serialize(name_placeholders, expression_attribute_values)
             operation_kwargs[FILTER_EXPRESSION] = filter_expression
         if attributes_to_get is not None:
             projection_expression = create_projection_expression(attributes_to_get, name_placeholders)
             operation_kwargs[PROJECTION_EXPRESSION] = projection_expression
+        mark_phase(SERIALIZE_EXPRESSIONS)
         if index_name:
             operation_kwargs[INDEX_NAME] = index_name
         if limit is not None:
@@ -668,6 +1008,7 @@ class AsyncConnection(Connection):
         except BOTOCORE_EXCEPTIONS as e:
             raise ScanError("Failed to scan table: {}".format(e)) from e
 
+    @profiled(QUERY)
     async def query(self,
                     table_name,
                     hash_key,
@@ -719,6 +1060,7 @@ class AsyncConnection(Connection):
             else:
                 raise ValueError("{} is not a valid range key condition".format(range_key_condition))
 
+        mark_phase(BUILD_KWARGS)
         operation_kwargs[KEY_CONDITION_EXPRESSION] = key_condition.serialize(
             name_placeholders, expression_attribute_values)
         if filter_condition is not None:
@@ -735,6 +1077,7 @@ class AsyncConnection(Connection):
         if attributes_to_get:
             projection_expression = create_projection_expression(attributes_to_get, name_placeholders)
             operation_kwargs[PROJECTION_EXPRESSION] = projection_expression
+        mark_phase(SERIALIZE_EXPRESSIONS)
         if consistent_read:
             operation_kwargs[CONSISTENT_READ] = True
         if exclusive_start_key:
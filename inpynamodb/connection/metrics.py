@@ -0,0 +1,255 @@
+"""
+Metrics of the requests sent by AsyncConnection.dispatch
+"""
+import bisect
+import json
+
+from botocore.exceptions import ClientError
+from pynamodb.constants import CONSUMED_CAPACITY, CAPACITY_UNITS, TABLE_NAME, INDEX_NAME, REQUEST_ITEMS
+
+from inpynamodb.capacity import READ_OPERATIONS
+from inpynamodb.connection.retry import THROTTLING_ERROR_CODES
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the payload size buckets, in bytes
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def get_error_code(exc):
+    """
+    Returns the DynamoDB error code of a ClientError, or the class name of any other exception
+    """
+    if isinstance(exc, ClientError):
+        return exc.response.get('Error', {}).get('Code') or 'Unknown'
+    return exc.__class__.__name__
+
+
+def get_metric_labels(operation_kwargs):
+    """
+    Returns the table and index names a request is recorded under
+
+    Batch requests over a single table are recorded under that table, and requests over several tables under ''.
+    """
+    table_name = operation_kwargs.get(TABLE_NAME)
+    if table_name is None:
+        request_items = operation_kwargs.get(REQUEST_ITEMS) or {}
+        table_name = next(iter(request_items)) if len(request_items) == 1 else ''
+    return table_name, operation_kwargs.get(INDEX_NAME) or ''
+
+
+class Histogram(object):
+    """
+    Counts observations in buckets of upper bounds `buckets`, plus a last bucket for larger values
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        """
+        Returns the cumulative count of each upper bound, ending with `inf`, along with the count and sum
+        """
+        cumulative_counts = []
+        total = 0
+        for upper_bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            cumulative_counts.append((upper_bound, total))
+        return {'buckets': cumulative_counts, 'count': self.count, 'sum': self.sum}
+
+
+class OperationMetrics(object):
+    """
+    The metrics of one operation on one table or index
+    """
+    __slots__ = ('requests', 'errors', 'throttles', 'retries', 'read_capacity_units', 'write_capacity_units',
+                 'latency', 'request_size', 'response_size')
+
+    def __init__(self, latency_buckets, size_buckets):
+        self.requests = 0
+        self.errors = {}
+        self.throttles = 0
+        self.retries = 0
+        self.read_capacity_units = 0
+        self.write_capacity_units = 0
+        self.latency = Histogram(latency_buckets)
+        self.request_size = Histogram(size_buckets)
+        self.response_size = Histogram(size_buckets)
+
+
+class MetricsRegistry(object):
+    """
+    Records the requests of the connections it is given to, per table, index and operation
+
+    Every attempt of a request is counted, with its latency and error code; retried attempts and
+    throttling errors are counted separately. Successful requests add their consumed capacity and,
+    with `record_payload_sizes`, the size of the request and response as serialized JSON.
+
+    Example:
+        metrics = MetricsRegistry()
+
+        class Thread(Model):
+            class Meta:
+                table_name = 'Thread'
+                metrics = metrics
+
+        The metrics as a list of dicts
+            metrics.snapshot()
+
+        The metrics in the Prometheus text exposition format
+            metrics.to_prometheus()
+    """
+    def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS, size_buckets=DEFAULT_SIZE_BUCKETS,
+                 record_payload_sizes=False):
+        """
+        :param latency_buckets: The upper bounds of the latency histogram buckets, in seconds
+        :param size_buckets: The upper bounds of the payload size histogram buckets, in bytes
+        :param record_payload_sizes: If True, payload sizes are measured, at the cost of serializing every request
+            and response to JSON once more
+        """
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self.size_buckets = tuple(sorted(size_buckets))
+        self.record_payload_sizes = record_payload_sizes
+        self._metrics = {}
+
+    def _get_metrics(self, operation_name, operation_kwargs):
+        table_name, index_name = get_metric_labels(operation_kwargs)
+        key = (table_name, index_name, operation_name)
+        metrics = self._metrics.get(key)
+        if metrics is None:
+            metrics = self._metrics[key] = OperationMetrics(self.latency_buckets, self.size_buckets)
+        return metrics
+
+    def record_attempt(self, operation_name, operation_kwargs, latency_seconds, error=None, retried=False):
+        """
+        Records one attempt of a request
+
+        :param error: The exception the attempt failed with, if any
+        :param retried: If True, the failed attempt is sent again
+        """
+        metrics = self._get_metrics(operation_name, operation_kwargs)
+        metrics.requests += 1
+        metrics.latency.observe(latency_seconds)
+        if error is not None:
+            error_code = get_error_code(error)
+            metrics.errors[error_code] = metrics.errors.get(error_code, 0) + 1
+            if error_code in THROTTLING_ERROR_CODES:
+                metrics.throttles += 1
+            if retried:
+                metrics.retries += 1
+
+    def record_response(self, operation_name, operation_kwargs, data):
+        """
+        Records the consumed capacity and the payload sizes of a successful request
+        """
+        metrics = self._get_metrics(operation_name, operation_kwargs)
+        capacity = data.get(CONSUMED_CAPACITY) if data else None
+        if capacity:
+            if isinstance(capacity, dict):
+                capacity = [capacity]
+            capacity_units = sum(item.get(CAPACITY_UNITS, 0) for item in capacity)
+            if operation_name in READ_OPERATIONS:
+                metrics.read_capacity_units += capacity_units
+            else:
+                metrics.write_capacity_units += capacity_units
+        if self.record_payload_sizes:
+            metrics.request_size.observe(len(json.dumps(operation_kwargs, default=str)))
+            metrics.response_size.observe(len(json.dumps(data, default=str)) if data else 0)
+
+    def snapshot(self):
+        """
+        Returns a copy of the metrics, as a list of dicts with the table, index and operation they belong to
+        """
+        return [
+            {
+                'table': table_name,
+                'index': index_name,
+                'operation': operation_name,
+                'requests': metrics.requests,
+                'errors': dict(metrics.errors),
+                'throttles': metrics.throttles,
+                'retries': metrics.retries,
+                'read_capacity_units': metrics.read_capacity_units,
+                'write_capacity_units': metrics.write_capacity_units,
+                'latency_seconds': metrics.latency.snapshot(),
+                'request_size_bytes': metrics.request_size.snapshot(),
+                'response_size_bytes': metrics.response_size.snapshot(),
+            }
+            for (table_name, index_name, operation_name), metrics in sorted(self._metrics.items())
+        ]
+
+    def reset(self):
+        """
+        Forgets every metric recorded so far
+        """
+        self._metrics.clear()
+
+    def to_prometheus(self, prefix='inpynamodb'):
+        """
+        Returns the metrics in the Prometheus text exposition format
+
+        :param prefix: The prefix of every metric name
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def add_metric(name, metric_type, help_text, samples):
+            name = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, metric_type))
+            for suffix, labels, value in samples:
+                lines.append('{}{}{{{}}} {}'.format(name, suffix, format_labels(labels), format_value(value)))
+
+        def labels_of(entry, **extra_labels):
+            labels = [('table', entry['table']), ('index', entry['index']), ('operation', entry['operation'])]
+            return labels + sorted(extra_labels.items())
+
+        def counter(name, help_text, field):
+            add_metric(name, 'counter', help_text, [('', labels_of(entry), entry[field]) for entry in snapshot])
+
+        def histogram(name, help_text, field):
+            samples = []
+            for entry in snapshot:
+                values = entry[field]
+                for upper_bound, count in values['buckets']:
+                    samples.append(('_bucket', labels_of(entry, le=format_value(upper_bound)), count))
+                samples.append(('_sum', labels_of(entry), values['sum']))
+                samples.append(('_count', labels_of(entry), values['count']))
+            add_metric(name, 'histogram', help_text, samples)
+
+        counter('requests_total', 'Requests sent to DynamoDB, counting every attempt', 'requests')
+        add_metric('errors_total', 'counter', 'Failed attempts by error code', [
+            ('', labels_of(entry, code=code), count)
+            for entry in snapshot for code, count in sorted(entry['errors'].items())
+        ])
+        counter('throttles_total', 'Attempts which failed with a throttling error', 'throttles')
+        counter('retries_total', 'Failed attempts which were sent again', 'retries')
+        counter('consumed_read_capacity_units_total', 'Read capacity units consumed', 'read_capacity_units')
+        counter('consumed_write_capacity_units_total', 'Write capacity units consumed', 'write_capacity_units')
+        histogram('request_latency_seconds', 'Latency of each attempt', 'latency_seconds')
+        histogram('request_size_bytes', 'Size of the requests as serialized JSON', 'request_size_bytes')
+        histogram('response_size_bytes', 'Size of the responses as serialized JSON', 'response_size_bytes')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
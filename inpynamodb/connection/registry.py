@@ -0,0 +1,104 @@
+"""
+Registry of aiobotocore clients shared between connections
+"""
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class ClientRegistry(object):
+    """
+    Shares aiobotocore clients between every AsyncConnection with the same settings
+
+    A client owns an HTTP connection pool bound to the event loop it was created on,
+    so clients are keyed by the running event loop as well as by the connection settings.
+
+    Example:
+        client = await registry.get_client(key, create_client)
+
+        And when the application shuts down
+            await registry.close()
+    """
+    def __init__(self):
+        self._clients = {}
+        self._pending = {}
+
+    async def get_client(self, key, create_client):
+        """
+        Returns the client registered for `key` on the running event loop
+
+        The first caller creates the client with `create_client`; concurrent callers wait for
+        that creation instead of creating their own client.
+
+        :param key: A hashable description of the client settings
+        :param create_client: A coroutine function returning a new client
+        """
+        loop = asyncio.get_event_loop()
+        loop_key = (loop, key)
+        client = self._clients.get(loop_key)
+        if client is not None:
+            return client
+
+        pending = self._pending.get(loop_key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self._discard_closed_loops()
+        future = loop.create_future()
+        self._pending[loop_key] = future
+        try:
+            client = await create_client()
+        except BaseException as e:
+            future.set_exception(e)
+            # mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self._clients[loop_key] = client
+            future.set_result(client)
+        finally:
+            del self._pending[loop_key]
+        return client
+
+    async def discard(self, key, client):
+        """
+        Forgets and closes `client`, registered for `key` on the running event loop, so the next call creates
+        a new one
+
+        Nothing is done if `client` was already replaced, as by another connection which discarded it first.
+        """
+        loop_key = (asyncio.get_event_loop(), key)
+        if self._clients.get(loop_key) is not client:
+            return
+        del self._clients[loop_key]
+        try:
+            await client.close()
+        except Exception:
+            log.exception("Failed to close client %s", client)
+
+    async def close(self):
+        """
+        Closes every client created on the running event loop
+        """
+        loop = asyncio.get_event_loop()
+        for loop_key in [loop_key for loop_key in self._clients if loop_key[0] is loop]:
+            client = self._clients.pop(loop_key)
+            try:
+                await client.close()
+            except Exception:
+                log.exception("Failed to close client %s", client)
+
+    def _discard_closed_loops(self):
+        """
+        Drops clients of event loops which are closed and cannot be used anymore
+        """
+        for loop_key in [loop_key for loop_key in self._clients if loop_key[0].is_closed()]:
+            del self._clients[loop_key]
+
+    def __len__(self):
+        return len(self._clients)
+
+
+client_registry = ClientRegistry()
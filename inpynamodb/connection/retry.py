@@ -0,0 +1,122 @@
+"""
+Retry policies used by AsyncConnection.dispatch and by batch operations
+"""
+import asyncio
+import random
+import time
+
+import aiohttp
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+# Error codes of requests rejected for exceeding the table's or the account's throughput
+THROTTLING_ERROR_CODES = frozenset([
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+])
+
+# Error codes that DynamoDB documents as safe to retry
+# https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Programming.Errors.html
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | frozenset([
+    'LimitExceededException',
+    'InternalServerError',
+    'ServiceUnavailable',
+    'TransactionInProgressException',
+])
+
+RETRYABLE_EXCEPTIONS = (
+    ConnectionError,
+    HTTPClientError,
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+)
+
+# Upper bound of a single backoff sleep, in milliseconds
+MAX_BACKOFF_MS = 20000
+
+
+def is_retryable(exc):
+    """
+    Returns True if `exc` is a transient error which may succeed when the request is sent again
+
+    Throttling errors, 5xx responses and connection resets are retryable.
+    Any other 4xx error (e.g. ConditionalCheckFailedException) is expected to fail in perpetuity.
+    """
+    if isinstance(exc, ClientError):
+        if exc.response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES:
+            return True
+        status_code = exc.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return status_code is not None and status_code >= 500
+    return isinstance(exc, RETRYABLE_EXCEPTIONS)
+
+
+def get_backoff_ms(base_backoff_ms, attempt, max_backoff_ms=MAX_BACKOFF_MS):
+    """
+    Returns the time to sleep before retrying, in milliseconds
+
+    We use fully-jittered, capped, exponentially-backed-off retries:
+    https://www.awsarchitectureblog.com/2015/03/backoff.html
+
+    :param base_backoff_ms: The backoff of the first retry
+    :param attempt: The zero-based number of the attempt which just failed
+    :param max_backoff_ms: The cap of a single backoff
+    """
+    return random.randint(0, min(max_backoff_ms, base_backoff_ms * (2 ** attempt)))
+
+
+class UnprocessedRetryPolicy(object):
+    """
+    Decides when unprocessed keys of BatchGetItem and unprocessed items of BatchWriteItem are sent again
+
+    Unprocessed work is a sign of throttling, so it is sent again after a jittered exponential backoff,
+    until `max_attempts` or `deadline_seconds` is reached.
+    The policy also counts the partial batches of each operation, see `stats`.
+    """
+    def __init__(self, max_attempts=8, base_backoff_ms=25, max_backoff_ms=MAX_BACKOFF_MS, deadline_seconds=None):
+        """
+        :param max_attempts: The number of times the same work may be sent, None for no limit
+        :param base_backoff_ms: The backoff before the first resend
+        :param max_backoff_ms: The cap of a single backoff
+        :param deadline_seconds: Optional: the time after which a batch operation gives up resending
+        """
+        if max_attempts is not None and max_attempts < 1:
+            raise ValueError("max_attempts must be greater than zero")
+        self.max_attempts = max_attempts
+        self.base_backoff_ms = base_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.deadline_seconds = deadline_seconds
+        self.stats = {}
+
+    def get_backoff_ms(self, attempts, started_at):
+        """
+        Returns the time to sleep before sending again work which was sent `attempts` times,
+        or None if it should not be sent again
+
+        :param attempts: The number of times the work was sent
+        :param started_at: The `time.monotonic()` at which the batch operation started
+        """
+        if self.max_attempts is not None and attempts >= self.max_attempts:
+            return None
+        backoff_ms = get_backoff_ms(self.base_backoff_ms, attempts - 1, self.max_backoff_ms)
+        if self.deadline_seconds is not None and \
+                time.monotonic() + backoff_ms / 1000 > started_at + self.deadline_seconds:
+            return None
+        return backoff_ms
+
+    def record(self, operation_name, unprocessed, exhausted=False):
+        """
+        Counts a partial batch of `operation_name` which left `unprocessed` keys or items
+
+        :param exhausted: True if the unprocessed work is given up
+        """
+        stats = self.stats.get(operation_name)
+        if stats is None:
+            stats = self.stats[operation_name] = {'partial_batches': 0, 'unprocessed': 0, 'exhausted': 0}
+        stats['partial_batches'] += 1
+        stats['unprocessed'] += unprocessed
+        if exhausted:
+            stats['exhausted'] += 1
+
+
+default_unprocessed_retry_policy = UnprocessedRetryPolicy()
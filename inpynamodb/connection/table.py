@@ -26,7 +26,11 @@ class TableConnection(object):
                          extra_headers=None,
                          aws_access_key_id=None,
                          aws_secret_access_key=None,
-                         aws_session_token=None):
+                         aws_session_token=None,
+                         deduplicate_reads=False,
+                         metrics=None,
+                         lean_dispatch=False,
+                         trusted_input=False):
         connection = AsyncConnection(
             region=region,
             host=host,
@@ -35,14 +39,15 @@ class TableConnection(object):
             max_retry_attempts=max_retry_attempts,
             base_backoff_ms=base_backoff_ms,
             max_pool_connections=max_pool_connections,
-            extra_headers=extra_headers
+            extra_headers=extra_headers,
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+            deduplicate_reads=deduplicate_reads,
+            metrics=metrics,
+            lean_dispatch=lean_dispatch,
+            trusted_input=trusted_input
         )
-
-        if aws_access_key_id and aws_secret_access_key:
-            (await connection.session).set_credentials(aws_access_key_id,
-                                                       aws_secret_access_key,
-                                                       aws_session_token)
-
         return cls(table_name,  connection)
 
     async def get_meta_table(self, refresh=False):
@@ -51,6 +56,12 @@ class TableConnection(object):
         """
         return await self.connection.get_meta_table(self.table_name, refresh=refresh)
 
+    def add_meta_table(self, meta_table):
+        """
+        Caches `meta_table` as the MetaTable of this table
+        """
+        self.connection.add_meta_table(self.table_name, meta_table)
+
     async def get_operation_kwargs(self,
                                    hash_key,
                                    range_key=None,
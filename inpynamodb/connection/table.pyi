@@ -4,6 +4,7 @@ from pynamodb.expressions.condition import Condition
 from pynamodb.expressions.update import Action
 
 from inpynamodb.connection import AsyncConnection
+from inpynamodb.connection.metrics import MetricsRegistry
 
 
 class TableConnection:
@@ -28,7 +29,11 @@ class TableConnection:
                          extra_headers: Optional[MutableMapping[Text, Text]] = ...,
                          aws_access_key_id: Optional[str] = ...,
                          aws_secret_access_key: Optional[str] = ...,
-                         aws_access_token: Optional[str] = ...,
+                         aws_session_token: Optional[str] = ...,
+                         deduplicate_reads: bool = ...,
+                         metrics: Optional[MetricsRegistry] = ...,
+                         lean_dispatch: bool = ...,
+                         trusted_input: bool = ...,
     ) -> TableConnection: ...
 
     async def get_operation_kwargs(
@@ -0,0 +1,64 @@
+"""
+The trusted input client profile, for requests whose parameters are built by this library
+"""
+import functools
+
+from botocore.discovery import block_endpoint_discovery_required_operations
+from botocore.handlers import generate_idempotent_uuid, inject_api_version_header_if_needed
+from botocore.retryhandler import CRC32Checker
+from pynamodb.constants import TRANSACT_WRITE_ITEMS
+
+# Builtin handlers which do nothing for the operations sent by this library
+UNNEEDED_HANDLERS = (
+    # only raises for operations which require endpoint discovery, none of the DynamoDB ones do
+    ('before-parameter-build', block_endpoint_discovery_required_operations),
+    # only sets a header for the DescribeEndpoints operation
+    ('before-call', inject_api_version_header_if_needed),
+    # looks for idempotency tokens in every request, only TransactWriteItems has one
+    ('before-parameter-build', generate_idempotent_uuid),
+)
+
+CRC32_HEADER = 'x-amz-crc32'
+
+# The most event names whose alias is remembered, a few per operation
+ALIASED_EVENT_NAMES_CACHE_SIZE = 1024
+
+
+class CRC32Handler(object):
+    """
+    A needs-retry handler which only checks the CRC32 checksum of the responses
+
+    It replaces the retry handler of the client, whose policies are never applied since `dispatch` handles retries,
+    and raises ChecksumError when a response body does not match its checksum.
+    """
+    def __init__(self):
+        self._checker = CRC32Checker(header=CRC32_HEADER)
+
+    def __call__(self, attempts, response, caught_exception, **kwargs):
+        if response is not None:
+            self._checker(attempts, response, caught_exception)
+        return None
+
+
+def trust_input(client):
+    """
+    Removes the handlers of `client` which are not needed for the requests built by this library, and remembers
+    the aliases of its event names
+
+    Request signing and the CRC32 checksum of the responses are kept. Parameter validation is disabled
+    by the client config, see `AsyncConnection(trusted_input=True)`.
+    """
+    events = client.meta.events
+    # the aliases of the event names, which botocore works out again on every emit, are remembered.
+    # The event aliaser is shared by the client, its endpoint and its request signer.
+    events._alias_event_name = functools.lru_cache(maxsize=ALIASED_EVENT_NAMES_CACHE_SIZE)(events._alias_event_name)
+    service_event_name = client.meta.service_model.service_id.hyphenize()
+    for event_name, handler in UNNEEDED_HANDLERS:
+        events.unregister(event_name, handler)
+    events.register(
+        'before-parameter-build.{}.{}'.format(service_event_name, TRANSACT_WRITE_ITEMS), generate_idempotent_uuid
+    )
+    unique_id = 'retry-config-{}'.format(service_event_name)
+    events.unregister('needs-retry.{}'.format(service_event_name), unique_id=unique_id)
+    events.register('needs-retry.{}'.format(service_event_name), CRC32Handler(), unique_id=unique_id)
+    return client
@@ -0,0 +1,60 @@
+"""
+InPynamoDB exceptions
+"""
+from pynamodb.exceptions import PynamoDBException, GetError, PutError
+
+
+class UnprocessedKeysError(GetError):
+    """
+    Raised when BatchGetItem still returns unprocessed keys after the retry policy gave up
+
+    `unprocessed_keys` holds the serialized keys which were not retrieved.
+    """
+    msg = "Error getting unprocessed keys"
+
+    def __init__(self, msg=None, cause=None, unprocessed_keys=None):
+        super(UnprocessedKeysError, self).__init__(msg, cause)
+        self.unprocessed_keys = unprocessed_keys or []
+
+
+class UnprocessedItemsError(PutError):
+    """
+    Raised when BatchWriteItem still returns unprocessed items after the retry policy gave up
+
+    `put_items` and `delete_items` hold the serialized items and keys which were not written.
+    """
+    msg = "Error writing unprocessed items"
+
+    def __init__(self, msg=None, cause=None, put_items=None, delete_items=None):
+        super(UnprocessedItemsError, self).__init__(msg, cause)
+        self.put_items = put_items or []
+        self.delete_items = delete_items or []
+
+
+class BatchWriteError(PutError):
+    """
+    Raised when a BatchWrite with a concurrency failed to write some of its operations
+
+    `failed_operations` holds an operation dict for every put or delete which was not written,
+    with the model instance as `item`, PUT or DELETE as `action`, and the exception as `error`.
+    """
+    msg = "Error writing batch items"
+
+    def __init__(self, msg=None, cause=None, failed_operations=None):
+        super(BatchWriteError, self).__init__(msg, cause)
+        self.failed_operations = failed_operations or []
+
+
+class CapacityBudgetExceededError(PynamoDBException):
+    """
+    Raised before sending a request when a CapacityScope has consumed its budget of that capacity type
+
+    `capacity_type` is READ or WRITE, and `budget` and `consumed` are in capacity units.
+    """
+    msg = "Capacity budget exceeded"
+
+    def __init__(self, msg=None, cause=None, capacity_type=None, budget=None, consumed=None):
+        super(CapacityBudgetExceededError, self).__init__(msg, cause)
+        self.capacity_type = capacity_type
+        self.budget = budget
+        self.consumed = consumed
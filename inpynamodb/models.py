@@ -1,6 +1,9 @@
 import asyncio
+import collections
 import json
 import logging
+import time
+from decimal import Decimal
 from inspect import getmembers
 
 from pynamodb.connection.util import pythonic
@@ -9,18 +12,52 @@ from pynamodb.constants import BATCH_WRITE_PAGE_LIMIT, PUT, DELETE, ATTRIBUTES,
     ITEM_COUNT, COUNT, READ_CAPACITY_UNITS, WRITE_CAPACITY_UNITS, STREAM_VIEW_TYPE, STREAM_SPECIFICATION, \
     STREAM_ENABLED, BILLING_MODE, GLOBAL_SECONDARY_INDEXES, LOCAL_SECONDARY_INDEXES, ATTR_DEFINITIONS, ATTR_NAME, \
     TABLE_STATUS, ACTIVE, INDEX_NAME, KEY_SCHEMA, PROJECTION, PROJECTION_TYPE, PAY_PER_REQUEST_BILLING_MODE, \
-    PROVISIONED_THROUGHPUT, NON_KEY_ATTRIBUTES
+    PROVISIONED_THROUGHPUT, NON_KEY_ATTRIBUTES, TABLE_NAME, ATTR_TYPE, KEY_TYPE, BATCH_GET_ITEM, BATCH_WRITE_ITEM, \
+    GET_ITEM, ITEMS, NUMBER
+from pynamodb.connection.base import MetaTable
 from pynamodb.exceptions import DoesNotExist, TableDoesNotExist, TableError
+from pynamodb.expressions.condition import Condition
 from pynamodb.models import Model as PynamoDBModel, MetaModel
 from pynamodb.types import HASH, RANGE
 
+from inpynamodb.attributes import LazyAttributeValues
+from inpynamodb.cache import get_condition_key
+from inpynamodb.coalescing import GetCoalescer
+from inpynamodb.columns import ColumnBatch, ColumnFiller
 from inpynamodb.connection import TableConnection
+from inpynamodb.connection.retry import default_unprocessed_retry_policy
+from inpynamodb.exceptions import UnprocessedKeysError, UnprocessedItemsError, BatchWriteError
 from inpynamodb.indexes import Index, GlobalSecondaryIndex
-from inpynamodb.pagination import ResultIterator
+from inpynamodb.pagination import PageIterator, ResultIterator, ParallelScanIterator, READ, WRITE, set_table_rate_limit
+from inpynamodb.profiling import DESERIALIZE, is_profiling, record_phase
+from inpynamodb.rows import get_row_class
+from inpynamodb.serializers import get_serializer
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
+# The schema checks of Meta.check_meta_table still running, referenced until they are done
+_meta_table_checks = set()
+
+
+def _get_key_schema_signature(meta_table):
+    """
+    Returns the key attributes and types of a table and its indexes, for comparing table schemas
+    """
+    attr_types = {attr.get(ATTR_NAME): attr.get(ATTR_TYPE) for attr in meta_table.data.get(ATTR_DEFINITIONS) or []}
+
+    def get_keys(key_schema):
+        return sorted(
+            (key.get(ATTR_NAME), key.get(KEY_TYPE), attr_types.get(key.get(ATTR_NAME))) for key in key_schema or []
+        )
+
+    signature = {None: get_keys(meta_table.data.get(KEY_SCHEMA))}
+    indexes = (meta_table.data.get(GLOBAL_SECONDARY_INDEXES) or []) + \
+        (meta_table.data.get(LOCAL_SECONDARY_INDEXES) or [])
+    for index in indexes:
+        signature[index.get(INDEX_NAME)] = get_keys(index.get(KEY_SCHEMA))
+    return signature
+
 
 class ModelContextManager(object):
     """
@@ -41,7 +78,21 @@ class ModelContextManager(object):
 class BatchWrite(ModelContextManager):
     """
     A class for batch writes
+
+    With `concurrency`, full batches are written by background tasks while more operations are added.
+    At most `concurrency` batches are in flight: adding an operation waits when they all are.
+    Exiting the context (or calling `commit`) waits for every batch, and raises BatchWriteError
+    listing the operations which failed.
     """
+    def __init__(self, model, auto_commit=True, concurrency=None):
+        if concurrency is not None and concurrency < 1:
+            raise ValueError("concurrency must be greater than zero")
+        super(BatchWrite, self).__init__(model, auto_commit=auto_commit)
+        self.concurrency = concurrency
+        self.failed_operations = []
+        self._flushes = set()
+        self._flush_slots = None
+
     async def save(self, put_item):
         """
         This adds `put_item` to the list of pending operations to be performed.
@@ -59,7 +110,7 @@ class BatchWrite(ModelContextManager):
             if not self.auto_commit:
                 raise ValueError("DynamoDB allows a maximum of 25 batch operations")
             else:
-                await self.commit()
+                await self._flush()
         self.pending_operations.append({"action": PUT, "item": put_item})
 
     async def delete(self, del_item):
@@ -79,7 +130,7 @@ class BatchWrite(ModelContextManager):
             if not self.auto_commit:
                 raise ValueError("DynamoDB allows a maximum of 25 batch operations")
             else:
-                await self.commit()
+                await self._flush()
         self.pending_operations.append({"action": DELETE, "item": del_item})
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -92,25 +143,105 @@ class BatchWrite(ModelContextManager):
     async def commit(self):
         """
         Writes all of the changes that are pending
+
+        Unprocessed items are sent again after the backoff of the model's `Meta.unprocessed_retry_policy`.
+        UnprocessedItemsError is raised when the policy gives up.
+        With `concurrency`, this also waits for the batches written in the background.
+        """
+        if self.concurrency is None:
+            return await self._write(self._take_pending_operations())
+
+        if self.pending_operations:
+            await self._flush()
+        if self._flushes:
+            await asyncio.wait(list(self._flushes))
+        if self.failed_operations:
+            failed_operations, self.failed_operations = self.failed_operations, []
+            raise BatchWriteError(
+                "Failed to write {} items".format(len(failed_operations)),
+                failed_operations=failed_operations
+            )
+
+    async def _flush(self):
+        """
+        Writes the pending operations, in a background task if the batch has a concurrency
+        """
+        if self.concurrency is None:
+            return await self._write(self._take_pending_operations())
+
+        if self._flush_slots is None:
+            self._flush_slots = asyncio.Semaphore(self.concurrency)
+        await self._flush_slots.acquire()
+        task = asyncio.ensure_future(self._write_in_background(self._take_pending_operations()))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write_in_background(self, operations):
+        try:
+            await self._write(operations)
+        except Exception as e:
+            log.warning("%s failed to write %s items in the background: %s", self.model, len(operations), e)
+            self._record_failures(operations, e)
+        finally:
+            self._flush_slots.release()
+
+    def _record_failures(self, operations, error):
+        """
+        Records the operations which `error` failed: the unprocessed ones, or all of them
+        """
+        attrs_name = pythonic(ATTRIBUTES)
+        for operation in operations:
+            if isinstance(error, UnprocessedItemsError):
+                attributes = operation['item']._serialize(attr_map=True, null_check=False)[attrs_name]
+                if operation['action'] == PUT:
+                    failed = attributes in error.put_items
+                else:
+                    failed = any(
+                        all(attributes.get(name) == value for name, value in key.items()) for key in error.delete_items
+                    )
+                if not failed:
+                    continue
+            self.failed_operations.append(dict(operation, error=error))
+
+    def _take_pending_operations(self):
+        operations = self.pending_operations
+        self.pending_operations = []
+        return operations
+
+    async def _write(self, operations):
+        """
+        Writes `operations` and forgets the cached copies of their items
         """
         log.debug("%s committing batch operation", self.model)
         put_items = []
         delete_items = []
         attrs_name = pythonic(ATTRIBUTES)
-        for item in self.pending_operations:
+        for item in operations:
             if item['action'] == PUT:
                 put_items.append(item['item']._serialize(attr_map=True)[attrs_name])
             elif item['action'] == DELETE:
                 delete_items.append(item['item']._get_keys())
-        self.pending_operations = []
         if not len(put_items) and not len(delete_items):
             return
+        try:
+            await self._write_items(put_items, delete_items)
+        finally:
+            for item in operations:
+                item['item']._invalidate_cached_item()
+
+    async def _write_items(self, put_items, delete_items):
+        """
+        Sends a BatchWriteItem request, and sends its unprocessed items again
+        """
         data = await (await self.model._get_connection()).batch_write_item(
             put_items=put_items,
             delete_items=delete_items
         )
         if data is None:
             return
+        retry_policy = self.model._get_unprocessed_retry_policy()
+        started_at = time.monotonic()
+        attempts = 1
         unprocessed_items = data.get(UNPROCESSED_ITEMS, {}).get(self.model.Meta.table_name)
         while unprocessed_items:
             put_items = []
@@ -120,11 +251,21 @@ class BatchWrite(ModelContextManager):
                     put_items.append(item.get(PUT_REQUEST).get(ITEM))
                 elif DELETE_REQUEST in item:
                     delete_items.append(item.get(DELETE_REQUEST).get(KEY))
-            log.info("Resending %s unprocessed keys for batch operation", len(unprocessed_items))
+            backoff_ms = retry_policy.get_backoff_ms(attempts, started_at)
+            retry_policy.record(BATCH_WRITE_ITEM, len(unprocessed_items), exhausted=backoff_ms is None)
+            if backoff_ms is None:
+                raise UnprocessedItemsError(
+                    "Failed to write {} unprocessed items after {} attempts".format(len(unprocessed_items), attempts),
+                    put_items=put_items,
+                    delete_items=delete_items
+                )
+            log.info("Resending %s unprocessed keys for batch operation in %sms", len(unprocessed_items), backoff_ms)
+            await asyncio.sleep(backoff_ms / 1000)
             data = await (await self.model._get_connection()).batch_write_item(
                 put_items=put_items,
                 delete_items=delete_items
             )
+            attempts += 1
             unprocessed_items = data.get(UNPROCESSED_ITEMS, {}).get(self.model.Meta.table_name)
 
 
@@ -142,6 +283,7 @@ class Model(PynamoDBModel, metaclass=MetaModel):
     _range_keyname = None
     _indexes = None
     _connection = None
+    _coalescer = None
     _index_classes = None
     DoesNotExist = DoesNotExist
     _version_attribute_name = None
@@ -163,59 +305,127 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         super(Model, self).__init__(_user_instantiated=_user_instantiated, **attributes)
 
     @classmethod
-    async def batch_get(cls, items, consistent_read=None, attributes_to_get=None):
+    async def batch_get(cls, items, consistent_read=None, attributes_to_get=None, concurrency=1):
         """
         BatchGetItem for this model
 
+        Items are returned in the order their pages complete. Unprocessed keys are sent again
+        with the following page instead of holding back the other pages, after the backoff of
+        `Meta.unprocessed_retry_policy`. UnprocessedKeysError is raised when the policy gives up.
+
         :param items: Should be a list of hash keys to retrieve, or a list of
             tuples if range keys are used.
+        :param concurrency: The number of BatchGetItem pages sent at the same time
         """
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than zero")
         items = list(items)
         hash_key_attribute = cls._hash_key_attribute()
         range_key_attribute = cls._range_key_attribute()
-        keys_to_get = []
+        keys = []
         while items:
-            if len(keys_to_get) == BATCH_GET_PAGE_LIMIT:
-                while keys_to_get:
-                    page, unprocessed_keys = await cls._batch_get_page(
-                        keys_to_get,
-                        consistent_read=consistent_read,
-                        attributes_to_get=attributes_to_get
-                    )
-                    for batch_item in page:
-                        yield cls.from_raw_data(batch_item)
-                    if unprocessed_keys:
-                        keys_to_get = unprocessed_keys
-                    else:
-                        keys_to_get = []
             item = items.pop()
             if range_key_attribute:
                 hash_key, range_key = cls._serialize_keys(item[0], item[1])
-                keys_to_get.append({
+                keys.append({
                     hash_key_attribute.attr_name: hash_key,
                     range_key_attribute.attr_name: range_key
                 })
             else:
                 hash_key = cls._serialize_keys(item)[0]
-                keys_to_get.append({
+                keys.append({
                     hash_key_attribute.attr_name: hash_key
                 })
 
-        while keys_to_get:
-            page, unprocessed_keys = await cls._batch_get_page(
-                keys_to_get,
+        negative_cache = cls._get_negative_cache()
+        if negative_cache is None:
+            async for item_data in cls._batch_get_raw(keys, consistent_read, attributes_to_get, concurrency):
+                yield cls._from_raw_data_profiled(item_data, BATCH_GET_ITEM)
+            return
+
+        # keys known to be missing are not requested, and the keys which turn out missing are remembered
+        generation = negative_cache.generation
+        missing_keys = {}
+        for key in keys:
+            cache_key = cls._get_raw_item_key(key)
+            if consistent_read or not negative_cache.get(cache_key):
+                missing_keys[cls._normalize_item_key(*cache_key)] = cache_key
+        keys = [key for key in keys if cls._normalize_item_key(*cls._get_raw_item_key(key)) in missing_keys]
+        if attributes_to_get is not None:
+            # the keys are needed to tell which items are missing
+            attributes_to_get = list(attributes_to_get) + [
+                name for name in cls._get_key_attr_names() if name not in attributes_to_get
+            ]
+        async for item_data in cls._batch_get_raw(keys, consistent_read, attributes_to_get, concurrency):
+            missing_keys.pop(cls._normalize_item_key(*cls._get_raw_item_key(item_data)), None)
+            yield cls._from_raw_data_profiled(item_data, BATCH_GET_ITEM)
+        for cache_key in missing_keys.values():
+            negative_cache.set(cache_key, True, generation=generation)
+
+    @classmethod
+    async def _batch_get_raw(cls, keys, consistent_read, attributes_to_get, concurrency=1):
+        """
+        Yields the raw attribute maps of the items of `keys`, sending up to `concurrency` BatchGetItem pages at once
+
+        :param keys: A list of serialized keys
+        """
+        # a key is queued with the number of times it was sent and the time before which it must not be resent
+        keys_to_get = collections.deque((key, 0, 0) for key in keys)
+
+        async def get_page(page_keys, not_before):
+            delay = not_before - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return await cls._batch_get_page(
+                page_keys,
                 consistent_read=consistent_read,
                 attributes_to_get=attributes_to_get
             )
-            for batch_item in page:
-                yield cls.from_raw_data(batch_item)
-            if unprocessed_keys:
-                keys_to_get = unprocessed_keys
-            else:
-                keys_to_get = []
+
+        retry_policy = cls._get_unprocessed_retry_policy()
+        started_at = time.monotonic()
+        pending = {}
+        try:
+            while keys_to_get or pending:
+                while keys_to_get and len(pending) < concurrency:
+                    entries = [keys_to_get.popleft() for _ in range(min(BATCH_GET_PAGE_LIMIT, len(keys_to_get)))]
+                    page_keys = [key for key, _, _ in entries]
+                    task = asyncio.ensure_future(get_page(page_keys, max(not_before for _, _, not_before in entries)))
+                    pending[task] = (page_keys, max(attempts for _, attempts, _ in entries) + 1)
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pages = []
+                exhausted_keys = []
+                for task in done:
+                    page_keys, attempts = pending.pop(task)
+                    page, unprocessed_keys = task.result()
+                    pages.append(page)
+                    if not unprocessed_keys:
+                        continue
+                    backoff_ms = retry_policy.get_backoff_ms(attempts, started_at)
+                    retry_policy.record(BATCH_GET_ITEM, len(unprocessed_keys), exhausted=backoff_ms is None)
+                    if backoff_ms is None:
+                        exhausted_keys.extend(unprocessed_keys)
+                        continue
+                    log.info("Resending %s unprocessed keys for batch get in %sms", len(unprocessed_keys), backoff_ms)
+                    not_before = time.monotonic() + backoff_ms / 1000
+                    keys_to_get.extendleft((key, attempts, not_before) for key in reversed(unprocessed_keys))
+                for page in pages:
+                    for batch_item in page:
+                        yield batch_item
+                if exhausted_keys:
+                    unprocessed_keys = exhausted_keys + [key for key, _, _ in keys_to_get]
+                    for page_keys, _ in pending.values():
+                        unprocessed_keys.extend(page_keys)
+                    raise UnprocessedKeysError(
+                        "Failed to get {} unprocessed keys".format(len(unprocessed_keys)),
+                        unprocessed_keys=unprocessed_keys
+                    )
+        finally:
+            for task in pending:
+                task.cancel()
 
     @classmethod
-    def batch_write(cls, auto_commit=True):
+    def batch_write(cls, auto_commit=True, concurrency=None):
         """
         Returns a BatchWrite context manager for a batch operation.
 
@@ -224,8 +434,10 @@ class Model(PynamoDBModel, metaclass=MetaModel):
                             in the DynamoDB API (see BatchWrite). Regardless of the value
                             passed here, changes automatically commit on context exit
                             (whether successful or not).
+        :param concurrency: If set, full batches are written in the background, with at most
+                            this many BatchWriteItem calls in flight.
         """
-        return BatchWrite(cls, auto_commit=auto_commit)
+        return BatchWrite(cls, auto_commit=auto_commit, concurrency=concurrency)
 
     def __repr__(self):
         if self.Meta.table_name:
@@ -246,7 +458,10 @@ class Model(PynamoDBModel, metaclass=MetaModel):
             condition &= version_condition
 
         kwargs.update(condition=condition)
-        return await (await self._get_connection()).delete_item(*args, **kwargs)
+        try:
+            return await (await self._get_connection()).delete_item(*args, **kwargs)
+        finally:
+            self._invalidate_cached_item()
 
     async def update(self, actions, condition=None):
         """
@@ -272,12 +487,17 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         kwargs.update(condition=condition)
         kwargs.update(actions=actions)
 
-        data = await (await self._get_connection()).update_item(*args, **kwargs)
+        try:
+            data = await (await self._get_connection()).update_item(*args, **kwargs)
+        finally:
+            self._invalidate_cached_item()
         for name, value in data[ATTRIBUTES].items():
             attr_name = self._dynamo_to_python_attr(name)
             attr = self.get_attributes().get(attr_name)
             if attr:
                 setattr(self, attr_name, attr.deserialize(attr.get_value(value)))
+        # the update may have moved the item under other index hash keys
+        self._invalidate_cached_queries()
         return data
 
     async def save(self, condition=None):
@@ -289,7 +509,10 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         if version_condition is not None:
             condition &= version_condition
         kwargs.update(condition=condition)
-        data = await (await self._get_connection()).put_item(*args, **kwargs)
+        try:
+            data = await (await self._get_connection()).put_item(*args, **kwargs)
+        finally:
+            self._invalidate_cached_item()
         self.update_local_version_attribute()
         return data
 
@@ -300,11 +523,23 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         :param consistent_read: If True, then a consistent read is performed.
         """
         args, kwargs = self._get_save_args(attributes=False)
+        item_cache = self._get_item_cache()
+        if item_cache is not None:
+            cache_key = (args[0], kwargs.get(pythonic(RANGE_KEY)))
+            if not consistent_read:
+                item_data = item_cache.get(cache_key)
+                if item_data is not None:
+                    self._deserialize(item_data)
+                    return
+            generation = item_cache.generation
+
         kwargs.setdefault('consistent_read', consistent_read)
         attrs = await (await self._get_connection()).get_item(*args, **kwargs)
         item_data = attrs.get(ITEM, None)
         if item_data is None:
             raise self.DoesNotExist("This item does not exist in the table.")
+        if item_cache is not None:
+            item_cache.set(cache_key, item_data, generation=generation)
         self._deserialize(item_data)
 
     async def get_operation_kwargs_from_instance(self,
@@ -356,6 +591,8 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         """
         Returns a single object using the provided keys
 
+        With `Meta.get_coalescing_window`, concurrent calls are grouped into BatchGetItem requests.
+
         :param hash_key: The hash key of the desired item
         :param range_key: The range key of the desired item, only used when appropriate.
         :param consistent_read
@@ -363,6 +600,46 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         """
         hash_key, range_key = cls._serialize_keys(hash_key, range_key)
 
+        # projected items are neither served from nor stored in the item cache
+        item_cache = cls._get_item_cache() if attributes_to_get is None else None
+        if item_cache is not None:
+            if not consistent_read:
+                item_data = item_cache.get((hash_key, range_key))
+                if item_data is not None:
+                    return cls._from_raw_data_profiled(item_data, GET_ITEM)
+            generation = item_cache.generation
+        negative_cache = cls._get_negative_cache()
+        if negative_cache is not None:
+            if not consistent_read and negative_cache.get((hash_key, range_key)):
+                raise cls.DoesNotExist()
+            negative_generation = negative_cache.generation
+
+        item_data = await cls._get_item_data(hash_key, range_key, consistent_read, attributes_to_get)
+        if not item_data:
+            if negative_cache is not None:
+                negative_cache.set((hash_key, range_key), True, generation=negative_generation)
+            raise cls.DoesNotExist()
+        if item_cache is not None:
+            item_cache.set((hash_key, range_key), item_data, generation=generation)
+        return cls._from_raw_data_profiled(item_data, GET_ITEM)
+
+    @classmethod
+    async def _get_item_data(cls, hash_key, range_key, consistent_read, attributes_to_get):
+        """
+        Returns the raw attribute map of an item, or None if it does not exist
+
+        :param hash_key: The serialized hash key
+        :param range_key: The serialized range key
+        """
+        coalescer = cls._get_coalescer()
+        if coalescer is not None:
+            return await coalescer.get(
+                hash_key,
+                range_key=range_key,
+                consistent_read=consistent_read,
+                attributes_to_get=attributes_to_get
+            )
+
         data = await (await cls._get_connection()).get_item(
             hash_key,
             range_key=range_key,
@@ -370,10 +647,8 @@ class Model(PynamoDBModel, metaclass=MetaModel):
             attributes_to_get=attributes_to_get
         )
         if data:
-            item_data = data.get(ITEM)
-            if item_data:
-                return cls.from_raw_data(item_data)
-        raise cls.DoesNotExist()
+            return data.get(ITEM)
+        return None
 
     @classmethod
     async def count(cls,
@@ -392,7 +667,8 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         :param filter_condition: Condition used to restrict the query results
         :param consistent_read: If True, a consistent read is performed
         :param index_name: If set, then this index is used
-        :param rate_limit: If set then consumed capacity will be limited to this amount per second
+        :param rate_limit: If set then consumed capacity will be limited to this amount per second.
+            A RateLimiter may be given to share the limit with other operations.
         """
         if hash_key is None:
             if filter_condition is not None:
@@ -440,7 +716,10 @@ class Model(PynamoDBModel, metaclass=MetaModel):
                     last_evaluated_key=None,
                     attributes_to_get=None,
                     page_size=None,
-                    rate_limit=None):
+                    rate_limit=None,
+                    prefetch=None,
+                    raw=False,
+                    as_rows=False):
         """
         Provides a high level query API
 
@@ -455,7 +734,16 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         :param last_evaluated_key: If set, provides the starting point for query.
         :param attributes_to_get: If set, only returns these elements
         :param page_size: Page size of the query to DynamoDB
-        :param rate_limit: If set then consumed capacity will be limited to this amount per second
+        :param rate_limit: If set then consumed capacity will be limited to this amount per second.
+            A RateLimiter may be given to share the limit with other operations.
+        :param prefetch: If set, up to this many pages are requested ahead while the results are consumed.
+            Call `aclose()` on the result to cancel them if it is abandoned before it is exhausted.
+        :param raw: If True, the results are the attribute maps returned by DynamoDB, not models
+        :param as_rows: If True, the results are read-only rows, which take less memory than models.
+            `to_model()` returns the model of a row.
+
+        The results may also be consumed a page at a time, as lists, with `pages()` on the result.
+        If `Meta.query_cache` is set, the pages of queries which are not consistent reads are cached.
         """
         cls._get_indexes()
         if index_name:
@@ -478,13 +766,31 @@ class Model(PynamoDBModel, metaclass=MetaModel):
             attributes_to_get=attributes_to_get,
         )
 
+        query_cache = cls._get_query_cache()
+        cache_key = None
+        conditions = (range_key_condition, filter_condition)
+        # conditions which are not Condition instances are rejected by the connection
+        if query_cache is not None and not consistent_read and \
+                all(condition is None or isinstance(condition, Condition) for condition in conditions):
+            cache_key = (
+                (index_name, hash_key),
+                get_condition_key(*conditions),
+                scan_index_forward,
+                tuple(attributes_to_get) if attributes_to_get is not None else None,
+            )
+        else:
+            query_cache = None
+
         return ResultIterator(
             (await cls._get_connection()).query,
             query_args,
             query_kwargs,
-            map_fn=cls.from_raw_data,
+            map_fn=cls._get_result_map_fn(raw, as_rows),
             limit=limit,
-            rate_limit=rate_limit
+            rate_limit=rate_limit,
+            prefetch=prefetch,
+            cache=query_cache,
+            cache_key=cache_key,
         )
 
     @classmethod
@@ -497,7 +803,10 @@ class Model(PynamoDBModel, metaclass=MetaModel):
                    page_size=None,
                    consistent_read=None,
                    index_name=None,
-                   rate_limit=None):
+                   rate_limit=None,
+                   prefetch=None,
+                   raw=False,
+                   as_rows=False):
         """
         Iterates through all items in the table
 
@@ -509,7 +818,15 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         :param page_size: Page size of the scan to DynamoDB
         :param consistent_read: If True, a consistent read is performed
         :param index_name: If set, then this index is used
-        :param rate_limit: If set then consumed capacity will be limited to this amount per second
+        :param rate_limit: If set then consumed capacity will be limited to this amount per second.
+            A RateLimiter may be given to share the limit with other operations.
+        :param prefetch: If set, up to this many pages are requested ahead while the results are consumed.
+            Call `aclose()` on the result to cancel them if it is abandoned before it is exhausted.
+        :param raw: If True, the results are the attribute maps returned by DynamoDB, not models
+        :param as_rows: If True, the results are read-only rows, which take less memory than models.
+            `to_model()` returns the model of a row.
+
+        The results may also be consumed a page at a time, as lists, with `pages()` on the result.
         """
         if page_size is None:
             page_size = limit
@@ -529,11 +846,139 @@ class Model(PynamoDBModel, metaclass=MetaModel):
             (await cls._get_connection()).scan,
             scan_args,
             scan_kwargs,
+            map_fn=cls._get_result_map_fn(raw, as_rows),
+            limit=limit,
+            rate_limit=rate_limit,
+            prefetch=prefetch,
+        )
+
+    @classmethod
+    async def parallel_scan(cls,
+                            total_segments,
+                            concurrency=None,
+                            filter_condition=None,
+                            limit=None,
+                            last_evaluated_keys=None,
+                            page_size=None,
+                            consistent_read=None,
+                            index_name=None,
+                            rate_limit=None,
+                            max_buffered_pages=None):
+        """
+        Iterates through all items in the table, scanning its segments concurrently
+
+        Items are returned in the order their pages arrive, not in the order of the segments.
+
+        :param total_segments: The number of segments the table is divided in
+        :param concurrency: The number of segments scanned at the same time. Defaults to `total_segments`
+        :param filter_condition: Condition used to restrict the scan results
+        :param limit: Used to limit the number of results returned
+        :param last_evaluated_keys: If set, the `last_evaluated_keys` of the parallel scan to resume.
+            Only the segments it contains are scanned.
+        :param page_size: Page size of the scan to DynamoDB
+        :param consistent_read: If True, a consistent read is performed
+        :param index_name: If set, then this index is used
+        :param rate_limit: If set then consumed capacity of all the segments together will be limited to
+            this amount per second. A RateLimiter may be given to share the limit with other operations.
+        :param max_buffered_pages: The number of pages fetched ahead of the consumer. Defaults to `concurrency`
+        """
+        scan_kwargs = dict(
+            filter_condition=filter_condition,
+            limit=page_size,
+            consistent_read=consistent_read,
+            index_name=index_name
+        )
+
+        return ParallelScanIterator(
+            (await cls._get_connection()).scan,
+            (),
+            scan_kwargs,
+            total_segments,
+            concurrency=concurrency,
             map_fn=cls.from_raw_data,
             limit=limit,
             rate_limit=rate_limit,
+            last_evaluated_keys=last_evaluated_keys,
+            max_buffered_pages=max_buffered_pages,
         )
 
+    @classmethod
+    async def scan_columns(cls,
+                           attributes,
+                           filter_condition=None,
+                           segment=None,
+                           total_segments=None,
+                           limit=None,
+                           page_size=None,
+                           consistent_read=None,
+                           index_name=None,
+                           rate_limit=None,
+                           prefetch=None,
+                           as_numpy=False):
+        """
+        Scans the values of `attributes` in all items in the table, into one column per attribute
+
+        Only `attributes` are requested. Their values are appended to the columns page by page, with no model
+        built for the items, see `ColumnBatch`.
+
+        :param attributes: The python names of the attributes to scan
+        :param filter_condition: Condition used to restrict the scan results
+        :param segment: If set, then scans the segment
+        :param total_segments: If set, then specifies total segments
+        :param limit: Used to limit the number of results returned
+        :param page_size: Page size of the scan to DynamoDB
+        :param consistent_read: If True, a consistent read is performed
+        :param index_name: If set, then this index is used
+        :param rate_limit: If set then consumed capacity will be limited to this amount per second.
+            A RateLimiter may be given to share the limit with other operations.
+        :param prefetch: If set, up to this many pages are requested ahead while the columns are filled.
+        :param as_numpy: If True, the columns are returned as NumPy arrays, which requires NumPy
+        """
+        model_attributes = cls.get_attributes()
+        fillers = {}
+        for name in attributes:
+            if name not in model_attributes:
+                raise ValueError("{} has no attribute {!r}".format(cls.__name__, name))
+            fillers[name] = ColumnFiller(model_attributes[name])
+        if page_size is None:
+            page_size = limit
+
+        scan_kwargs = dict(
+            filter_condition=filter_condition,
+            attributes_to_get=[filler.attr_name for filler in fillers.values()],
+            segment=segment,
+            limit=page_size,
+            total_segments=total_segments,
+            consistent_read=consistent_read,
+            index_name=index_name
+        )
+        page_iter = PageIterator(
+            (await cls._get_connection()).scan,
+            (),
+            scan_kwargs,
+            rate_limit=rate_limit,
+            prefetch=prefetch,
+            limit=limit,
+        )
+
+        columns = {name: filler.new_column() for name, filler in fillers.items()}
+        count = 0
+        try:
+            async for page in page_iter:
+                items = page.get(ITEMS, [])
+                if limit is not None and count + len(items) > limit:
+                    items = items[:limit - count]
+                for name, filler in fillers.items():
+                    filler.fill(columns[name], items)
+                count += len(items)
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            await page_iter.aclose()
+
+        batch = ColumnBatch(columns, count)
+        return batch.to_numpy() if as_numpy else batch
+
     @classmethod
     async def exists(cls):
         """
@@ -597,6 +1042,62 @@ class Model(PynamoDBModel, metaclass=MetaModel):
                     cls._indexes[pythonic(LOCAL_SECONDARY_INDEXES)].append(idx)
         return cls._indexes
 
+    @classmethod
+    def _get_meta_table(cls):
+        """
+        Builds the MetaTable of this model's table from the model definition, without calling DescribeTable
+        """
+        schema = cls._get_schema()
+        index_data = cls._get_indexes()
+        attr_definitions = []
+        attr_names = set()
+        for attr in schema.get(pythonic(ATTR_DEFINITIONS)) + index_data.get(pythonic(ATTR_DEFINITIONS)):
+            attr_name = attr.get(pythonic(ATTR_NAME))
+            if attr_name not in attr_names:
+                attr_definitions.append({ATTR_NAME: attr_name, ATTR_TYPE: attr.get(pythonic(ATTR_TYPE))})
+                attr_names.add(attr_name)
+        data = {
+            TABLE_NAME: cls.Meta.table_name,
+            KEY_SCHEMA: [
+                {ATTR_NAME: key.get(pythonic(ATTR_NAME)), KEY_TYPE: key.get(pythonic(KEY_TYPE))}
+                for key in schema.get(pythonic(KEY_SCHEMA))
+            ],
+            ATTR_DEFINITIONS: attr_definitions,
+        }
+        for indexes_key in (GLOBAL_SECONDARY_INDEXES, LOCAL_SECONDARY_INDEXES):
+            indexes = index_data.get(pythonic(indexes_key))
+            if indexes:
+                data[indexes_key] = [
+                    {
+                        INDEX_NAME: index.get(pythonic(INDEX_NAME)),
+                        KEY_SCHEMA: index.get(pythonic(KEY_SCHEMA)),
+                        PROJECTION: index.get(pythonic(PROJECTION)),
+                    }
+                    for index in indexes
+                ]
+        return MetaTable(data)
+
+    @classmethod
+    async def _check_meta_table(cls, meta_table):
+        """
+        Compares a MetaTable built from the model definition with the result of DescribeTable
+
+        A schema drift is logged, and the described MetaTable replaces the local one.
+        """
+        try:
+            described = MetaTable(await (await cls._get_connection()).describe_table())
+        except Exception as e:
+            log.warning("Unable to check the schema of table %s: %s", cls.Meta.table_name, e)
+            return
+        if _get_key_schema_signature(described) != _get_key_schema_signature(meta_table):
+            log.warning(
+                "Schema of table %s does not match model %s: table %s, model %s",
+                cls.Meta.table_name,
+                cls.__name__,
+                _get_key_schema_signature(described),
+                _get_key_schema_signature(meta_table)
+            )
+
     @classmethod
     async def create_table(cls, wait=False, read_capacity_units=None, write_capacity_units=None, billing_mode=None,
                            ignore_update_ttl_errors=False):
@@ -700,6 +1201,182 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         with open(filename, 'r') as inf:
             await cls.loads(inf.read())
 
+    @classmethod
+    def _get_item_cache(cls):
+        """
+        Returns the ItemCache of `Meta.item_cache`, if any
+        """
+        return getattr(cls.Meta, 'item_cache', None)
+
+    @classmethod
+    def _get_negative_cache(cls):
+        """
+        Returns the ItemCache of `Meta.negative_cache`, which remembers the keys of missing items, if any
+        """
+        return getattr(cls.Meta, 'negative_cache', None)
+
+    @classmethod
+    def _get_raw_item_key(cls, item_data):
+        """
+        Returns the serialized hash and range keys of a raw attribute map, or of a key of BatchGetItem
+        """
+        hash_key_attribute = cls._hash_key_attribute()
+        range_key_attribute = cls._range_key_attribute()
+
+        def get_value(attribute):
+            value = item_data[attribute.attr_name]
+            return attribute.get_value(value) if isinstance(value, dict) else value
+
+        return get_value(hash_key_attribute), get_value(range_key_attribute) if range_key_attribute else None
+
+    @classmethod
+    def _normalize_item_key(cls, hash_key, range_key=None):
+        """
+        Returns serialized hash and range keys which compare equal when they are the same key to DynamoDB,
+        as numbers may be serialized differently, such as '1' and '1.0'
+        """
+        if cls._hash_key_attribute().attr_type == NUMBER:
+            hash_key = Decimal(hash_key)
+        range_key_attribute = cls._range_key_attribute()
+        if range_key is not None and range_key_attribute and range_key_attribute.attr_type == NUMBER:
+            range_key = Decimal(range_key)
+        return hash_key, range_key
+
+    @classmethod
+    def _get_key_attr_names(cls):
+        """
+        Returns the DynamoDB names of the hash key attribute and, if the table has one, of the range key attribute
+        """
+        names = [cls._hash_key_attribute().attr_name]
+        range_key_attribute = cls._range_key_attribute()
+        if range_key_attribute:
+            names.append(range_key_attribute.attr_name)
+        return names
+
+    @classmethod
+    def from_raw_data(cls, data):
+        """
+        Returns an instance of this class from the raw data
+
+        The attributes are deserialized by the function generated for this class, see `ModelSerializer`.
+        If `Meta.lazy_attributes` is set, each attribute is only deserialized when it is first accessed.
+
+        :param data: A serialized DynamoDB object
+        """
+        if data is None:
+            raise ValueError("Received no data to construct object")
+        if not getattr(cls.Meta, 'lazy_attributes', False):
+            return get_serializer(cls).deserialize(data)
+
+        attributes = cls.get_attributes()
+        raw_values = {}
+        for name, value in data.items():
+            attr_name = cls._dynamo_to_python_attr(name)
+            if attr_name in attributes:
+                raw_values[attr_name] = value
+        instance = cls(_user_instantiated=False)
+        attribute_values = LazyAttributeValues(raw_values, attributes)
+        for attr_name, value in instance.attribute_values.items():
+            if attr_name not in raw_values:
+                dict.__setitem__(attribute_values, attr_name, value)
+        instance.attribute_values = attribute_values
+        return instance
+
+    def _serialize(self, attr_map=False, null_check=True):
+        """
+        Serializes all model attributes for use with DynamoDB, with the function generated for this class
+
+        :param attr_map: If True, then attributes are returned
+        :param null_check: If True, then attributes are checked for null
+        """
+        return get_serializer(type(self)).serialize(self, attr_map, null_check)
+
+    @classmethod
+    def _get_result_map_fn(cls, raw, as_rows):
+        """
+        Returns the function building the query or scan results from the items returned by DynamoDB
+        """
+        if raw and as_rows:
+            raise ValueError("raw and as_rows cannot both be set")
+        if raw:
+            return None
+        if as_rows:
+            return get_row_class(cls).from_raw_data
+        return cls.from_raw_data
+
+    @classmethod
+    def _from_raw_data_profiled(cls, item_data, operation_name):
+        """
+        Returns an instance built from a raw attribute map, timed as the deserialization of `operation_name`
+        while a Profiler is active
+        """
+        if not is_profiling():
+            return cls.from_raw_data(item_data)
+        started_at = time.perf_counter()
+        item = cls.from_raw_data(item_data)
+        record_phase(cls.Meta.table_name, operation_name, DESERIALIZE, time.perf_counter() - started_at)
+        return item
+
+    @classmethod
+    def _get_query_cache(cls):
+        """
+        Returns the QueryCache of `Meta.query_cache`, if any
+        """
+        return getattr(cls.Meta, 'query_cache', None)
+
+    def _invalidate_cached_item(self):
+        """
+        Forgets the cached copy of this item, or that it is missing, after it was written
+        """
+        self._invalidate_cached_queries()
+        item_cache = self._get_item_cache()
+        negative_cache = self._get_negative_cache()
+        if item_cache is None and negative_cache is None:
+            return
+        args, kwargs = self._get_save_args(attributes=False, null_check=False)
+        cache_key = (args[0], kwargs.get(pythonic(RANGE_KEY)))
+        if item_cache is not None:
+            item_cache.invalidate(cache_key)
+        if negative_cache is not None:
+            negative_cache.invalidate(cache_key)
+
+    def _invalidate_cached_queries(self):
+        """
+        Forgets the cached query pages of the table and index hash keys of this item, after it was written
+        """
+        query_cache = self._get_query_cache()
+        if query_cache is None or not query_cache.invalidate_on_write:
+            return
+        attributes = self._serialize(attr_map=True, null_check=False)[pythonic(ATTRIBUTES)]
+        hash_key_attribute = self._hash_key_attribute()
+        hash_keys = [(None, hash_key_attribute, attributes.get(hash_key_attribute.attr_name))]
+        self._get_indexes()
+        for index_name, index in self._index_classes.items():
+            hash_key_attribute = index._hash_key_attribute()
+            hash_keys.append((index_name, hash_key_attribute, attributes.get(hash_key_attribute.attr_name)))
+        for index_name, hash_key_attribute, value in hash_keys:
+            if value is not None:
+                query_cache.invalidate_hash_key((index_name, hash_key_attribute.get_value(value)))
+
+    @classmethod
+    def _get_coalescer(cls):
+        """
+        Returns the coalescer grouping `get` calls into BatchGetItem requests, if `Meta.get_coalescing_window` is set
+        """
+        window = getattr(cls.Meta, 'get_coalescing_window', None)
+        if window is None:
+            return None
+        if cls._coalescer is None or cls._coalescer._model is not cls:
+            cls._coalescer = GetCoalescer(cls, window=window)
+        return cls._coalescer
+
+    @classmethod
+    def _get_unprocessed_retry_policy(cls):
+        """
+        Returns the policy deciding when unprocessed keys or items of batch operations are sent again
+        """
+        return getattr(cls.Meta, 'unprocessed_retry_policy', default_unprocessed_retry_policy)
+
     @classmethod
     async def _batch_get_page(cls, keys_to_get, consistent_read, attributes_to_get):
         """
@@ -751,5 +1428,23 @@ class Model(PynamoDBModel, metaclass=MetaModel):
                                                                extra_headers=cls.Meta.extra_headers,
                                                                aws_access_key_id=cls.Meta.aws_access_key_id,
                                                                aws_secret_access_key=cls.Meta.aws_secret_access_key,
-                                                               aws_session_token=cls.Meta.aws_session_token)
+                                                               aws_session_token=cls.Meta.aws_session_token,
+                                                               deduplicate_reads=getattr(
+                                                                   cls.Meta, 'deduplicate_reads', False),
+                                                               metrics=getattr(cls.Meta, 'metrics', None),
+                                                               lean_dispatch=getattr(
+                                                                   cls.Meta, 'lean_dispatch', False),
+                                                               trusted_input=getattr(
+                                                                   cls.Meta, 'trusted_input', False))
+            if getattr(cls.Meta, 'read_rate_limit', None):
+                set_table_rate_limit(cls.Meta.table_name, READ, cls.Meta.read_rate_limit)
+            if getattr(cls.Meta, 'write_rate_limit', None):
+                set_table_rate_limit(cls.Meta.table_name, WRITE, cls.Meta.write_rate_limit)
+            if getattr(cls.Meta, 'local_meta_table', False):
+                meta_table = cls._get_meta_table()
+                cls._connection.add_meta_table(meta_table)
+                if getattr(cls.Meta, 'check_meta_table', False):
+                    task = asyncio.ensure_future(cls._check_meta_table(meta_table))
+                    _meta_table_checks.add(task)
+                    task.add_done_callback(_meta_table_checks.discard)
         return cls._connection
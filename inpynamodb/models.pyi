@@ -5,10 +5,12 @@ from pynamodb.exceptions import DoesNotExist as DoesNotExist
 from pynamodb.expressions.condition import Condition
 
 from pynamodb.models import MetaModel, Model as PynamoDBModel
-from typing import Any, Dict, Optional, Text, TypeVar, Union, Tuple, Type, Iterable, Sequence, Iterator, Generic, List
+from typing import Any, Dict, Optional, Text, TypeVar, Union, Tuple, Type, Iterable, Sequence, Iterator, Generic, List, \
+    AsyncIterator
 
+from inpynamodb.columns import ColumnBatch
 from inpynamodb.connection import TableConnection
-from inpynamodb.pagination import ResultIterator
+from inpynamodb.pagination import RateLimiter, ResultIterator, ParallelScanIterator
 
 log: Any
 
@@ -26,6 +28,9 @@ class ModelContextManager(Generic[_T]):
 
 
 class BatchWrite(Generic[_T], ModelContextManager[_T]):
+    concurrency: Optional[int]
+    failed_operations: List[Dict[Text, Any]]
+    def __init__(self, model: Type[_T], auto_commit: bool = ..., concurrency: Optional[int] = ...) -> None: ...
     async def save(self, put_item: _T) -> None: ...
     async def delete(self, del_item: _T) -> None: ...
     async def __aenter__(self) -> BatchWrite[_T]: ...
@@ -43,9 +48,15 @@ class Model(PynamoDBModel, metaclass=MetaModel):
 
     def __init__(self, hash_key: Optional[Any] = ..., range_key: Optional[Any] = ..., _user_instantiated: bool = ..., **attributes: Any) -> None: ...
     @classmethod
-    async def batch_get(cls: Type[_T], items: Iterable[Union[KeyType, Iterable[KeyType]]], consistent_read: Optional[bool] = ..., attributes_to_get: Optional[Sequence[Text]] = ...) -> Iterator[_T]: ...
+    def batch_get(
+        cls: Type[_T],
+        items: Iterable[Union[KeyType, Iterable[KeyType]]],
+        consistent_read: Optional[bool] = ...,
+        attributes_to_get: Optional[Sequence[Text]] = ...,
+        concurrency: int = ...,
+    ) -> AsyncIterator[_T]: ...
     @classmethod
-    def batch_write(cls: Type[_T], auto_commit: bool = ...) -> BatchWrite[_T]: ...
+    def batch_write(cls: Type[_T], auto_commit: bool = ..., concurrency: Optional[int] = ...) -> BatchWrite[_T]: ...
     async def delete(self, condition: Optional[Any] = ...) -> Any: ...
     async def update(self, actions: List[Any], condition: Optional[Condition] = ...) -> Any: ...
     async def save(self, condition: Optional[Condition] = ...) -> Dict[str, Any]: ...
@@ -61,7 +72,7 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         consistent_read: bool = ...,
         index_name: Optional[Text] = ...,
         limit: Optional[int] = ...,
-        rate_limit: Optional[float] = ...,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
     ) -> int: ...
     @classmethod
     async def query(
@@ -76,7 +87,10 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         last_evaluated_key: Optional[Dict[Text, Dict[Text, Any]]] = ...,
         attributes_to_get: Optional[Iterable[Text]] = ...,
         page_size: Optional[int] = ...,
-        rate_limit: Optional[float] = ...,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
+        prefetch: Optional[int] = ...,
+        raw: bool = ...,
+        as_rows: bool = ...,
     ) -> ResultIterator[_T]: ...
 
     @classmethod
@@ -90,9 +104,41 @@ class Model(PynamoDBModel, metaclass=MetaModel):
         page_size: Optional[int] = ...,
         consistent_read: Optional[bool] = ...,
         index_name: Optional[str] = ...,
-        rate_limit: Optional[float] = ...,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
+        prefetch: Optional[int] = ...,
+        raw: bool = ...,
+        as_rows: bool = ...,
     ) -> ResultIterator[_T]: ...
     @classmethod
+    async def parallel_scan(
+        cls: Type[_T],
+        total_segments: int,
+        concurrency: Optional[int] = ...,
+        filter_condition: Optional[Condition] = ...,
+        limit: Optional[int] = ...,
+        last_evaluated_keys: Optional[Dict[int, Optional[Dict[str, Dict[str, Any]]]]] = ...,
+        page_size: Optional[int] = ...,
+        consistent_read: Optional[bool] = ...,
+        index_name: Optional[str] = ...,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
+        max_buffered_pages: Optional[int] = ...,
+    ) -> ParallelScanIterator[_T]: ...
+    @classmethod
+    async def scan_columns(
+        cls: Type[_T],
+        attributes: Iterable[str],
+        filter_condition: Optional[Condition] = ...,
+        segment: Optional[int] = ...,
+        total_segments: Optional[int] = ...,
+        limit: Optional[int] = ...,
+        page_size: Optional[int] = ...,
+        consistent_read: Optional[bool] = ...,
+        index_name: Optional[str] = ...,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
+        prefetch: Optional[int] = ...,
+        as_numpy: bool = ...,
+    ) -> Union[ColumnBatch, Dict[str, Any]]: ...
+    @classmethod
     async def exists(cls: Type[_T]) -> bool: ...
     @classmethod
     async def delete_table(cls): ...
@@ -1,39 +1,59 @@
 import asyncio
+import collections
+import json
 import time
 
 from async_property import async_property
 from pynamodb.constants import TOTAL, LAST_EVALUATED_KEY, SCANNED_COUNT, CONSUMED_CAPACITY, CAPACITY_UNITS, CAMEL_COUNT, \
     ITEMS
 
+from inpynamodb.profiling import DESERIALIZE, PAGINATED_OPERATIONS, is_profiling, record_phase
+
+READ = 'read'
+WRITE = 'write'
+
+
+# The units reserved by `RateLimiter.acquire` until the operation reports the units it consumed
+RESERVED_UNITS = 1
+
 
 class RateLimiter(object):
     """
     RateLimiter limits operations to a pre-set rate of units/seconds
 
+    It is a token bucket which is paid back after each operation with the units it consumed, so a single
+    RateLimiter can be shared by any number of concurrent operations. Each `acquire` reserves one unit until the
+    following `consume`, so operations waiting together are let through one after the other rather than all at once.
+
     Example:
         Initialize a RateLimiter with the desired rate
             rate_limiter = RateLimiter(rate_limit)
 
         Now, every time before calling an operation, call acquire()
-            rate_limiter.acquire()
+            await rate_limiter.acquire()
 
         And after an operation, update the number of units consumed
             rate_limiter.consume(units)
 
     """
-    def __init__(self, rate_limit, time_module=None):
+    def __init__(self, rate_limit, time_module=None, burst=0):
         """
         Initializes a RateLimiter object
 
         :param rate_limit: The desired rate
-        :param time_module: Optional: the module responsible for calculating time. Intended to be used for testing purposes.
+        :param time_module: Optional: the module responsible for calculating time, whose `sleep` is a coroutine
+            function. Intended to be used for testing purposes.
+        :param burst: Optional: the units which may be consumed above the rate after an idle period
         """
         if rate_limit <= 0:
             raise ValueError("rate_limit must be greater than zero")
         self._rate_limit = rate_limit
-        self._consumed = 0
-        self._time_of_last_acquire = 0.0
+        self._burst = burst
+        self._tokens = 0.0
+        self._reserved = 0
+        self._time_of_last_refill = None
         self._time_module = time_module or time
+        self._sleep = time_module.sleep if time_module else asyncio.sleep
 
     def consume(self, units):
         """
@@ -43,17 +63,30 @@ class RateLimiter(object):
 
         :return: None
         """
-        self._consumed += units
+        if self._reserved:
+            self._reserved -= 1
+            units -= RESERVED_UNITS
+        self._tokens -= units
 
-    def acquire(self):
+    async def acquire(self):
         """
-        Sleeps the appropriate amount of time to follow the rate limit restriction
+        Sleeps, without blocking the event loop, the appropriate amount of time to follow the rate limit restriction
 
         :return: None
         """
-        self._time_module.sleep(max(0, self._consumed/float(self.rate_limit) - (self._time_module.time()-self._time_of_last_acquire)))
-        self._consumed = 0
-        self._time_of_last_acquire = self._time_module.time()
+        while True:
+            self._refill()
+            if self._tokens >= 0:
+                self._tokens -= RESERVED_UNITS
+                self._reserved += 1
+                return
+            await self._sleep(-self._tokens / float(self.rate_limit))
+
+    def _refill(self):
+        now = self._time_module.time()
+        if self._time_of_last_refill is not None:
+            self._tokens = min(self._burst, self._tokens + (now - self._time_of_last_refill) * self.rate_limit)
+        self._time_of_last_refill = now
 
     @property
     def rate_limit(self):
@@ -69,48 +102,211 @@ class RateLimiter(object):
         self._rate_limit = rate_limit
 
 
+_table_rate_limiters = {}
+
+
+def set_table_rate_limit(table_name, capacity_type, rate_limit):
+    """
+    Sets the rate limit shared by every read or write operation on `table_name` in this process
+
+    Returns the shared RateLimiter, which may also be passed as `rate_limit` to query or scan.
+
+    :param table_name: The name of the table
+    :param capacity_type: Either READ or WRITE
+    :param rate_limit: The desired rate of capacity units per second, or None to remove the limit
+    """
+    if capacity_type not in (READ, WRITE):
+        raise ValueError("capacity_type must be one of {}".format((READ, WRITE)))
+    key = (table_name, capacity_type)
+    if rate_limit is None:
+        _table_rate_limiters.pop(key, None)
+        return None
+    rate_limiter = _table_rate_limiters.get(key)
+    if rate_limiter is None:
+        rate_limiter = _table_rate_limiters[key] = RateLimiter(rate_limit)
+    else:
+        rate_limiter.rate_limit = rate_limit
+    return rate_limiter
+
+
+def get_table_rate_limiter(table_name, capacity_type):
+    """
+    Returns the RateLimiter shared by read or write operations on `table_name`, or None if there is no limit
+    """
+    if not _table_rate_limiters:
+        return None
+    return _table_rate_limiters.get((table_name, capacity_type))
+
+
+def is_table_rate_limiter(rate_limiter, capacity_type):
+    """
+    Returns True if `rate_limiter` is shared by the read or write operations on a table.
+    The connection acquires and charges it for each request on that table.
+    """
+    key = next((key for key, value in _table_rate_limiters.items() if value is rate_limiter), None)
+    return key is not None and key[1] == capacity_type
+
+
 class PageIterator(object):
     """
     PageIterator handles Query and Scan result pagination.
 
+    With `prefetch`, the following pages are requested in the background while the current page is
+    being consumed, keeping at most `prefetch` pages in flight or buffered.
+    Call `aclose()` to cancel the background requests when the iterator is abandoned before it is exhausted.
+
+    With `cache`, pages are looked up in a `QueryCache` before being requested, under `cache_key`
+    extended with the page size and the key the page starts from.
+
     http://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Query.html#Query.Pagination
     http://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Scan.html#Scan.Pagination
     """
-    def __init__(self, operation, args, kwargs, rate_limit=None):
+    def __init__(self, operation, args, kwargs, rate_limit=None, prefetch=None, limit=None, cache=None,
+                 cache_key=None):
+        """
+        :param prefetch: Optional: the number of pages to request ahead of the consumer
+        :param limit: Optional: the number of items the consumer needs, past which no page is prefetched
+        :param cache: Optional: the `QueryCache` holding the pages
+        :param cache_key: The key of the request in `cache`, starting with its (index name, serialized hash key)
+        """
+        if prefetch is not None and prefetch < 0:
+            raise ValueError("prefetch must not be negative")
         self._operation = operation
         self._args = args
         self._kwargs = kwargs
         self._first_iteration = True
         self._last_evaluated_key = kwargs.get('exclusive_start_key')
+        self._exclusive_start_key = self._last_evaluated_key
         self._total_scanned_count = 0
         self._rate_limiter = None
-        if rate_limit:
+        if isinstance(rate_limit, RateLimiter):
+            self._rate_limiter = rate_limit
+        elif rate_limit:
             self._rate_limiter = RateLimiter(rate_limit)
+        self._prefetch = prefetch
+        self._limit = limit
+        self._prefetched_count = 0
+        self._prefetch_loop = None
+        self._prefetch_task = None
+        self._prefetched_pages = None
+        self._prefetch_slots = None
+        self._prefetch_error = None
+        self._cache = cache
+        self._cache_key = cache_key
 
     def __aiter__(self):
         return self
 
     async def __anext__(self):
-        if self._last_evaluated_key is None and not self._first_iteration:
+        if self._prefetch:
+            page = await self._get_prefetched_page()
+        else:
+            page = await self._fetch_page()
+        self._last_evaluated_key = page.get(LAST_EVALUATED_KEY)
+        self._total_scanned_count += page[SCANNED_COUNT]
+        return page
+
+    async def _fetch_page(self):
+        if self._exclusive_start_key is None and not self._first_iteration:
             raise StopAsyncIteration()
 
         self._first_iteration = False
 
-        self._kwargs['exclusive_start_key'] = self._last_evaluated_key
+        self._kwargs['exclusive_start_key'] = self._exclusive_start_key
+
+        if self._cache is None:
+            page = await self._request_page()
+        else:
+            page_key = self._cache_key + (
+                self._kwargs.get('limit'), json.dumps(self._exclusive_start_key, sort_keys=True)
+            )
+            page = self._cache.get(page_key)
+            if page is None:
+                generation = self._cache.generation
+                page = await self._request_page()
+                self._cache.set(page_key, page, generation=generation)
+        self._exclusive_start_key = page.get(LAST_EVALUATED_KEY)
+        return page
 
-        if self._rate_limiter:
-            await self._rate_limiter.acquire()
+    async def _request_page(self):
+        rate_limiter = self._rate_limiter
+        if rate_limiter and is_table_rate_limiter(rate_limiter, READ):
+            # the connection already acquires and charges the table's limiter for the request
+            rate_limiter = None
+        if rate_limiter:
+            await rate_limiter.acquire()
             self._kwargs['return_consumed_capacity'] = TOTAL
         page = await self._operation(*self._args, **self._kwargs)
-        self._last_evaluated_key = page.get(LAST_EVALUATED_KEY)
-        self._total_scanned_count += page[SCANNED_COUNT]
 
-        if self._rate_limiter:
+        if rate_limiter:
             consumed_capacity = page.get(CONSUMED_CAPACITY, {}).get(CAPACITY_UNITS, 0)
-            self._rate_limiter.consume(consumed_capacity)
+            rate_limiter.consume(consumed_capacity)
 
         return page
 
+    async def _get_prefetched_page(self):
+        if self._prefetch_task is None:
+            self._prefetch_loop = asyncio.get_event_loop()
+            self._prefetched_pages = asyncio.Queue()
+            self._prefetch_slots = asyncio.Semaphore(self._prefetch)
+            self._prefetch_task = asyncio.ensure_future(self._prefetch_pages())
+
+        if self._prefetch_task.done() and self._prefetched_pages.empty():
+            # the prefetching ended and its last entry was handed out: nothing will be queued again
+            if self._prefetch_error is not None:
+                raise self._prefetch_error
+            raise StopAsyncIteration()
+
+        page, exc = await self._prefetched_pages.get()
+        self._prefetch_slots.release()
+        if isinstance(exc, StopAsyncIteration):
+            raise StopAsyncIteration()
+        if exc is not None:
+            self._prefetch_error = exc
+            raise exc
+        if page is None:
+            # The prefetching stopped at the limit: any further page is requested on demand
+            self._prefetch = None
+            return await self._fetch_page()
+        return page
+
+    async def _prefetch_pages(self):
+        """
+        Requests pages one after the other, as each page holds the key the next one starts from
+        """
+        while True:
+            await self._prefetch_slots.acquire()
+            if self._limit is not None and self._prefetched_count >= self._limit:
+                self._prefetched_pages.put_nowait((None, None))
+                return
+            try:
+                page = await self._fetch_page()
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                self._prefetched_pages.put_nowait((None, e))
+                return
+            self._prefetched_count += page[CAMEL_COUNT]
+            self._prefetched_pages.put_nowait((page, None))
+
+    async def aclose(self):
+        """
+        Cancels the pages requested in the background, if any
+        """
+        task = self._prefetch_task
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def __del__(self):
+        # the attributes are missing if __init__ raised
+        task = getattr(self, '_prefetch_task', None)
+        if task is not None and not task.done() and not self._prefetch_loop.is_closed():
+            task.cancel()
+
     @async_property
     async def key_names(self):
         # If the current page has a last_evaluated_key, use it to determine key attributes
@@ -145,8 +341,10 @@ class ResultIterator(object):
     http://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Query.html#Query.Pagination
     http://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Scan.html#Scan.Pagination
     """
-    def __init__(self, operation, args, kwargs, map_fn=None, limit=None, rate_limit = None):
-        self.page_iter = PageIterator(operation, args, kwargs, rate_limit)
+    def __init__(self, operation, args, kwargs, map_fn=None, limit=None, rate_limit=None, prefetch=None, cache=None,
+                 cache_key=None):
+        self.page_iter = PageIterator(operation, args, kwargs, rate_limit, prefetch=prefetch, limit=limit,
+                                      cache=cache, cache_key=cache_key)
         self._first_iteration = True
         self._map_fn = map_fn
         self._limit = limit
@@ -164,6 +362,7 @@ class ResultIterator(object):
 
     async def __anext__(self):
         if self._limit == 0:
+            await self.page_iter.aclose()
             raise StopAsyncIteration
 
         if self._first_iteration:
@@ -178,9 +377,62 @@ class ResultIterator(object):
         if self._limit is not None:
             self._limit -= 1
         if self._map_fn:
-            item = self._map_fn(item)
+            if is_profiling():
+                item = self._map_profiled(item)
+            else:
+                item = self._map_fn(item)
+        return item
+
+    async def pages(self):
+        """
+        Yields the remaining results a page at a time, as lists
+
+        Each page is mapped in one go, sparing the coroutine step that iterating over the results takes per item.
+        The results consumed so far, one at a time or as pages, are not yielded again.
+        """
+        while self._limit != 0:
+            try:
+                if self._first_iteration:
+                    self._first_iteration = False
+                    await self._get_next_page()
+                while self._index == self._count:
+                    await self._get_next_page()
+            except StopAsyncIteration:
+                return
+
+            end = self._count if self._limit is None else min(self._count, self._index + self._limit)
+            items = self._items[self._index:end]
+            if self._limit is not None:
+                self._limit -= end - self._index
+            self._index = end
+            yield self._map_page(items)
+        await self.page_iter.aclose()
+
+    def _map_page(self, items):
+        if not self._map_fn:
+            return items
+        if not is_profiling():
+            return [self._map_fn(item) for item in items]
+        started_at = time.perf_counter()
+        items = [self._map_fn(item) for item in items]
+        self._record_deserialize(time.perf_counter() - started_at)
+        return items
+
+    def _map_profiled(self, item):
+        started_at = time.perf_counter()
+        item = self._map_fn(item)
+        self._record_deserialize(time.perf_counter() - started_at)
         return item
 
+    def _record_deserialize(self, seconds):
+        operation = self.page_iter._operation
+        record_phase(
+            getattr(getattr(operation, '__self__', None), 'table_name', ''),
+            PAGINATED_OPERATIONS.get(operation.__name__, operation.__name__),
+            DESERIALIZE,
+            seconds
+        )
+
     @async_property
     async def last_evaluated_key(self):
         if self._first_iteration or self._index == self._count:
@@ -195,6 +447,178 @@ class ResultIterator(object):
         item = self._items[self._index - 1]
         return {key: item[key] for key in (await self.page_iter.key_names)}
 
+    async def aclose(self):
+        """
+        Cancels the pages requested ahead, if any
+        """
+        await self.page_iter.aclose()
+
     @property
     def total_count(self):
         return self._total_count
+
+
+class ParallelScanIterator(object):
+    """
+    ParallelScanIterator runs the segments of a parallel Scan concurrently and merges their items
+
+    Pages wait in a bounded buffer until they are consumed, so fast segments do not outrun the consumer.
+    `last_evaluated_keys` maps each segment which is not finished yet to the key it resumes from.
+
+    http://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Scan.html#Scan.ParallelScan
+    """
+    def __init__(self, operation, args, kwargs, total_segments, concurrency=None, map_fn=None, limit=None,
+                 rate_limit=None, last_evaluated_keys=None, max_buffered_pages=None):
+        """
+        :param total_segments: The number of segments the table is divided in
+        :param concurrency: Optional: the number of segments scanned at the same time, defaults to `total_segments`
+        :param rate_limit: Optional: a limit of capacity units per second shared by every segment
+        :param last_evaluated_keys: Optional: the `last_evaluated_keys` of a previous parallel scan to resume
+        :param max_buffered_pages: Optional: the number of pages waiting to be consumed, defaults to `concurrency`
+        """
+        if total_segments < 1:
+            raise ValueError("total_segments must be greater than zero")
+        if concurrency is not None and concurrency < 1:
+            raise ValueError("concurrency must be greater than zero")
+        if last_evaluated_keys is None:
+            last_evaluated_keys = {segment: None for segment in range(total_segments)}
+        for segment in last_evaluated_keys:
+            if not 0 <= segment < total_segments:
+                raise ValueError("Segment {} is out of range for {} total segments".format(segment, total_segments))
+        concurrency = min(concurrency or total_segments, len(last_evaluated_keys))
+
+        self._operation = operation
+        self._args = args
+        self._kwargs = kwargs
+        self._total_segments = total_segments
+        self._concurrency = concurrency
+        self._map_fn = map_fn
+        self._limit = limit
+        if isinstance(rate_limit, RateLimiter) or not rate_limit:
+            self._rate_limiter = rate_limit
+        else:
+            self._rate_limiter = RateLimiter(rate_limit)
+        self._last_evaluated_keys = dict(last_evaluated_keys)
+        self._segments = collections.deque(sorted(last_evaluated_keys))
+        self._max_buffered_pages = max_buffered_pages or max(concurrency, 1)
+        self._loop = None
+        self._pages = None
+        self._tasks = []
+        self._running = concurrency
+        self._segment = None
+        self._page_iter = None
+        self._page = None
+        self._items = []
+        self._index = 0
+        self._total_count = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._limit == 0:
+            await self.aclose()
+            raise StopAsyncIteration
+
+        if self._pages is None:
+            self._start()
+
+        while self._index == len(self._items):
+            await self._get_next_page()
+
+        item = self._items[self._index]
+        self._index += 1
+        if self._index == len(self._items):
+            self._finish_page()
+        if self._limit is not None:
+            self._limit -= 1
+        if self._map_fn:
+            item = self._map_fn(item)
+        return item
+
+    def _start(self):
+        self._loop = asyncio.get_event_loop()
+        self._pages = asyncio.Queue(maxsize=self._max_buffered_pages)
+        self._tasks = [asyncio.ensure_future(self._scan_segments()) for _ in range(self._concurrency)]
+
+    async def _get_next_page(self):
+        while True:
+            if self._running == 0:
+                raise StopAsyncIteration
+            segment, page_iter, page, exc = await self._pages.get()
+            if exc is not None:
+                await self.aclose()
+                raise exc
+            if page is None:
+                self._running -= 1
+                continue
+            break
+        self._segment = segment
+        self._page_iter = page_iter
+        self._page = page
+        self._items = page.get(ITEMS, [])
+        self._index = 0
+        self._total_count += page[CAMEL_COUNT]
+        if not self._items:
+            self._finish_page()
+
+    def _finish_page(self):
+        last_evaluated_key = self._page.get(LAST_EVALUATED_KEY)
+        if last_evaluated_key is None:
+            self._last_evaluated_keys.pop(self._segment, None)
+        else:
+            self._last_evaluated_keys[self._segment] = last_evaluated_key
+
+    async def _scan_segments(self):
+        """
+        Scans segments one after the other until none is left
+        """
+        try:
+            while self._segments:
+                segment = self._segments.popleft()
+                kwargs = dict(self._kwargs)
+                kwargs.update(
+                    segment=segment,
+                    total_segments=self._total_segments,
+                    exclusive_start_key=self._last_evaluated_keys[segment],
+                )
+                page_iter = PageIterator(self._operation, self._args, kwargs, rate_limit=self._rate_limiter)
+                async for page in page_iter:
+                    await self._pages.put((segment, page_iter, page, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._pages.put((None, None, None, e))
+        else:
+            await self._pages.put((None, None, None, None))
+
+    @async_property
+    async def last_evaluated_keys(self):
+        last_evaluated_keys = dict(self._last_evaluated_keys)
+        if 0 < self._index < len(self._items):
+            # In the middle of a page: the segment resumes after the last item returned
+            item = self._items[self._index - 1]
+            last_evaluated_keys[self._segment] = {key: item[key] for key in (await self._page_iter.key_names)}
+        return last_evaluated_keys
+
+    @property
+    def total_count(self):
+        return self._total_count
+
+    async def aclose(self):
+        """
+        Cancels the segments which are still being scanned
+        """
+        tasks = [task for task in self._tasks if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def __del__(self):
+        # the attributes are missing if __init__ raised
+        loop = getattr(self, '_loop', None)
+        if loop is not None and not loop.is_closed():
+            for task in self._tasks:
+                if not task.done():
+                    task.cancel()
@@ -2,27 +2,42 @@
 #
 # NOTE: This dynamically typed stub was automatically generated by stubgen.
 
-from typing import Any, Optional, Callable, Dict, Text, Iterator, TypeVar, Awaitable, Coroutine, Iterable
+from typing import Any, Optional, Callable, Dict, Text, Iterator, TypeVar, Awaitable, Coroutine, Iterable, Union, Generic, Tuple, \
+    AsyncIterator, List
 
 from async_property import async_property
 
+from inpynamodb.cache import QueryCache
+
 _T = TypeVar('_T')
 
+READ: Text
+WRITE: Text
+RESERVED_UNITS: float
+
 
 class RateLimiter:
     _rate_limit: float
-    _consumed: float
-    _time_of_last_acquire: float
+    _burst: float
+    _tokens: float
+    _reserved: int
+    _time_of_last_refill: Optional[float]
     _time_module: Any
-    def __init__(self, rate_limit: float, time_module: Any = ...) -> None: ...
-    def consume(self, units: int) -> None: ...
-    def acquire(self) -> None: ...
+    def __init__(self, rate_limit: float, time_module: Any = ..., burst: float = ...) -> None: ...
+    def consume(self, units: float) -> None: ...
+    async def acquire(self) -> None: ...
+    def _refill(self) -> None: ...
     @property
     def rate_limit(self) -> float: ...
     @rate_limit.setter
     def rate_limit(self, rate_limit: float) -> None: ...
 
 
+def set_table_rate_limit(table_name: Text, capacity_type: Text, rate_limit: Optional[float]) -> Optional[RateLimiter]: ...
+def get_table_rate_limiter(table_name: Text, capacity_type: Text) -> Optional[RateLimiter]: ...
+def is_table_rate_limiter(rate_limiter: RateLimiter, capacity_type: Text) -> bool: ...
+
+
 class PageIterator:
     _operation: Callable[[Any], Awaitable[Dict]]
     _args: Any
@@ -31,9 +46,20 @@ class PageIterator:
     _total_scanned_count: int
     _rate_limiter: Optional[RateLimiter]
     _last_evaluated_key: dict
-    def __init__(self, operation: Any, args: Any, kwargs: Any, rate_limit: Optional[Any] = ...) -> None: ...
+    def __init__(
+        self,
+        operation: Any,
+        args: Any,
+        kwargs: Any,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
+        prefetch: Optional[int] = ...,
+        limit: Optional[int] = ...,
+        cache: Optional[QueryCache] = ...,
+        cache_key: Optional[Tuple] = ...,
+    ) -> None: ...
     def __aiter__(self) -> Iterator[_T]: ...
     async def __anext__(self) -> _T: ...
+    async def aclose(self) -> None: ...
     @async_property
     async def key_names(self) -> Iterable[Text]: ...
     @property
@@ -62,12 +88,46 @@ class ResultIterator(Iterator[_T]):
         kwargs: Dict[Text, Any],
         map_fn: Optional[Callable] = ...,
         limit: Optional[int] = ...,
-        rate_limit: Optional[float] = ...,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
+        prefetch: Optional[int] = ...,
+        cache: Optional[QueryCache] = ...,
+        cache_key: Optional[Tuple] = ...,
     ) -> None: ...
     async def _get_next_page(self): ...
     def __aiter__(self) -> Iterator[_T]: ...
     async def __anext__(self) -> _T: ...
+    async def aclose(self) -> None: ...
+    def pages(self) -> AsyncIterator[List[_T]]: ...
     @async_property
     async def last_evaluated_key(self) -> Optional[Dict[Text, Dict[Text, Any]]]: ...
     @property
     def total_count(self) -> int: ...
+
+
+class ParallelScanIterator(Generic[_T]):
+    _total_segments: int
+    _concurrency: int
+    _map_fn: Optional[Callable]
+    _limit: Optional[int]
+    _rate_limiter: Optional[RateLimiter]
+    _total_count: int
+    def __init__(
+        self,
+        operation: Callable,
+        args: Any,
+        kwargs: Dict[Text, Any],
+        total_segments: int,
+        concurrency: Optional[int] = ...,
+        map_fn: Optional[Callable] = ...,
+        limit: Optional[int] = ...,
+        rate_limit: Optional[Union[float, RateLimiter]] = ...,
+        last_evaluated_keys: Optional[Dict[int, Optional[Dict[Text, Dict[Text, Any]]]]] = ...,
+        max_buffered_pages: Optional[int] = ...,
+    ) -> None: ...
+    def __aiter__(self) -> ParallelScanIterator[_T]: ...
+    async def __anext__(self) -> _T: ...
+    @async_property
+    async def last_evaluated_keys(self) -> Dict[int, Optional[Dict[Text, Dict[Text, Any]]]]: ...
+    @property
+    def total_count(self) -> int: ...
+    async def aclose(self) -> None: ...
@@ -0,0 +1,216 @@
+"""
+Phase-level profiling of the requests sent to DynamoDB
+"""
+import asyncio
+import functools
+import time
+
+from pynamodb.constants import QUERY, SCAN
+
+# Phases of a request, in the order they happen
+BUILD_KWARGS = 'build_kwargs'
+SERIALIZE_EXPRESSIONS = 'serialize_expressions'
+DISPATCH = 'dispatch'
+SERIALIZE_REQUEST = 'serialize_request'
+SIGN_REQUEST = 'sign_request'
+HTTP = 'http'
+PARSE_RESPONSE = 'parse_response'
+DESERIALIZE = 'deserialize'
+
+PHASES = (
+    BUILD_KWARGS, SERIALIZE_EXPRESSIONS, DISPATCH, SERIALIZE_REQUEST, SIGN_REQUEST, HTTP, PARSE_RESPONSE, DESERIALIZE
+)
+
+# The operations of the methods which yield their items through a ResultIterator
+PAGINATED_OPERATIONS = {'query': QUERY, 'scan': SCAN}
+
+if hasattr(asyncio, 'current_task'):
+    current_task = asyncio.current_task
+else:
+    current_task = asyncio.Task.current_task
+
+# The active profilers, and the requests being profiled by the task sending them
+_profilers = []
+_requests = {}
+
+
+class Profiler(object):
+    """
+    Aggregates the time spent in each phase of the requests sent while it is active, per table and operation
+
+    The phases are, in order:
+        build_kwargs: building the operation kwargs in the connection
+        serialize_expressions: serializing condition, update and projection expressions
+        dispatch: rate limiting and retry backoff in `AsyncConnection.dispatch`
+        serialize_request: validating and serializing the request in botocore
+        sign_request: creating and signing the HTTP request
+        http: the HTTP round trip, including reading the response body
+        parse_response: parsing the response in botocore
+        deserialize: building Model instances with `from_raw_data`
+
+    Example:
+        with Profiler() as profiler:
+            await Thread.get('forum', 'thread')
+
+        print(profiler.report())
+    """
+    def __init__(self):
+        self._stats = {}
+
+    def __enter__(self):
+        _profilers.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _profilers.remove(self)
+
+    def record(self, table_name, operation_name, phases, calls=1):
+        """
+        Adds the seconds spent in each phase of `phases` to the totals of the table and operation
+        """
+        stats = self._stats.get((table_name, operation_name))
+        if stats is None:
+            stats = self._stats[(table_name, operation_name)] = {'calls': 0, 'phases': dict.fromkeys(PHASES, 0)}
+        stats['calls'] += calls
+        for phase, seconds in phases.items():
+            stats['phases'][phase] += seconds
+
+    def snapshot(self):
+        """
+        Returns the totals as a list of dicts with the table and operation they belong to
+        """
+        return [
+            {'table': table_name, 'operation': operation_name, 'calls': stats['calls'], 'phases': dict(stats['phases'])}
+            for (table_name, operation_name), stats in sorted(self._stats.items())
+        ]
+
+    def report(self):
+        """
+        Returns the totals as a text table, in milliseconds
+        """
+        lines = ['\t'.join(('table', 'operation', 'calls') + PHASES)]
+        for entry in self.snapshot():
+            lines.append('\t'.join(
+                [entry['table'], entry['operation'], str(entry['calls'])] +
+                ['{:.3f}'.format(entry['phases'][phase] * 1000) for phase in PHASES]
+            ))
+        return '\n'.join(lines)
+
+
+class RequestProfile(object):
+    """
+    The time spent in each phase of one request
+    """
+    __slots__ = ('table_name', 'operation_name', 'phases', 'last_mark')
+
+    def __init__(self, table_name, operation_name):
+        self.table_name = table_name
+        self.operation_name = operation_name
+        self.phases = {}
+        self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        Adds the time since the previous mark to `phase`
+        """
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last_mark
+        self.last_mark = now
+
+
+def is_profiling():
+    return bool(_profilers)
+
+
+def mark_phase(phase):
+    """
+    Ends `phase` of the request sent by the running task, if it is profiled
+    """
+    if _requests:
+        profile = _requests.get(current_task())
+        if profile is not None:
+            profile.mark(phase)
+
+
+def record_phase(table_name, operation_name, phase, seconds, calls=0):
+    """
+    Adds `seconds` to `phase` in every active profiler
+    """
+    for profiler in _profilers:
+        profiler.record(table_name, operation_name, {phase: seconds}, calls=calls)
+
+
+def profiled(operation_name):
+    """
+    Profiles the calls of an AsyncConnection method whose first argument is the table name, while a Profiler is active
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, table_name, *args, **kwargs):
+            if not _profilers:
+                return method(self, table_name, *args, **kwargs)
+            return _profile(table_name, operation_name, method(self, table_name, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+async def _profile(table_name, operation_name, coro):
+    task = current_task()
+    if task in _requests:
+        # nested in a profiled call, whose phases are marked
+        return await coro
+    profile = _requests[task] = RequestProfile(table_name, operation_name)
+    try:
+        return await coro
+    finally:
+        del _requests[task]
+        profile.mark(DISPATCH)
+        for profiler in _profilers:
+            profiler.record(table_name, operation_name, profile.phases)
+
+
+def instrument_client(client):
+    """
+    Marks the botocore phases of the requests sent by `client`, once per client
+    """
+    if getattr(client, '_inpynamodb_profiled', False):
+        return
+    client._inpynamodb_profiled = True
+    client.meta.events.register_first('before-call', _on_before_call)
+    client.meta.events.register_last('before-send', _on_before_send)
+    endpoint = client._endpoint
+    endpoint._response_parser_factory = ProfiledResponseParserFactory(endpoint._response_parser_factory)
+
+
+def _on_before_call(**kwargs):
+    mark_phase(SERIALIZE_REQUEST)
+
+
+def _on_before_send(**kwargs):
+    mark_phase(SIGN_REQUEST)
+
+
+class ProfiledResponseParserFactory(object):
+    """
+    Creates response parsers which mark the end of the HTTP round trip and of the parsing
+    """
+    def __init__(self, factory):
+        self._factory = factory
+
+    def create_parser(self, protocol_name):
+        return ProfiledResponseParser(self._factory.create_parser(protocol_name))
+
+    def __getattr__(self, name):
+        return getattr(self._factory, name)
+
+
+class ProfiledResponseParser(object):
+    def __init__(self, parser):
+        self._parser = parser
+
+    def parse(self, response, shape):
+        mark_phase(HTTP)
+        try:
+            return self._parser.parse(response, shape)
+        finally:
+            mark_phase(PARSE_RESPONSE)
@@ -0,0 +1,150 @@
+"""
+Read-only rows generated for each Model class, for holding many items in memory
+"""
+import datetime
+import json
+from typing import Any, Optional, Union
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute, BinaryAttribute, \
+    UTCDateTimeAttribute, UnicodeSetAttribute, NumberSetAttribute, BinarySetAttribute, MapAttribute, ListAttribute
+
+from inpynamodb.serializers import get_inline_expressions
+
+# The types of the values of each attribute class
+FIELD_TYPES = {
+    UnicodeAttribute: str,
+    NumberAttribute: Union[int, float],
+    BooleanAttribute: bool,
+    BinaryAttribute: bytes,
+    UTCDateTimeAttribute: datetime.datetime,
+    UnicodeSetAttribute: set,
+    NumberSetAttribute: set,
+    BinarySetAttribute: set,
+    ListAttribute: list,
+}
+
+
+class Row(object):
+    """
+    The base class of the rows generated for each Model class, see `get_row_class`
+
+    A row holds the deserialized attribute values of an item in slots, without the instance dictionary and
+    attribute bookkeeping of a model. Rows cannot be modified: `to_model` returns a model of the item.
+    """
+    __slots__ = ()
+
+    # The Model class of the rows, and the python names of its attributes
+    _model = None
+    _fields = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'{}' object is read-only".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("'{}' object is read-only".format(type(self).__name__))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._values() == other._values()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({})'.format(
+            type(self).__name__, ', '.join('{}={!r}'.format(name, getattr(self, name)) for name in self._fields)
+        )
+
+    def __reduce__(self):
+        return rebuild_row, (self._model, self.to_dict())
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def to_dict(self):
+        """
+        Returns the attribute values which are set, by python attribute name
+        """
+        values = {}
+        for name in self._fields:
+            value = getattr(self, name)
+            if value is not None:
+                values[name] = value
+        return values
+
+    def to_model(self):
+        """
+        Returns a model of the item, as `Model.from_raw_data` would
+        """
+        return self._model(_user_instantiated=False, **self.to_dict())
+
+
+def rebuild_row(model, values):
+    row_class = get_row_class(model)
+    row = object.__new__(row_class)
+    for name in row_class._fields:
+        getattr(row_class, name).__set__(row, values.get(name))
+    return row
+
+
+def get_row_class(model):
+    """
+    Returns the Row class of `model`, generated on first use
+
+    Its `from_raw_data` builds a row from a DynamoDB item, with the values `Model.from_raw_data` would set.
+    """
+    row_class = model.__dict__.get('_row_class')
+    if row_class is None:
+        row_class = create_row_class(model)
+        setattr(model, '_row_class', row_class)
+    return row_class
+
+
+def get_field_type(attr):
+    if isinstance(attr, MapAttribute):
+        field_type = type(attr)
+    else:
+        field_type = FIELD_TYPES.get(type(attr), Any)
+    return Optional[field_type] if attr.null else field_type
+
+
+def create_row_class(model):
+    attributes = list(model.get_attributes().items())
+    fields = tuple(name for name, _ in attributes)
+    row_class = type('{}Row'.format(model.__name__), (Row,), {
+        '__slots__': fields,
+        '__module__': model.__module__,
+        '__annotations__': {name: get_field_type(attr) for name, attr in attributes},
+        '_model': model,
+        '_fields': fields,
+    })
+
+    namespace = {'json_loads': json.loads, 'new': object.__new__, 'row_class': row_class}
+    lines = ['def from_raw_data(data):']
+    for index, (name, attr) in enumerate(attributes):
+        attr_var = 'attr_{}'.format(index)
+        default_var = 'default_{}'.format(index)
+        namespace[attr_var] = attr
+        namespace[default_var] = attr.default
+        namespace['set_{}'.format(index)] = getattr(row_class, name).__set__
+        inline = get_inline_expressions(attr)
+        if inline is not None:
+            expression = inline[1]
+        else:
+            expression = '{attr}.deserialize({attr}.get_value(value))'.format(attr=attr_var)
+        default = '{}()'.format(default_var) if callable(attr.default) else default_var
+        lines += [
+            '    value = data.get({!r})'.format(attr.attr_name),
+            '    if value is not None:',
+            '        value_{} = {}'.format(index, expression),
+            '    else:',
+            '        value_{} = {}'.format(index, default),
+        ]
+    lines.append('    row = new(row_class)')
+    for index in range(len(attributes)):
+        lines.append('    set_{0}(row, value_{0})'.format(index))
+    lines.append('    return row')
+    exec('\n'.join(lines) + '\n', namespace)
+    row_class.from_raw_data = staticmethod(namespace['from_raw_data'])
+    return row_class
@@ -0,0 +1,177 @@
+"""
+Serialize and deserialize functions generated for each Model class from its attribute definitions
+"""
+import json
+
+from pynamodb.attributes import Attribute, UnicodeAttribute, NumberAttribute, BooleanAttribute, MapAttribute
+from pynamodb.connection.util import pythonic
+from pynamodb.constants import ATTR_TYPE_MAP, ATTRIBUTES
+from pynamodb.types import HASH, RANGE
+
+# Attribute classes whose serialization is written inline, as (serialize, deserialize) expressions of `value`
+INLINE_ATTRIBUTES = {
+    UnicodeAttribute: ('value if len(value) else None', 'value.get({type!r})'),
+    NumberAttribute: ('json_dumps(value)', 'json_loads(value.get({type!r}))'),
+    BooleanAttribute: ('True if value else False', 'bool(value.get({type!r}))'),
+}
+
+
+class ModelSerializer(object):
+    """
+    The serialize and deserialize functions of a Model class
+
+    The functions are generated once per class, with each attribute handled by its own lines of code rather than
+    by a loop over the attributes. Attributes of the basic types are (de)serialized inline, any other attribute by
+    its own `serialize` and `deserialize` methods, so the results are the ones of the generic Model methods.
+    """
+    def __init__(self, model):
+        self.model = model
+        attributes = list(model.get_attributes().items())
+        namespace = {
+            'json_dumps': json.dumps,
+            'json_loads': json.loads,
+            'MapAttribute': MapAttribute,
+            'model': model,
+            'new': model.__new__,
+        }
+        for index, (_, attr) in enumerate(attributes):
+            namespace['attr_{}'.format(index)] = attr
+            namespace['default_{}'.format(index)] = attr.default
+        self.serialize_source = get_serialize_source(attributes)
+        self.deserialize_source = get_deserialize_source(attributes, has_default_init(model))
+        exec(self.serialize_source, namespace)
+        exec(self.deserialize_source, namespace)
+        self.serialize = namespace['serialize']
+        self.deserialize = namespace['deserialize']
+
+
+def get_serializer(model):
+    """
+    Returns the ModelSerializer of `model`, generated on first use
+    """
+    serializer = model.__dict__.get('_serializer')
+    if serializer is None:
+        serializer = ModelSerializer(model)
+        setattr(model, '_serializer', serializer)
+    return serializer
+
+
+def has_default_init(model):
+    """
+    Returns True if instances of `model` may be built without calling its `__init__`
+    """
+    from inpynamodb.models import Model
+    return (
+        model.__init__ is Model.__init__ and
+        model._set_defaults is Model._set_defaults and
+        model._set_attributes is Model._set_attributes
+    )
+
+
+def is_plain_descriptor(attr, method):
+    return getattr(type(attr), method) is getattr(Attribute, method)
+
+
+def get_inline_expressions(attr):
+    """
+    Returns the inline (serialize, deserialize) expressions of `attr`, or None if it must use its own methods
+    """
+    expressions = INLINE_ATTRIBUTES.get(type(attr))
+    if expressions is None:
+        return None
+    serialize, deserialize = expressions
+    return serialize, deserialize.format(type=ATTR_TYPE_MAP[attr.attr_type])
+
+
+def get_serialize_source(attributes):
+    lines = [
+        'def serialize(instance, attr_map=False, null_check=True):',
+        '    values = instance.attribute_values',
+        '    attributes = {}',
+        '    result = {{{!r}: attributes}}'.format(pythonic(ATTRIBUTES)),
+    ]
+    for index, (name, attr) in enumerate(attributes):
+        attr_var = 'attr_{}'.format(index)
+        type_name = ATTR_TYPE_MAP[attr.attr_type]
+        if is_plain_descriptor(attr, '__get__'):
+            lines.append('    value = values.get({!r})'.format(name))
+        else:
+            lines.append('    value = instance.{}'.format(name))
+        inline = get_inline_expressions(attr)
+        if inline is not None:
+            lines.append('    serialized = None if value is None else {}'.format(inline[0]))
+        else:
+            lines += [
+                '    if isinstance(value, MapAttribute) and not value.validate():',
+                '        raise ValueError({!r})'.format("Attribute '{}' is not correctly typed".format(attr.attr_name)),
+                '    serialized = None if value is None else {}.serialize(value)'.format(attr_var),
+            ]
+        if not attr.null:
+            lines += [
+                '    if serialized is None and null_check:',
+                '        raise ValueError({!r})'.format("Attribute '{}' cannot be None".format(attr.attr_name)),
+            ]
+        lines.append('    if serialized is not None:')
+        if attr.is_hash_key or attr.is_range_key:
+            lines += [
+                '        if not attr_map:',
+                '            result[{!r}] = serialized'.format(HASH if attr.is_hash_key else RANGE),
+                '        else:',
+                '            attributes[{!r}] = {{{!r}: serialized}}'.format(attr.attr_name, type_name),
+            ]
+        else:
+            lines.append('        attributes[{!r}] = {{{!r}: serialized}}'.format(attr.attr_name, type_name))
+    lines.append('    return result')
+    return '\n'.join(lines) + '\n'
+
+
+def get_deserialize_source(attributes, default_init):
+    """
+    :param default_init: If True, instances are built without calling `__init__`, with the defaults set inline.
+        Otherwise the deserialized attributes are passed to `__init__`, which sets the defaults.
+    """
+    lines = [
+        'def deserialize(data):',
+        '    values = {}',
+    ]
+    if default_init:
+        lines.append('    set_values = []')
+    for index, (name, attr) in enumerate(attributes):
+        attr_var = 'attr_{}'.format(index)
+        inline = get_inline_expressions(attr)
+        if inline is not None:
+            expression = inline[1]
+        else:
+            expression = '{attr}.deserialize({attr}.get_value(value))'.format(attr=attr_var)
+        # attributes with their own `__set__` are set through it, as when the instance is built by `__init__`
+        through_setattr = default_init and not is_plain_descriptor(attr, '__set__')
+        lines += [
+            '    value = data.get({!r})'.format(attr.attr_name),
+            '    if value is not None:',
+        ]
+        if through_setattr:
+            lines.append('        set_values.append(({!r}, {}))'.format(name, expression))
+        else:
+            lines.append('        values[{!r}] = {}'.format(name, expression))
+        if default_init and attr.default is not None:
+            default_var = 'default_{}'.format(index)
+            lines += [
+                '    else:',
+                '        default = {}'.format('{}()'.format(default_var) if callable(attr.default) else default_var),
+                '        if default is not None:',
+            ]
+            if through_setattr:
+                lines.append('            set_values.append(({!r}, default))'.format(name))
+            else:
+                lines.append('            values[{!r}] = default'.format(name))
+    if default_init:
+        lines += [
+            '    instance = new(model)',
+            '    instance.attribute_values = values',
+            '    for name, value in set_values:',
+            '        setattr(instance, name, value)',
+            '    return instance',
+        ]
+    else:
+        lines.append('    return model(_user_instantiated=False, **values)')
+    return '\n'.join(lines) + '\n'
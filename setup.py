@@ -16,7 +16,8 @@ if sys.argv[-1] == 'publish':
 install_requires = [
     'PynamoDB==4.1.0',
     'aiobotocore==0.10.3',
-    'async-property==0.2.1'
+    'async-property==0.2.1',
+    'aiocontextvars>=0.2.2; python_version < "3.7"',
 ]
 
 python_requires = '>=3.6'
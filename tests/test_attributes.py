@@ -0,0 +1,110 @@
+"""
+Test lazily deserialized attribute values
+"""
+import copy
+from datetime import datetime
+
+import pytest
+from asynctest import TestCase
+from asynctest.mock import patch
+from dateutil.tz import tzutc
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BinaryAttribute, UTCDateTimeAttribute, \
+    MapAttribute, ListAttribute
+
+from inpynamodb.attributes import LazyAttributeValues
+from inpynamodb.models import Model
+
+PATCH_METHOD = 'aiobotocore.client.AioBaseClient._make_api_call'
+
+
+class Location(MapAttribute):
+    lat = NumberAttribute()
+    lng = NumberAttribute()
+
+
+class LazyModel(Model):
+    class Meta:
+        table_name = 'LazyModel'
+        local_meta_table = True
+        lazy_attributes = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    created_at = UTCDateTimeAttribute()
+    picture = BinaryAttribute(null=True)
+    location = Location(null=True)
+    tags = ListAttribute(null=True)
+    score = NumberAttribute(attr_name='s', default=0)
+
+
+class EagerModel(LazyModel):
+    class Meta:
+        table_name = 'LazyModel'
+        local_meta_table = True
+
+
+class RawMapModel(Model):
+    class Meta:
+        table_name = 'RawMapModel'
+        local_meta_table = True
+        lazy_attributes = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    settings = MapAttribute(null=True)
+
+
+ITEM = {
+    'user_name': {'S': 'foo'},
+    'created_at': {'S': '2020-01-02T03:04:05.000000+0000'},
+    'picture': {'B': 'AAE='},
+    'location': {'M': {'lat': {'N': '1.5'}, 'lng': {'N': '2'}}},
+    'tags': {'L': [{'S': 'a'}, {'S': 'b'}]},
+    'unknown': {'S': 'ignored'},
+}
+
+
+class LazyAttributeValuesTestCase(TestCase):
+
+    def test_deserialized_on_access(self):
+        item = LazyModel.from_raw_data(copy.deepcopy(ITEM))
+        attribute_values = item.attribute_values
+        self.assertIsInstance(attribute_values, LazyAttributeValues)
+        # only the defaults of the attributes missing from the item are set
+        self.assertEqual(dict(dict.items(attribute_values)), {'score': 0})
+        self.assertEqual(len(attribute_values), 6)
+        self.assertIn('location', attribute_values)
+
+        self.assertEqual(item.location.lat, 1.5)
+        self.assertEqual(set(dict.keys(attribute_values)), {'score', 'location'})
+        self.assertEqual(item.created_at, datetime(2020, 1, 2, 3, 4, 5, tzinfo=tzutc()))
+
+        item.tags = ['c']
+        self.assertEqual(item.tags, ['c'])
+        self.assertEqual(set(dict.keys(attribute_values)), {'score', 'location', 'created_at', 'tags'})
+
+        del attribute_values['picture']
+        self.assertIsNone(item.picture)
+        self.assertEqual(set(attribute_values), {'user_name', 'score', 'location', 'created_at', 'tags'})
+
+    def test_same_values_as_eager(self):
+        lazy = LazyModel.from_raw_data(copy.deepcopy(ITEM))
+        eager = EagerModel.from_raw_data(copy.deepcopy(ITEM))
+        self.assertEqual(lazy._serialize(), eager._serialize())
+        self.assertEqual(copy.copy(lazy.attribute_values).keys(), eager.attribute_values.keys())
+        self.assertEqual(LazyModel.from_raw_data({'user_name': {'S': 'foo'}, 's': {'N': '3'}}).score, 3)
+
+    def test_raw_map_attribute(self):
+        item = RawMapModel.from_raw_data({'user_name': {'S': 'foo'}, 'settings': {'M': {'theme': {'S': 'dark'}}}})
+        self.assertIsInstance(item.settings, MapAttribute)
+        self.assertEqual(item.settings.theme, 'dark')
+        self.assertEqual(item.settings.as_dict(), {'theme': 'dark'})
+
+    @pytest.mark.asyncio
+    async def test_save(self):
+        item = LazyModel.from_raw_data(copy.deepcopy(ITEM))
+        item.score = 5
+        with patch(PATCH_METHOD) as req:
+            req.return_value = {}
+            await item.save()
+        expected = dict(ITEM, s={'N': '5'})
+        del expected['user_name'], expected['unknown']
+        self.assertEqual(req.call_args[0][1]['Item'], dict(expected, user_name={'S': 'foo'}))
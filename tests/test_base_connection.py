@@ -1,8 +1,11 @@
 """
 Tests for the base connection class
 """
+import asyncio
 import base64
+import binascii
 import json
+import time
 import unittest
 
 import botocore
@@ -10,7 +13,7 @@ import pytest
 from asynctest import TestCase, mock, CoroutineMock
 from asynctest.mock import patch
 from botocore.awsrequest import AWSResponse, AWSRequest, AWSPreparedRequest
-from botocore.exceptions import BotoCoreError, ClientError
+from botocore.exceptions import BotoCoreError, ClientError, ChecksumError
 from pynamodb.connection.base import MetaTable
 
 from pynamodb.exceptions import (
@@ -26,6 +29,10 @@ from .data import DESCRIBE_TABLE_DATA, GET_ITEM_DATA, LIST_TABLE_DATA
 from .deep_eq import deep_eq
 
 from inpynamodb.connection.base import AsyncConnection
+from inpynamodb.connection.metrics import MetricsRegistry
+from inpynamodb.connection.registry import ClientRegistry, client_registry
+from inpynamodb.connection.retry import UnprocessedRetryPolicy
+from inpynamodb.pagination import READ, set_table_rate_limit
 from tests.data import DESCRIBE_TABLE_DATA
 
 
@@ -416,6 +423,58 @@ class ConnectionTestCase(TestCase):
                 conn = AsyncConnection(self.region)
                 await conn.describe_table(self.test_table_name)
 
+    @pytest.mark.asyncio
+    async def test_get_meta_table_is_single_flight(self):
+        conn = AsyncConnection(self.region)
+
+        async def describe_table(*args):
+            await asyncio.sleep(0.01)
+            return DESCRIBE_TABLE_DATA
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=describe_table)) as req:
+            tables = await asyncio.gather(*[conn.get_meta_table(self.test_table_name) for _ in range(20)])
+            self.assertEqual(req.call_count, 1)
+            self.assertTrue(all(tbl is tables[0] for tbl in tables))
+
+            # cached from now on
+            self.assertIs(await conn.get_meta_table(self.test_table_name), tables[0])
+            self.assertEqual(req.call_count, 1)
+
+    @pytest.mark.asyncio
+    async def test_get_meta_table_failure_is_delivered_to_every_waiter(self):
+        conn = AsyncConnection(self.region)
+
+        async def describe_table(*args):
+            await asyncio.sleep(0.01)
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Not Found'}}, "DescribeTable")
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=describe_table)) as req:
+            results = await asyncio.gather(
+                *[conn.get_meta_table(self.test_table_name) for _ in range(5)],
+                return_exceptions=True
+            )
+            self.assertEqual(req.call_count, 1)
+            self.assertTrue(all(isinstance(result, TableDoesNotExist) for result in results))
+
+            # failures are not cached
+            with self.assertRaises(TableDoesNotExist):
+                await conn.get_meta_table(self.test_table_name)
+            self.assertEqual(req.call_count, 2)
+
+    @pytest.mark.asyncio
+    async def test_get_meta_table_refresh_in_background(self):
+        conn = AsyncConnection(self.region)
+        with patch(PATCH_METHOD) as req:
+            req.return_value = DESCRIBE_TABLE_DATA
+            cached = await conn.get_meta_table(self.test_table_name)
+
+            self.assertIs(await conn.get_meta_table(self.test_table_name, refresh=True), cached)
+            self.assertEqual(len(conn._refreshes), 1)
+            await asyncio.wait(conn._refreshes)
+            self.assertEqual(conn._refreshes, set())
+            self.assertEqual(req.call_count, 2)
+            self.assertIsNot(await conn.get_meta_table(self.test_table_name), cached)
+
     @pytest.mark.asyncio
     async def test_list_tables(self):
         """
@@ -1739,3 +1798,411 @@ class ConnectionTestCase(TestCase):
         with patch(PATCH_METHOD) as req:
             req.side_effect = BotoCoreError
             self.assertAsyncRaises(TableError, conn.update_time_to_live('test table', 'my_ttl'))
+
+    @pytest.mark.asyncio
+    async def test_dispatch_retries_throttled_requests(self):
+        conn = AsyncConnection(self.region, base_backoff_ms=10, max_retry_attempts=3)
+        throttled = ClientError(
+            {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Rate exceeded'}}, 'GetItem'
+        )
+        with patch(PATCH_METHOD) as req, \
+                patch('inpynamodb.connection.base.asyncio.sleep', new=CoroutineMock()) as sleep_mock, \
+                patch.object(AsyncConnection, 'send_pre_boto_callback') as pre_mock, \
+                patch.object(AsyncConnection, 'send_post_boto_callback') as post_mock:
+            req.side_effect = [throttled, throttled, GET_ITEM_DATA]
+            data = await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+
+        self.assertEqual(data, GET_ITEM_DATA)
+        self.assertEqual(req.call_count, 3)
+        self.assertEqual(sleep_mock.call_count, 2)
+        self.assertLessEqual(sleep_mock.call_args_list[0][0][0], 0.01)
+        self.assertLessEqual(sleep_mock.call_args_list[1][0][0], 0.02)
+        self.assertEqual(pre_mock.call_count, 3)
+        self.assertEqual(post_mock.call_count, 3)
+        # every attempt is reported with the same request uuid
+        self.assertEqual(len(set(call[0][1] for call in pre_mock.call_args_list)), 1)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_metrics(self):
+        metrics = MetricsRegistry(record_payload_sizes=True)
+        conn = AsyncConnection(self.region, base_backoff_ms=10, max_retry_attempts=1, metrics=metrics)
+        throttled = ClientError(
+            {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Rate exceeded'}}, 'GetItem'
+        )
+        condition_failed = ClientError(
+            {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'Failed'}}, 'PutItem'
+        )
+        response = dict(GET_ITEM_DATA, ConsumedCapacity={'TableName': self.test_table_name, 'CapacityUnits': 0.5})
+        with patch(PATCH_METHOD) as req, \
+                patch('inpynamodb.connection.base.asyncio.sleep', new=CoroutineMock()):
+            req.side_effect = [throttled, response, condition_failed]
+            await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+            with self.assertRaises(ClientError):
+                await conn.dispatch('PutItem', {'TableName': self.test_table_name})
+
+        get_item, put_item = metrics.snapshot()
+        self.assertEqual(get_item['operation'], 'GetItem')
+        self.assertEqual(get_item['table'], self.test_table_name)
+        self.assertEqual(get_item['requests'], 2)
+        self.assertEqual(get_item['errors'], {'ProvisionedThroughputExceededException': 1})
+        self.assertEqual(get_item['throttles'], 1)
+        self.assertEqual(get_item['retries'], 1)
+        self.assertEqual(get_item['read_capacity_units'], 0.5)
+        self.assertEqual(get_item['latency_seconds']['count'], 2)
+        self.assertEqual(get_item['response_size_bytes']['count'], 1)
+        self.assertEqual(put_item['requests'], 1)
+        self.assertEqual(put_item['errors'], {'ConditionalCheckFailedException': 1})
+        self.assertEqual(put_item['retries'], 0)
+        self.assertEqual(put_item['write_capacity_units'], 0)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_lean(self):
+        conn = AsyncConnection(self.region, lean_dispatch=True)
+        with patch(PATCH_METHOD) as req, \
+                patch.object(AsyncConnection, '_log_debug') as log_mock, \
+                patch.object(AsyncConnection, 'send_pre_boto_callback') as pre_mock, \
+                patch.object(AsyncConnection, 'send_post_boto_callback') as post_mock:
+            req.return_value = GET_ITEM_DATA
+            data = await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+            self.assertEqual(data, GET_ITEM_DATA)
+            self.assertEqual(req.call_args[0][1]['ReturnConsumedCapacity'], 'TOTAL')
+            self.assertEqual(log_mock.call_count, 0)
+            self.assertEqual(pre_mock.call_count, 0)
+            self.assertEqual(post_mock.call_count, 0)
+
+            # signals are sent once they have receivers, with counters as request ids
+            with patch('inpynamodb.connection.base.has_signal_receivers', return_value=True):
+                await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+                await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+            self.assertEqual(pre_mock.call_count, 2)
+            self.assertEqual(post_mock.call_count, 2)
+            first_id, second_id = [call[0][1] for call in pre_mock.call_args_list]
+            self.assertIsInstance(first_id, int)
+            self.assertGreater(second_id, first_id)
+
+            # requests are logged when debug logging is enabled
+            with patch('inpynamodb.connection.base.pynamodb_log.isEnabledFor', return_value=True):
+                await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+            self.assertEqual(log_mock.call_count, 1)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_retries_server_errors_until_exhausted(self):
+        conn = AsyncConnection(self.region, max_retry_attempts=2)
+        server_error = ClientError(
+            {'Error': {'Code': 'InternalFailure', 'Message': 'Oops'}, 'ResponseMetadata': {'HTTPStatusCode': 500}},
+            'GetItem'
+        )
+        with patch(PATCH_METHOD) as req, \
+                patch('inpynamodb.connection.base.asyncio.sleep', new=CoroutineMock()) as sleep_mock:
+            req.side_effect = server_error
+            with self.assertRaises(ClientError):
+                await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+
+        self.assertEqual(req.call_count, 3)
+        self.assertEqual(sleep_mock.call_count, 2)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_retries_connection_errors(self):
+        conn = AsyncConnection(self.region)
+        with patch(PATCH_METHOD) as req, \
+                patch('inpynamodb.connection.base.asyncio.sleep', new=CoroutineMock()):
+            req.side_effect = [
+                botocore.exceptions.ReadTimeoutError(endpoint_url='http://lyft.com'),
+                botocore.exceptions.EndpointConnectionError(endpoint_url='http://lyft.com'),
+                GET_ITEM_DATA
+            ]
+            self.assertEqual(await conn.dispatch('GetItem', {'TableName': self.test_table_name}), GET_ITEM_DATA)
+        self.assertEqual(req.call_count, 3)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_does_not_retry_client_errors(self):
+        conn = AsyncConnection(self.region)
+        condition_failed = ClientError(
+            {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'Failed'},
+             'ResponseMetadata': {'HTTPStatusCode': 400}},
+            'PutItem'
+        )
+        with patch(PATCH_METHOD) as req, \
+                patch('inpynamodb.connection.base.asyncio.sleep', new=CoroutineMock()) as sleep_mock, \
+                patch.object(AsyncConnection, 'send_post_boto_callback') as post_mock:
+            req.side_effect = condition_failed
+            with self.assertRaises(ClientError):
+                await conn.dispatch('PutItem', {'TableName': self.test_table_name})
+
+        self.assertEqual(req.call_count, 1)
+        sleep_mock.assert_not_called()
+        self.assertEqual(post_mock.call_count, 1)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_retry_disabled(self):
+        conn = AsyncConnection(self.region, max_retry_attempts=0)
+        with patch(PATCH_METHOD) as req:
+            req.side_effect = botocore.exceptions.ReadTimeoutError(endpoint_url='http://lyft.com')
+            with self.assertRaises(botocore.exceptions.ReadTimeoutError):
+                await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+        self.assertEqual(req.call_count, 1)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_table_rate_limit(self):
+        conn = AsyncConnection(self.region)
+        rate_limiter = set_table_rate_limit(self.test_table_name, READ, 10)
+        try:
+            with patch(PATCH_METHOD) as req, patch.object(rate_limiter, 'acquire', new=CoroutineMock()) as acquire:
+                req.return_value = {'ConsumedCapacity': {'TableName': self.test_table_name, 'CapacityUnits': 4.5}}
+                await conn.dispatch('GetItem', {'TableName': self.test_table_name})
+                self.assertEqual(acquire.call_count, 1)
+                self.assertEqual(rate_limiter._tokens, -4.5)
+
+                req.return_value = {
+                    'ConsumedCapacity': [
+                        {'TableName': self.test_table_name, 'CapacityUnits': 2},
+                        {'TableName': 'other', 'CapacityUnits': 3}
+                    ]
+                }
+                await conn.dispatch('BatchGetItem', {'RequestItems': {self.test_table_name: {}}})
+                self.assertEqual(acquire.call_count, 2)
+                self.assertEqual(rate_limiter._tokens, -6.5)
+
+                # writes and other tables are not limited
+                await conn.dispatch('PutItem', {'TableName': self.test_table_name})
+                await conn.dispatch('GetItem', {'TableName': 'other'})
+                self.assertEqual(acquire.call_count, 2)
+        finally:
+            set_table_rate_limit(self.test_table_name, READ, None)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_deduplicate_reads(self):
+        conn = AsyncConnection(self.region, deduplicate_reads=True)
+        release = asyncio.Event()
+
+        async def fake_api_call(operation_name, operation_kwargs):
+            await release.wait()
+            return {'Item': {'key': {'S': operation_kwargs['Key']['key']['S']}}}
+
+        def get_item(key, **kwargs):
+            operation_kwargs = {'TableName': self.test_table_name, 'Key': {'key': {'S': key}}}
+            return conn.dispatch('GetItem', dict(operation_kwargs, **kwargs))
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_api_call)) as req:
+            calls = [
+                asyncio.ensure_future(get_item('foo')),
+                asyncio.ensure_future(get_item('foo')),
+                asyncio.ensure_future(get_item('foo')),
+                asyncio.ensure_future(get_item('bar')),
+                asyncio.ensure_future(get_item('foo', ConsistentRead=True)),
+            ]
+            await asyncio.sleep(0.01)
+            release.set()
+            results = await asyncio.gather(*calls)
+            self.assertEqual(req.call_count, 3)
+            self.assertEqual(conn.collapsed_reads['GetItem'], 2)
+            self.assertEqual(results[0], results[1])
+            self.assertIsNot(results[0], results[1])
+            self.assertEqual(results[3], {'Item': {'key': {'S': 'bar'}}})
+
+            # writes are never deduplicated
+            async def fake_put_item(operation_name, operation_kwargs):
+                await asyncio.sleep(0.01)
+                return {}
+
+            req.side_effect = fake_put_item
+            await asyncio.gather(*[conn.dispatch('PutItem', {'TableName': self.test_table_name}) for _ in range(2)])
+            self.assertEqual(req.call_count, 5)
+
+    @pytest.mark.asyncio
+    async def test_dispatch_deduplicate_reads_failure(self):
+        conn = AsyncConnection(self.region, deduplicate_reads=True, max_retry_attempts=0)
+        started = asyncio.Event()
+
+        async def fake_api_call(operation_name, operation_kwargs):
+            started.set()
+            await asyncio.sleep(0.01)
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'Invalid'}}, 'GetItem')
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_api_call)) as req:
+            results = await asyncio.gather(
+                *[conn.dispatch('GetItem', {'TableName': self.test_table_name}) for _ in range(3)],
+                return_exceptions=True
+            )
+            self.assertEqual(req.call_count, 1)
+            self.assertTrue(all(isinstance(result, ClientError) for result in results))
+
+            # when the shared request is cancelled, the other callers send their own
+            async def fake_get_item(operation_name, operation_kwargs):
+                started.set()
+                await asyncio.sleep(0.01)
+                return {'Item': {}}
+
+            started.clear()
+            req.side_effect = fake_get_item
+            leader = asyncio.ensure_future(conn.dispatch('GetItem', {'TableName': self.test_table_name}))
+            follower = asyncio.ensure_future(conn.dispatch('GetItem', {'TableName': self.test_table_name}))
+            await started.wait()
+            leader.cancel()
+            self.assertEqual(await follower, {'Item': {}})
+            self.assertEqual(req.call_count, 3)
+            self.assertTrue(leader.cancelled())
+
+
+class ClientRegistryTestCase(TestCase):
+    """
+    Tests for sharing clients between connections
+    """
+
+    @pytest.mark.asyncio
+    async def test_connections_with_same_settings_share_client(self):
+        credentials = dict(aws_access_key_id='access_key_id', aws_secret_access_key='secret_access_key')
+        conn1 = AsyncConnection(region='us-west-2', max_pool_connections=5, **credentials)
+        conn2 = AsyncConnection(region='us-west-2', max_pool_connections=5, **credentials)
+        self.assertIs(await conn1.client, await conn2.client)
+        await client_registry.close()
+
+    @pytest.mark.asyncio
+    async def test_connections_with_different_settings_do_not_share_client(self):
+        conn = AsyncConnection(region='us-west-2')
+        self.assertIsNot(await conn.client, await AsyncConnection(region='us-west-1').client)
+        self.assertIsNot(await conn.client, await AsyncConnection(region='us-west-2', read_timeout_seconds=1).client)
+        self.assertIsNot(
+            await conn.client,
+            await AsyncConnection(region='us-west-2', aws_access_key_id='a', aws_secret_access_key='b').client
+        )
+        await client_registry.close()
+
+    @pytest.mark.asyncio
+    async def test_get_client_is_single_flight(self):
+        registry = ClientRegistry()
+        created = []
+
+        async def create_client():
+            await asyncio.sleep(0.01)
+            client = mock.Mock()
+            created.append(client)
+            return client
+
+        clients = await asyncio.gather(*[registry.get_client('key', create_client) for _ in range(10)])
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(client is created[0] for client in clients))
+
+    @pytest.mark.asyncio
+    async def test_get_client_failure_is_delivered_to_every_waiter(self):
+        registry = ClientRegistry()
+        create_client = CoroutineMock(side_effect=[ValueError('boom'), mock.Mock()])
+
+        async def slow_create_client():
+            await asyncio.sleep(0.01)
+            return await create_client()
+
+        results = await asyncio.gather(
+            *[registry.get_client('key', slow_create_client) for _ in range(3)],
+            return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        # the failure is not cached
+        self.assertIsNotNone(await registry.get_client('key', slow_create_client))
+        self.assertEqual(create_client.call_count, 2)
+
+    @pytest.mark.asyncio
+    async def test_close(self):
+        registry = ClientRegistry()
+        client = mock.Mock(close=CoroutineMock())
+        await registry.get_client('key', CoroutineMock(return_value=client))
+        self.assertEqual(len(registry), 1)
+
+        await registry.close()
+        client.close.assert_called_once_with()
+        self.assertEqual(len(registry), 0)
+
+    @pytest.mark.asyncio
+    async def test_discard(self):
+        registry = ClientRegistry()
+        stale_client = mock.Mock(close=CoroutineMock())
+        new_client = mock.Mock(close=CoroutineMock())
+        await registry.get_client('key', CoroutineMock(return_value=stale_client))
+
+        await registry.discard('key', stale_client)
+        stale_client.close.assert_called_once_with()
+        self.assertIs(await registry.get_client('key', CoroutineMock(return_value=new_client)), new_client)
+
+        # a connection which still holds the stale client does not discard its replacement
+        await registry.discard('key', stale_client)
+        self.assertEqual(stale_client.close.call_count, 1)
+        self.assertIs(await registry.get_client('key', CoroutineMock()), new_client)
+        new_client.close.assert_not_called()
+
+
+class UnprocessedRetryPolicyTestCase(TestCase):
+    """
+    Tests for the policy resending unprocessed keys and items
+    """
+    def test_max_attempts(self):
+        policy = UnprocessedRetryPolicy(max_attempts=3, base_backoff_ms=10)
+        started_at = time.monotonic()
+        self.assertTrue(0 <= policy.get_backoff_ms(1, started_at) <= 10)
+        self.assertTrue(0 <= policy.get_backoff_ms(2, started_at) <= 20)
+        self.assertIsNone(policy.get_backoff_ms(3, started_at))
+
+        with self.assertRaises(ValueError):
+            UnprocessedRetryPolicy(max_attempts=0)
+
+    def test_deadline(self):
+        policy = UnprocessedRetryPolicy(max_attempts=None, base_backoff_ms=0, deadline_seconds=5)
+        self.assertEqual(policy.get_backoff_ms(100, time.monotonic()), 0)
+        self.assertIsNone(policy.get_backoff_ms(1, time.monotonic() - 6))
+
+    def test_stats(self):
+        policy = UnprocessedRetryPolicy()
+        policy.record('BatchWriteItem', 5)
+        policy.record('BatchWriteItem', 2, exhausted=True)
+        self.assertEqual(policy.stats, {'BatchWriteItem': {'partial_batches': 2, 'unprocessed': 7, 'exhausted': 1}})
+
+
+class MockHTTPResponse(object):
+    status_code = 200
+    raw_headers = [(b'content-type', b'application/x-amz-json-1.0')]
+
+    def __init__(self, body, crc32=None):
+        self.content = body
+        self.headers = {} if crc32 is None else {'x-amz-crc32': str(crc32)}
+
+    async def read(self):
+        return self.content
+
+
+class TrustedInputTestCase(TestCase):
+    """
+    Tests for the trusted input client profile
+    """
+
+    @pytest.mark.asyncio
+    async def test_trusted_input_client(self):
+        conn = AsyncConnection(region='us-east-1', aws_access_key_id='a', aws_secret_access_key='b',
+                               trusted_input=True)
+        body = b'{"Item": {"ForumName": {"S": "foo"}}}'
+        sent_headers = []
+
+        async def fake_request(endpoint, method, url, headers, data, verify, stream):
+            sent_headers.append(headers)
+            return response
+
+        try:
+            client = await conn.client
+            self.assertIsNot(client, await AsyncConnection(
+                region='us-east-1', aws_access_key_id='a', aws_secret_access_key='b').client)
+
+            with patch('aiobotocore.endpoint.AioEndpoint._request', new=fake_request):
+                response = MockHTTPResponse(body, crc32=binascii.crc32(body))
+                data = await conn.dispatch('GetItem', {'TableName': 'Thread', 'Key': {'ForumName': {'S': 'foo'}}})
+                self.assertEqual(data['Item'], {'ForumName': {'S': 'foo'}})
+                # requests are still signed
+                self.assertIn('Authorization', sent_headers[0])
+
+                # parameters are not validated
+                await conn.dispatch('GetItem', {'TableName': 'Thread', 'Key': {}, 'ConsistentRead': 'yes'})
+
+                # checksums are still checked, without retrying
+                response = MockHTTPResponse(body, crc32=1)
+                with self.assertRaises(ChecksumError):
+                    await conn.dispatch('GetItem', {'TableName': 'Thread', 'Key': {'ForumName': {'S': 'foo'}}})
+                self.assertEqual(len(sent_headers), 3)
+        finally:
+            await client_registry.close()
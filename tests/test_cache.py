@@ -0,0 +1,154 @@
+import pytest
+
+from pynamodb.expressions.operand import Path
+
+from inpynamodb.cache import ItemCache, QueryCache, get_condition_key
+
+
+class MockTime:
+    def __init__(self):
+        self.current_time = 0.0
+
+    def monotonic(self):
+        return self.current_time
+
+    def increment_time(self, amount):
+        self.current_time += amount
+
+
+def test_item_cache_exceptions():
+    with pytest.raises(ValueError):
+        ItemCache(max_items=0)
+
+    with pytest.raises(ValueError):
+        ItemCache(ttl_seconds=0)
+
+
+def test_item_cache_ttl():
+    mock_time = MockTime()
+    cache = ItemCache(ttl_seconds=10, time_module=mock_time)
+    cache.set('foo', {'id': {'S': 'foo'}})
+
+    mock_time.increment_time(9)
+    assert cache.get('foo') == {'id': {'S': 'foo'}}
+    mock_time.increment_time(1)
+    assert cache.get('foo') is None
+    assert len(cache) == 0
+    assert cache.stats == {'hits': 1, 'misses': 1, 'evictions': 0, 'invalidations': 0}
+
+
+def test_item_cache_lru():
+    cache = ItemCache(max_items=2)
+    cache.set('foo', {'id': {'S': 'foo'}})
+    cache.set('bar', {'id': {'S': 'bar'}})
+    # foo becomes the most recently used entry
+    assert cache.get('foo') is not None
+    cache.set('baz', {'id': {'S': 'baz'}})
+
+    assert cache.get('bar') is None
+    assert cache.get('foo') is not None
+    assert cache.get('baz') is not None
+    assert cache.stats['evictions'] == 1
+
+
+def test_item_cache_max_bytes():
+    item = {'id': {'S': 'x' * 10}}
+    # each entry is 27 bytes of JSON
+    cache = ItemCache(max_items=None, max_bytes=60)
+    cache.set('foo', item)
+    cache.set('bar', item)
+    assert len(cache) == 2
+    cache.set('baz', item)
+    assert len(cache) == 2
+    assert cache.get('foo') is None
+
+    # replacing an entry does not count its old size
+    cache.set('baz', item)
+    assert len(cache) == 2
+
+
+def test_item_cache_max_bytes_binary():
+    # botocore decodes binary values to bytes, which are measured as their base64 encoding
+    item = {'id': {'S': 'foo'}, 'picture': {'B': b'\x00\x01'}, 'thumbnails': {'BS': [b'\x02']}}
+    cache = ItemCache(max_bytes=1000)
+    cache.set('foo', item)
+    assert cache.get('foo') is item
+    assert cache._size == len('{"id": {"S": "foo"}, "picture": {"B": "AAE="}, "thumbnails": {"BS": ["Ag=="]}}')
+
+    query_cache = QueryCache(max_bytes=1000)
+    query_cache.set((None, 'foo', 1), {'Items': [item], 'Count': 1})
+    assert query_cache.get((None, 'foo', 1))['Items'] == [item]
+
+
+def test_item_cache_invalidate():
+    cache = ItemCache()
+    cache.set('foo', {'id': {'S': 'foo'}})
+    generation = cache.generation
+    cache.invalidate('foo')
+    assert cache.get('foo') is None
+    assert cache.stats['invalidations'] == 1
+
+    # a value read before the invalidation is not cached
+    cache.set('foo', {'id': {'S': 'stale'}}, generation=generation)
+    assert cache.get('foo') is None
+    cache.set('foo', {'id': {'S': 'fresh'}}, generation=cache.generation)
+    assert cache.get('foo') == {'id': {'S': 'fresh'}}
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_query_cache_invalidate_hash_key():
+    cache = QueryCache(max_items=3)
+    page = {'Items': [], 'Count': 0}
+    cache.set(((None, 'foo'), 'a'), page)
+    cache.set(((None, 'foo'), 'b'), page)
+    cache.set(((None, 'bar'), 'a'), page)
+    cache.set(((None, 'foo'), 'a'), page)
+
+    generation = cache.generation
+    cache.invalidate_hash_key((None, 'foo'))
+    assert cache.get(((None, 'foo'), 'a')) is None
+    assert cache.get(((None, 'foo'), 'b')) is None
+    assert cache.get(((None, 'bar'), 'a')) == page
+    assert cache.stats['invalidations'] == 2
+
+    # a page read before the invalidation is not cached
+    cache.set(((None, 'foo'), 'a'), page, generation=generation)
+    assert cache.get(((None, 'foo'), 'a')) is None
+
+
+def test_query_cache_copies_pages():
+    cache = QueryCache()
+    page = {'Items': [{'foo': {'S': 'bar'}}], 'Count': 1}
+    cache.set(((None, 'foo'), 'a'), page)
+    page['Items'][0]['foo']['S'] = 'baz'
+
+    cached = cache.get(((None, 'foo'), 'a'))
+    assert cached == {'Items': [{'foo': {'S': 'bar'}}], 'Count': 1}
+    cached['Items'].clear()
+    assert cache.get(((None, 'foo'), 'a')) == {'Items': [{'foo': {'S': 'bar'}}], 'Count': 1}
+
+
+def test_query_cache_eviction():
+    cache = QueryCache(max_items=1)
+    cache.set(((None, 'foo'), 'a'), {})
+    cache.set(((None, 'bar'), 'a'), {})
+    assert len(cache) == 1
+    assert cache._keys_by_hash_key == {(None, 'bar'): {((None, 'bar'), 'a')}}
+
+
+def test_get_condition_key():
+    key = get_condition_key(Path('foo').startswith('1'), None)
+    assert key == (('begins_with (#0, :0)', None), (('#0', 'foo'),), ((':0', (('S', '1'),)),))
+    hash(key)
+
+    # the placeholders are shared by the conditions of a request, as the connection serializes them
+    key = get_condition_key(Path('foo') == 'bar', Path('baz').is_in('a', 'b'))
+    assert key[0] == ('#0 = :0', '#1 IN (:1, :2)')
+    assert key[1] == (('#0', 'foo'), ('#1', 'baz'))
+    hash(key)
+
+    # conditions on other values or on other attributes are keyed apart
+    assert get_condition_key(Path('foo') == {'N': '1'}) != get_condition_key(Path('foo') == {'S': '1'})
+    assert get_condition_key(Path(['foo.bar']) == 1) != get_condition_key(Path('foo.bar') == 1)
@@ -0,0 +1,117 @@
+"""
+Test capacity accounting scopes
+"""
+import asyncio
+
+import pytest
+from asynctest import TestCase, CoroutineMock, MagicMock
+from asynctest.mock import patch
+
+from inpynamodb.capacity import CapacityScope, get_capacity_scope
+from inpynamodb.connection.base import AsyncConnection
+from inpynamodb.exceptions import CapacityBudgetExceededError
+from inpynamodb.pagination import READ
+
+PATCH_METHOD = 'aiobotocore.client.AioBaseClient._make_api_call'
+
+
+async def fake_api_call(operation_name, operation_kwargs):
+    table_name = operation_kwargs.get('TableName') or next(iter(operation_kwargs['RequestItems']))
+    capacity = {'TableName': table_name, 'CapacityUnits': 1.0}
+    if operation_kwargs.get('ReturnConsumedCapacity') == 'INDEXES':
+        capacity['Table'] = {'CapacityUnits': 0.5}
+        if operation_kwargs.get('IndexName'):
+            capacity['GlobalSecondaryIndexes'] = {operation_kwargs['IndexName']: {'CapacityUnits': 0.5}}
+    return {'ConsumedCapacity': capacity}
+
+
+class CapacityScopeTestCase(TestCase):
+
+    def setUp(self):
+        self.conn = AsyncConnection('us-east-1')
+
+    def query(self, index_name=None):
+        operation_kwargs = {'TableName': 'Thread'}
+        if index_name:
+            operation_kwargs['IndexName'] = index_name
+        return self.conn.dispatch('Query', operation_kwargs)
+
+    @pytest.mark.asyncio
+    async def test_scope(self):
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_api_call)) as req:
+            self.assertIsNone(get_capacity_scope())
+            with CapacityScope() as scope:
+                self.assertIs(get_capacity_scope(), scope)
+                await self.query()
+                await self.query('email_index')
+                await self.conn.dispatch('PutItem', {'TableName': 'Thread'})
+                await self.conn.dispatch('BatchWriteItem', {'RequestItems': {'Forum': []}})
+                await self.conn.dispatch('DescribeTable', {'TableName': 'Thread'})
+            self.assertIsNone(get_capacity_scope())
+            self.assertEqual(req.call_args_list[0][0][1]['ReturnConsumedCapacity'], 'INDEXES')
+
+            # not accounted once the scope is left
+            await self.query()
+            self.assertEqual(req.call_args[0][1]['ReturnConsumedCapacity'], 'TOTAL')
+
+        self.assertEqual(scope.read_capacity_units, 2)
+        self.assertEqual(scope.write_capacity_units, 2)
+        self.assertEqual(scope.tables, {
+            'Thread': {'read_capacity_units': 2, 'write_capacity_units': 1},
+            'Forum': {'read_capacity_units': 0, 'write_capacity_units': 1},
+        })
+        self.assertEqual(scope.indexes, {('Thread', 'email_index'): {'read_capacity_units': 0.5,
+                                                                     'write_capacity_units': 0}})
+
+    @pytest.mark.asyncio
+    async def test_scope_tasks(self):
+        async def handler(count):
+            with CapacityScope() as scope:
+                # tasks created within the scope are accounted to it
+                await asyncio.gather(*[self.query() for _ in range(count)])
+                await asyncio.sleep(0)
+            return scope.read_capacity_units
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_api_call)):
+            with CapacityScope() as outer_scope:
+                results = await asyncio.gather(handler(1), handler(3))
+
+        self.assertEqual(results, [1, 3])
+        self.assertEqual(outer_scope.read_capacity_units, 4)
+
+    @pytest.mark.asyncio
+    async def test_budget(self):
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_api_call)) as req:
+            with CapacityScope(read_budget=2):
+                await self.query()
+                await self.query()
+                with self.assertRaises(CapacityBudgetExceededError) as context:
+                    await self.query()
+                # writes have their own budget
+                await self.conn.dispatch('PutItem', {'TableName': 'Thread'})
+            self.assertEqual(req.call_count, 3)
+            self.assertEqual(context.exception.capacity_type, READ)
+            self.assertEqual(context.exception.consumed, 2)
+
+            # the budget of an enclosing scope applies
+            with CapacityScope(read_budget=1):
+                with CapacityScope():
+                    await self.query()
+                    with self.assertRaises(CapacityBudgetExceededError):
+                        await self.query()
+
+    @pytest.mark.asyncio
+    async def test_over_budget_rate_limit(self):
+        rate_limiter = MagicMock()
+        rate_limiter.acquire = CoroutineMock()
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_api_call)), \
+                patch('inpynamodb.capacity.RateLimiter', return_value=rate_limiter) as rate_limiter_class:
+            with CapacityScope(read_budget=1, over_budget_rate_limit=5) as scope:
+                await self.query()
+                await self.query()
+                await self.query()
+
+        rate_limiter_class.assert_called_once_with(5)
+        self.assertEqual(rate_limiter.acquire.call_count, 2)
+        self.assertEqual(rate_limiter.consume.call_count, 3)
+        self.assertEqual(scope.read_capacity_units, 3)
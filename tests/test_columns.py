@@ -0,0 +1,104 @@
+"""
+Test the columnar scans of Model.scan_columns
+"""
+import math
+from array import array
+
+import pytest
+from asynctest import TestCase
+from asynctest.mock import patch
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute, UTCDateTimeAttribute
+
+from inpynamodb.columns import ColumnBatch
+from inpynamodb.models import Model
+
+PATCH_METHOD = 'aiobotocore.client.AioBaseClient._make_api_call'
+
+
+class ColumnModel(Model):
+    class Meta:
+        table_name = 'ColumnModel'
+        local_meta_table = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    visits = NumberAttribute(attr_name='v', null=True)
+    active = BooleanAttribute(null=True)
+    created_at = UTCDateTimeAttribute(null=True)
+
+
+PAGES = [
+    {
+        'Count': 2,
+        'ScannedCount': 2,
+        'Items': [
+            {'user_name': {'S': 'foo'}, 'v': {'N': '3'}, 'active': {'BOOL': True}},
+            {'user_name': {'S': 'bar'}, 'v': {'N': '1.5'}, 'created_at': {'S': '2020-01-02T03:04:05.000000+0000'}},
+        ],
+        'LastEvaluatedKey': {'user_name': {'S': 'bar'}},
+    },
+    {
+        'Count': 2,
+        'ScannedCount': 2,
+        'Items': [
+            {'v': {'N': '2'}, 'active': {'BOOL': False}},
+            {'user_name': {'S': 'baz'}},
+        ],
+    },
+]
+
+
+class ScanColumnsTestCase(TestCase):
+
+    @pytest.mark.asyncio
+    async def test_scan_columns(self):
+        with patch(PATCH_METHOD) as req:
+            req.side_effect = PAGES
+            batch = await ColumnModel.scan_columns(['user_name', 'visits', 'active', 'created_at'], page_size=2)
+
+        self.assertEqual(req.call_count, 2)
+        params = req.call_args_list[0][0][1]
+        self.assertEqual(params['Limit'], 2)
+        self.assertEqual(
+            sorted(params['ExpressionAttributeNames'].values()), ['active', 'created_at', 'user_name', 'v']
+        )
+        self.assertIn('ProjectionExpression', params)
+        self.assertEqual(req.call_args_list[1][0][1]['ExclusiveStartKey'], {'user_name': {'S': 'bar'}})
+
+        self.assertIsInstance(batch, ColumnBatch)
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(list(batch), ['user_name', 'visits', 'active', 'created_at'])
+        self.assertEqual(batch['user_name'], ['foo', 'bar', None, 'baz'])
+        self.assertIsInstance(batch['visits'], array)
+        self.assertEqual(batch['visits'][:3].tolist(), [3.0, 1.5, 2.0])
+        self.assertTrue(math.isnan(batch['visits'][3]))
+        self.assertEqual(batch['active'], array('b', [1, -1, 0, -1]))
+        self.assertEqual([value is None for value in batch['created_at']], [True, False, True, True])
+        self.assertEqual(batch['created_at'][1].year, 2020)
+
+    @pytest.mark.asyncio
+    async def test_scan_columns_limit(self):
+        with patch(PATCH_METHOD) as req:
+            req.side_effect = PAGES
+            batch = await ColumnModel.scan_columns(['visits'], limit=1)
+
+        self.assertEqual(req.call_count, 1)
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(batch['visits'], array('d', [3.0]))
+
+        with self.assertRaises(ValueError):
+            await ColumnModel.scan_columns(['unknown'])
+
+    def test_to_numpy(self):
+        numpy = pytest.importorskip('numpy')
+        batch = ColumnBatch({
+            'visits': array('d', [3.0, 1.5]),
+            'active': array('b', [1, -1]),
+            'empty': array('d'),
+            'user_name': ['foo', None],
+        }, 2)
+        arrays = batch.to_numpy()
+        self.assertEqual(arrays['visits'].dtype, numpy.float64)
+        self.assertEqual(arrays['visits'].sum(), 4.5)
+        self.assertEqual(arrays['active'].dtype, numpy.int8)
+        self.assertEqual(len(arrays['empty']), 0)
+        self.assertEqual(arrays['user_name'].tolist(), ['foo', None])
@@ -0,0 +1,76 @@
+from botocore.exceptions import ClientError
+
+from inpynamodb.connection.metrics import MetricsRegistry, Histogram, get_error_code, get_metric_labels
+
+
+def test_histogram():
+    histogram = Histogram([1, 5])
+    for value in [0.5, 1, 3, 10]:
+        histogram.observe(value)
+    assert histogram.snapshot() == {
+        'buckets': [(1, 2), (5, 3), (float('inf'), 4)],
+        'count': 4,
+        'sum': 14.5,
+    }
+
+
+def test_get_error_code():
+    error = ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Slow down'}}, 'Query')
+    assert get_error_code(error) == 'ThrottlingException'
+    assert get_error_code(ValueError()) == 'ValueError'
+
+
+def test_get_metric_labels():
+    assert get_metric_labels({'TableName': 'Thread', 'IndexName': 'email_index'}) == ('Thread', 'email_index')
+    assert get_metric_labels({'RequestItems': {'Thread': {}}}) == ('Thread', '')
+    assert get_metric_labels({'RequestItems': {'Thread': {}, 'Forum': {}}}) == ('', '')
+
+
+def test_metrics_registry():
+    metrics = MetricsRegistry(latency_buckets=[0.01, 0.1], size_buckets=[100], record_payload_sizes=True)
+    query_kwargs = {'TableName': 'Thread', 'IndexName': 'email_index'}
+    metrics.record_attempt('Query', query_kwargs, 0.05)
+    metrics.record_response('Query', query_kwargs, {'Items': [], 'ConsumedCapacity': {'CapacityUnits': 2}})
+    batch_kwargs = {'RequestItems': {'Thread': {}}}
+    metrics.record_attempt('BatchWriteItem', batch_kwargs, 0.2)
+    metrics.record_response('BatchWriteItem', batch_kwargs, {'ConsumedCapacity': [{'CapacityUnits': 3}]})
+
+    write, query = metrics.snapshot()
+    assert (query['table'], query['index'], query['operation']) == ('Thread', 'email_index', 'Query')
+    assert query['read_capacity_units'] == 2
+    assert query['latency_seconds']['buckets'] == [(0.01, 0), (0.1, 1), (float('inf'), 1)]
+    assert write['write_capacity_units'] == 3
+    assert write['request_size_bytes']['count'] == 1
+
+    metrics.reset()
+    assert metrics.snapshot() == []
+
+
+def test_metrics_registry_without_payload_sizes():
+    metrics = MetricsRegistry(record_payload_sizes=False)
+    metrics.record_response('GetItem', {'TableName': 'Thread'}, {'Item': {}})
+    assert metrics.snapshot()[0]['request_size_bytes']['count'] == 0
+
+    # payloads are not measured by default
+    metrics = MetricsRegistry()
+    metrics.record_response('GetItem', {'TableName': 'Thread'}, {'Item': {}})
+    assert metrics.snapshot()[0]['response_size_bytes']['count'] == 0
+
+
+def test_to_prometheus():
+    metrics = MetricsRegistry(latency_buckets=[0.1], size_buckets=[100])
+    error = ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Slow down'}}, 'GetItem')
+    metrics.record_attempt('GetItem', {'TableName': 'Th"read'}, 0.5, error=error, retried=True)
+
+    text = metrics.to_prometheus()
+    labels = 'table="Th\\"read",index="",operation="GetItem"'
+    assert '# TYPE inpynamodb_requests_total counter' in text
+    assert 'inpynamodb_requests_total{%s} 1' % labels in text
+    assert 'inpynamodb_errors_total{%s,code="ThrottlingException"} 1' % labels in text
+    assert 'inpynamodb_throttles_total{%s} 1' % labels in text
+    assert 'inpynamodb_retries_total{%s} 1' % labels in text
+    assert '# TYPE inpynamodb_request_latency_seconds histogram' in text
+    assert 'inpynamodb_request_latency_seconds_bucket{%s,le="0.1"} 0' % labels in text
+    assert 'inpynamodb_request_latency_seconds_bucket{%s,le="+Inf"} 1' % labels in text
+    assert 'inpynamodb_request_latency_seconds_sum{%s} 0.5' % labels in text
+    assert text.endswith('\n')
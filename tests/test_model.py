@@ -1,6 +1,7 @@
 """
 Test model API
 """
+import asyncio
 import base64
 import copy
 import json
@@ -18,14 +19,18 @@ from pynamodb.attributes import UnicodeAttribute, UTCDateTimeAttribute, NumberSe
 from pynamodb.connection.util import pythonic
 from pynamodb.constants import ITEM, STRING_SHORT, ATTRIBUTES, EXCLUSIVE_START_KEY, RESPONSES, CAMEL_COUNT, ITEMS, \
     SCANNED_COUNT, LAST_EVALUATED_KEY, REQUEST_ITEMS, UNPROCESSED_KEYS, KEYS, BINARY_SHORT, DEFAULT_ENCODING, \
-    UNPROCESSED_ITEMS, ALL, KEYS_ONLY, INCLUDE, MAP_SHORT, LIST_SHORT, NUMBER_SHORT
-from pynamodb.exceptions import TableError, DoesNotExist
+    UNPROCESSED_ITEMS, ALL, KEYS_ONLY, INCLUDE, MAP_SHORT, LIST_SHORT, NUMBER_SHORT, BATCH_GET_ITEM, BATCH_WRITE_ITEM
+from pynamodb.exceptions import TableError, DoesNotExist, GetError
 from pynamodb.indexes import AllProjection, IncludeProjection, KeysOnlyProjection
 from pynamodb.models import ResultSet
 from pynamodb.types import RANGE
 
+from inpynamodb.cache import ItemCache, QueryCache
+from inpynamodb.connection.retry import UnprocessedRetryPolicy
+from inpynamodb.exceptions import UnprocessedKeysError, UnprocessedItemsError, BatchWriteError
 from inpynamodb.indexes import LocalSecondaryIndex, GlobalSecondaryIndex, Index
-from inpynamodb.models import Model
+from inpynamodb.models import Model, _meta_table_checks
+from inpynamodb.pagination import RateLimiter, READ, set_table_rate_limit
 from tests.data import MODEL_TABLE_DATA, DESCRIBE_TABLE_DATA_PAY_PER_REQUEST, SIMPLE_MODEL_TABLE_DATA, \
     CUSTOM_ATTR_NAME_INDEX_TABLE_DATA, GET_MODEL_ITEM_DATA, COMPLEX_TABLE_DATA, COMPLEX_ITEM_DATA, CAR_MODEL_TABLE_DATA, \
     BATCH_GET_ITEMS, CUSTOM_ATTR_NAME_ITEM_DATA, SIMPLE_BATCH_GET_ITEMS, INDEX_TABLE_DATA, LOCAL_INDEX_TABLE_DATA, \
@@ -435,6 +440,113 @@ class VersionedModel(Model):
     version = VersionAttribute()
 
 
+class LocalMetaTableEmailIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name = 'email_index'
+        read_capacity_units = 1
+        write_capacity_units = 1
+        projection = AllProjection()
+
+    email = UnicodeAttribute(hash_key=True)
+
+
+class LocalMetaTableModel(Model):
+    class Meta:
+        table_name = 'LocalMetaTableModel'
+        local_meta_table = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = UnicodeAttribute(range_key=True)
+    email = UnicodeAttribute(null=True)
+    email_index = LocalMetaTableEmailIndex()
+
+
+class CheckedMetaTableModel(Model):
+    class Meta:
+        table_name = 'Thread'
+        local_meta_table = True
+        check_meta_table = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = UnicodeAttribute(range_key=True)
+
+
+class DriftedMetaTableModel(Model):
+    class Meta:
+        table_name = 'Thread'
+        local_meta_table = True
+        check_meta_table = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = NumberAttribute(range_key=True)
+
+
+class CoalescedModel(Model):
+    class Meta:
+        table_name = 'CoalescedModel'
+        local_meta_table = True
+        get_coalescing_window = 0
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = UnicodeAttribute(range_key=True)
+    email = UnicodeAttribute(null=True)
+
+
+class CachedModel(Model):
+    class Meta:
+        table_name = 'CachedModel'
+        local_meta_table = True
+        item_cache = ItemCache(max_items=10)
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = UnicodeAttribute(range_key=True)
+    email = UnicodeAttribute(null=True)
+
+
+class NegativeCachedModel(Model):
+    class Meta:
+        table_name = 'NegativeCachedModel'
+        local_meta_table = True
+        negative_cache = ItemCache(max_items=100, ttl_seconds=10)
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = UnicodeAttribute(range_key=True)
+
+
+class NumberKeyedModel(Model):
+    class Meta:
+        table_name = 'NumberKeyedModel'
+        local_meta_table = True
+        get_coalescing_window = 0
+        negative_cache = ItemCache(max_items=100, ttl_seconds=10)
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = NumberAttribute(range_key=True)
+    email = UnicodeAttribute(null=True)
+
+
+class QueryCachedEmailIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name = 'email_index'
+        read_capacity_units = 1
+        write_capacity_units = 1
+        projection = AllProjection()
+
+    email = UnicodeAttribute(hash_key=True)
+
+
+class QueryCachedModel(Model):
+    class Meta:
+        table_name = 'QueryCachedModel'
+        local_meta_table = True
+        query_cache = QueryCache(max_items=100, ttl_seconds=10)
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = UnicodeAttribute(range_key=True)
+    email = UnicodeAttribute(null=True)
+    email_index = QueryCachedEmailIndex()
+
+
 class ModelTestCase(TestCase):
     """
     Tests for the models API
@@ -693,6 +805,48 @@ class ModelTestCase(TestCase):
                 GET_MODEL_ITEM_DATA.get(ITEM).get('user_name').get(STRING_SHORT))
             self.assertIsNone(item.picture)
 
+    @pytest.mark.asyncio
+    async def test_local_meta_table(self):
+        """
+        Model with Meta.local_meta_table does not describe the table
+        """
+        meta_table = LocalMetaTableModel._get_meta_table()
+        self.assertEqual(meta_table.hash_keyname, 'user_name')
+        self.assertEqual(meta_table.range_keyname, 'user_id')
+        self.assertEqual(meta_table.get_attribute_type('user_id'), STRING_SHORT)
+        self.assertEqual(meta_table.get_index_hash_keyname('email_index'), 'email')
+
+        with patch(PATCH_METHOD) as req:
+            req.return_value = {ITEM: {'user_name': {STRING_SHORT: 'foo'}, 'user_id': {STRING_SHORT: 'bar'}}}
+            item = await LocalMetaTableModel.get('foo', 'bar')
+            self.assertEqual(item.user_id, 'bar')
+            self.assertEqual(req.call_count, 1)
+            self.assertEqual(req.call_args[0][0], 'GetItem')
+
+        with patch(PATCH_METHOD) as req:
+            req.return_value = {'Count': 0, 'ScannedCount': 0, 'Items': []}
+            self.assertEqual([item async for item in await LocalMetaTableModel.email_index.query('foo')], [])
+            self.assertEqual(req.call_count, 1)
+            self.assertEqual(req.call_args[0][0], 'Query')
+            self.assertEqual(req.call_args[0][1]['ExpressionAttributeNames'], {'#0': 'email'})
+            self.assertEqual(req.call_args[0][1]['ExpressionAttributeValues'], {':0': {STRING_SHORT: 'foo'}})
+
+    @pytest.mark.asyncio
+    async def test_local_meta_table_check(self):
+        """
+        Model with Meta.check_meta_table compares the model with DescribeTable in the background
+        """
+        with patch(PATCH_METHOD) as req, patch('inpynamodb.models.log') as log_mock:
+            req.return_value = MODEL_TABLE_DATA
+            await CheckedMetaTableModel._get_connection()
+            await DriftedMetaTableModel._get_connection()
+            self.assertEqual(len(_meta_table_checks), 2)
+            await asyncio.wait(_meta_table_checks)
+            self.assertEqual(_meta_table_checks, set())
+            self.assertEqual(req.call_count, 2)
+            self.assertEqual(log_mock.warning.call_count, 1)
+            self.assertIn('DriftedMetaTableModel', log_mock.warning.call_args[0])
+
     @pytest.mark.asyncio
     async def test_complex_key(self):
         """
@@ -1565,6 +1719,52 @@ class ModelTestCase(TestCase):
             self.assertEqual(results_iter.total_count, 30)
             self.assertEqual(results_iter.page_iter.total_scanned_count, 60)
 
+    @pytest.mark.asyncio
+    async def test_scan_pages(self):
+        with patch(PATCH_METHOD) as req:
+            items = []
+            for idx in range(30):
+                item = copy.copy(GET_MODEL_ITEM_DATA.get(ITEM))
+                item['user_id'] = {STRING_SHORT: 'id-{}'.format(idx)}
+                items.append(item)
+
+            req.side_effect = [
+                {'Count': 10, 'ScannedCount': 10, 'Items': items[:10], 'LastEvaluatedKey': {'user_id': 'x'}},
+                {'Count': 0, 'ScannedCount': 10, 'Items': [], 'LastEvaluatedKey': {'user_id': 'y'}},
+                {'Count': 20, 'ScannedCount': 20, 'Items': items[10:30], 'LastEvaluatedKey': {'user_id': 'z'}},
+            ]
+            results_iter = await UserModel.scan(limit=25, page_size=10)
+            first = await results_iter.__anext__()
+            self.assertEqual(first.user_id, 'id-0')
+
+            pages = [page async for page in results_iter.pages()]
+            self.assertEqual([len(page) for page in pages], [9, 15])
+            self.assertTrue(all(isinstance(item, UserModel) for page in pages for item in page))
+            self.assertEqual(pages[1][-1].user_id, 'id-24')
+            self.assertEqual(len(req.mock_calls), 3)
+            self.assertEqual(await results_iter.last_evaluated_key, {'user_id': items[24]['user_id']})
+
+    @pytest.mark.asyncio
+    async def test_query_raw_pages(self):
+        items = []
+        for idx in range(5):
+            item = copy.copy(GET_MODEL_ITEM_DATA.get(ITEM))
+            item['user_id'] = {STRING_SHORT: 'id-{}'.format(idx)}
+            items.append(item)
+
+        with patch(PATCH_METHOD) as req:
+            req.side_effect = [
+                {'Count': 3, 'ScannedCount': 3, 'Items': items[:3], 'LastEvaluatedKey': {'user_id': 'x'}},
+                {'Count': 2, 'ScannedCount': 2, 'Items': items[3:]},
+            ]
+            pages = [page async for page in (await UserModel.query('foo', raw=True)).pages()]
+            self.assertEqual(pages, [items[:3], items[3:]])
+
+        with patch(PATCH_METHOD) as req:
+            req.return_value = {'Count': 5, 'ScannedCount': 5, 'Items': items}
+            results = [item async for item in await UserModel.scan(raw=True)]
+            self.assertEqual(results, items)
+
     @pytest.mark.asyncio
     async def test_scan_limit(self):
         """
@@ -1649,6 +1849,109 @@ class ModelTestCase(TestCase):
             async for item in await UserModel.scan():
                 self.assertIsNotNone(item)
 
+    @pytest.mark.asyncio
+    async def test_scan_rate_limit(self):
+        """
+        Model.scan(rate_limit)
+        """
+        items = []
+        for idx in range(10):
+            item = copy.copy(GET_MODEL_ITEM_DATA.get(ITEM))
+            item['user_id'] = {STRING_SHORT: 'id-{}'.format(idx)}
+            items.append(item)
+        rate_limiter = RateLimiter(100)
+
+        with patch(PATCH_METHOD) as req, patch.object(rate_limiter, 'acquire', new=CoroutineMock()) as acquire:
+            req.side_effect = [
+                {'Count': 5, 'ScannedCount': 5, 'Items': items[:5], 'LastEvaluatedKey': {'user_id': 'x'},
+                 'ConsumedCapacity': {'TableName': 'UserModel', 'CapacityUnits': 1.5}},
+                {'Count': 5, 'ScannedCount': 5, 'Items': items[5:],
+                 'ConsumedCapacity': {'TableName': 'UserModel', 'CapacityUnits': 2}},
+            ]
+            scanned = [item async for item in await UserModel.scan(rate_limit=rate_limiter)]
+            self.assertEqual(len(scanned), 10)
+            self.assertEqual(acquire.call_count, 2)
+            self.assertEqual(rate_limiter._tokens, -3.5)
+            self.assertEqual(req.mock_calls[0][1][1]['ReturnConsumedCapacity'], 'TOTAL')
+
+    @pytest.mark.asyncio
+    async def test_scan_table_rate_limit(self):
+        """
+        Model.scan(rate_limit) with the table's shared RateLimiter
+        """
+        rate_limiter = set_table_rate_limit(UserModel.Meta.table_name, READ, 100)
+        try:
+            with patch(PATCH_METHOD) as req, patch.object(rate_limiter, 'acquire', new=CoroutineMock()) as acquire:
+                req.return_value = {
+                    'Count': 1, 'ScannedCount': 1, 'Items': [GET_MODEL_ITEM_DATA.get(ITEM)],
+                    'ConsumedCapacity': {'TableName': UserModel.Meta.table_name, 'CapacityUnits': 5}
+                }
+                scanned = [item async for item in await UserModel.scan(rate_limit=rate_limiter)]
+                self.assertEqual(len(scanned), 1)
+                # the page is acquired and charged once, by the connection
+                self.assertEqual(acquire.call_count, 1)
+                self.assertEqual(rate_limiter._tokens, -5)
+        finally:
+            set_table_rate_limit(UserModel.Meta.table_name, READ, None)
+
+    @pytest.mark.asyncio
+    async def test_scan_prefetch(self):
+        """
+        Model.scan(prefetch)
+        """
+        items = []
+        for idx in range(10):
+            item = copy.copy(GET_MODEL_ITEM_DATA.get(ITEM))
+            item['user_id'] = {STRING_SHORT: 'id-{}'.format(idx)}
+            items.append(item)
+
+        pages = {
+            None: {'Count': 4, 'ScannedCount': 4, 'Items': items[:4], 'LastEvaluatedKey': 'x'},
+            'x': {'Count': 4, 'ScannedCount': 4, 'Items': items[4:8], 'LastEvaluatedKey': 'y'},
+            'y': {'Count': 2, 'ScannedCount': 2, 'Items': items[8:]},
+        }
+
+        def fake_scan(operation_name, kwargs):
+            if operation_name == 'DescribeTable':
+                return MODEL_TABLE_DATA
+            start_key = kwargs.get('ExclusiveStartKey')
+            return pages[start_key['user_name']['S'] if start_key else None]
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_scan)) as req:
+            results = await UserModel.scan(prefetch=2)
+            first = await results.__anext__()
+            self.assertEqual(first.user_id, 'id-0')
+            await asyncio.sleep(0.01)
+            # the remaining pages were requested while the first one was consumed
+            scans = [call[1][1] for call in req.mock_calls if call[1][0] == 'Scan']
+            self.assertEqual(len(scans), 3)
+            self.assertEqual(scans[2]['ExclusiveStartKey'], {'user_name': {'S': 'y'}})
+
+            scanned = [item async for item in results]
+            self.assertEqual([item.user_id for item in scanned], ['id-{}'.format(idx) for idx in range(1, 10)])
+
+    @pytest.mark.asyncio
+    async def test_parallel_scan(self):
+        """
+        Model.parallel_scan
+        """
+        def fake_scan(operation_name, kwargs):
+            if operation_name == 'DescribeTable':
+                return MODEL_TABLE_DATA
+            segment = kwargs['Segment']
+            item = copy.copy(GET_MODEL_ITEM_DATA.get(ITEM))
+            item['user_id'] = {STRING_SHORT: 'id-{}'.format(segment)}
+            return {'Count': 1, 'ScannedCount': 1, 'Items': [item]}
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_scan)) as req:
+            results = await UserModel.parallel_scan(3, concurrency=2, page_size=10)
+            scanned = [item async for item in results]
+            self.assertEqual(sorted(item.user_id for item in scanned), ['id-0', 'id-1', 'id-2'])
+            scans = [call[1][1] for call in req.mock_calls if call[1][0] == 'Scan']
+            self.assertEqual(sorted(scan['Segment'] for scan in scans), [0, 1, 2])
+            self.assertTrue(all(scan['TotalSegments'] == 3 and scan['Limit'] == 10 for scan in scans))
+            self.assertEqual(await results.last_evaluated_keys, {})
+
     @pytest.mark.asyncio
     async def test_get(self):
         """
@@ -1888,10 +2191,46 @@ class ModelTestCase(TestCase):
         batch_get_mock = CoroutineMock()
         batch_get_mock.side_effect = fake_batch_get
 
-        with patch(PATCH_METHOD, new=batch_get_mock) as req:
+        retry_policy = UnprocessedRetryPolicy(max_attempts=None, base_backoff_ms=0)
+        with patch(PATCH_METHOD, new=batch_get_mock) as req, \
+                patch.object(UserModel.Meta, 'unprocessed_retry_policy', retry_policy, create=True):
             item_keys = [('hash-{}'.format(x), '{}'.format(x)) for x in range(200)]
             async for item in UserModel.batch_get(item_keys):
                 self.assertIsNotNone(item)
+            self.assertEqual(retry_policy.stats[BATCH_GET_ITEM]['partial_batches'], 199)
+
+    @pytest.mark.asyncio
+    async def test_batch_get_concurrency(self):
+        """
+        Model.batch_get(concurrency)
+        """
+        await self.init_table_meta(UserModel, MODEL_TABLE_DATA)
+        requested = []
+
+        async def fake_batch_get(operation_name, kwargs):
+            keys = kwargs[REQUEST_ITEMS][UserModel.Meta.table_name][KEYS]
+            requested.append(len(keys))
+            # the first page only processes half of its keys
+            processed, unprocessed = (keys[:50], keys[50:]) if len(requested) == 1 else (keys, [])
+            await asyncio.sleep(0)
+            return {
+                UNPROCESSED_KEYS: {UserModel.Meta.table_name: {KEYS: unprocessed}} if unprocessed else {},
+                RESPONSES: {UserModel.Meta.table_name: processed},
+            }
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_batch_get)):
+            item_keys = [('hash-{}'.format(x), '{}'.format(x)) for x in range(350)]
+            items = [item async for item in UserModel.batch_get(item_keys, concurrency=3)]
+            self.assertEqual(
+                sorted(item.user_id for item in items),
+                sorted('{}'.format(x) for x in range(350))
+            )
+            # three pages were sent at once, the unprocessed keys went out with the fourth page
+            self.assertEqual(requested[:3], [100, 100, 100])
+            self.assertEqual(sum(requested), 400)
+
+        with self.assertRaises(ValueError):
+            [item async for item in UserModel.batch_get(item_keys, concurrency=0)]
 
     @pytest.mark.asyncio
     async def test_batch_write(self):
@@ -1985,6 +2324,397 @@ class ModelTestCase(TestCase):
 
             self.assertEqual(len(req.mock_calls), 3)
 
+    @pytest.mark.asyncio
+    async def test_batch_write_unprocessed_exhausted(self):
+        items = [UserModel('daniel', '{}'.format(idx)) for idx in range(3)]
+        unprocessed_items = [
+            {'PutRequest': {'Item': item._serialize(attr_map=True)['attributes']}} for item in items[1:]
+        ]
+        retry_policy = UnprocessedRetryPolicy(max_attempts=3, base_backoff_ms=0)
+
+        with patch(PATCH_METHOD) as req, \
+                patch.object(UserModel.Meta, 'unprocessed_retry_policy', retry_policy, create=True):
+            req.return_value = {UNPROCESSED_ITEMS: {UserModel.Meta.table_name: unprocessed_items}}
+
+            with self.assertRaises(UnprocessedItemsError) as context:
+                async with UserModel.batch_write() as batch:
+                    for item in items:
+                        await batch.save(item)
+
+            self.assertEqual(len(req.mock_calls), 3)
+            self.assertEqual(
+                context.exception.put_items, [request['PutRequest']['Item'] for request in unprocessed_items]
+            )
+            self.assertEqual(context.exception.delete_items, [])
+            self.assertEqual(
+                retry_policy.stats[BATCH_WRITE_ITEM],
+                {'partial_batches': 3, 'unprocessed': 6, 'exhausted': 1}
+            )
+
+    @pytest.mark.asyncio
+    async def test_batch_write_concurrency(self):
+        """
+        Model.batch_write(concurrency)
+        """
+        await self.init_table_meta(UserModel, MODEL_TABLE_DATA)
+        in_flight = []
+        written = []
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def fake_batch_write(operation_name, kwargs):
+            in_flight.append(kwargs)
+            started.set()
+            await release.wait()
+            in_flight.remove(kwargs)
+            written.extend(kwargs[REQUEST_ITEMS][UserModel.Meta.table_name])
+            return {}
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_batch_write)):
+            async with UserModel.batch_write(concurrency=1) as batch:
+                try:
+                    for idx in range(50):
+                        await batch.save(UserModel('daniel', '{}'.format(idx)))
+                    # the first batch is in flight and the producer was not held back
+                    await started.wait()
+                    self.assertEqual(len(in_flight), 1)
+                    self.assertEqual(len(batch.pending_operations), 25)
+
+                    # the flusher is busy: the producer waits for it before handing over the second batch
+                    producer = asyncio.ensure_future(batch.save(UserModel('daniel', '50')))
+                    for _ in range(10):
+                        await asyncio.sleep(0)
+                    self.assertFalse(producer.done())
+                finally:
+                    release.set()
+                await producer
+            self.assertEqual(len(in_flight), 0)
+            self.assertEqual(len(written), 51)
+
+        with self.assertRaises(ValueError):
+            UserModel.batch_write(concurrency=0)
+
+    @pytest.mark.asyncio
+    async def test_batch_write_concurrency_failures(self):
+        await self.init_table_meta(UserModel, MODEL_TABLE_DATA)
+        retry_policy = UnprocessedRetryPolicy(max_attempts=1)
+        items = [UserModel('daniel', '{}'.format(idx)) for idx in range(50)]
+
+        async def fake_batch_write(operation_name, kwargs):
+            requests = kwargs[REQUEST_ITEMS][UserModel.Meta.table_name]
+            if any(request.get('DeleteRequest', {}).get('Key', {}).get('user_id') == {STRING_SHORT: '0'}
+                   for request in requests):
+                # the first batch only leaves its first delete unprocessed
+                return {UNPROCESSED_ITEMS: {UserModel.Meta.table_name: requests[:1]}}
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'Invalid'}}, 'BatchWriteItem')
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_batch_write)), \
+                patch.object(UserModel.Meta, 'unprocessed_retry_policy', retry_policy, create=True):
+            with self.assertRaises(BatchWriteError) as context:
+                async with UserModel.batch_write(concurrency=2) as batch:
+                    for item in items[:25]:
+                        await batch.delete(item)
+                    for item in items[25:]:
+                        await batch.save(item)
+
+        failed_operations = context.exception.failed_operations
+        self.assertEqual(len(failed_operations), 26)
+        self.assertEqual(failed_operations[0]['action'], 'DELETE')
+        self.assertIs(failed_operations[0]['item'], items[0])
+        self.assertIsInstance(failed_operations[0]['error'], UnprocessedItemsError)
+        self.assertEqual([operation['item'] for operation in failed_operations[1:]], items[25:])
+        self.assertTrue(all(operation['action'] == 'PUT' for operation in failed_operations[1:]))
+
+    @pytest.mark.asyncio
+    async def test_get_coalescing(self):
+        """
+        Model.get with Meta.get_coalescing_window
+        """
+        stored = {
+            ('foo', '{}'.format(idx)): {
+                'user_name': {'S': 'foo'}, 'user_id': {'S': '{}'.format(idx)}, 'email': {'S': 'x'}
+            }
+            for idx in range(200)
+        }
+
+        async def fake_batch_get(operation_name, kwargs):
+            request = kwargs[REQUEST_ITEMS]['CoalescedModel']
+            keys = request[KEYS]
+            # BatchGetItem rejects duplicate keys
+            assert len(set((key['user_name']['S'], key['user_id']['S']) for key in keys)) == len(keys)
+            items = [stored[(key['user_name']['S'], key['user_id']['S'])] for key in keys
+                     if (key['user_name']['S'], key['user_id']['S']) in stored]
+            return {RESPONSES: {'CoalescedModel': items}, UNPROCESSED_KEYS: {}}
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_batch_get)) as req:
+            results = await asyncio.gather(
+                CoalescedModel.get('foo', '1'),
+                CoalescedModel.get('foo', '1'),
+                CoalescedModel.get('foo', '2'),
+                CoalescedModel.get('foo', 'missing'),
+                return_exceptions=True
+            )
+            self.assertEqual(req.call_count, 1)
+            self.assertEqual(len(req.call_args[0][1][REQUEST_ITEMS]['CoalescedModel'][KEYS]), 3)
+            self.assertEqual([result.user_id for result in results[:3]], ['1', '1', '2'])
+            # every caller gets its own instance
+            self.assertIsNot(results[0], results[1])
+            self.assertIsInstance(results[3], CoalescedModel.DoesNotExist)
+
+            # calls with different options are not combined
+            req.reset_mock()
+            await asyncio.gather(
+                CoalescedModel.get('foo', '1'),
+                CoalescedModel.get('foo', '2', consistent_read=True),
+                CoalescedModel.get('foo', '3', attributes_to_get=['email']),
+            )
+            self.assertEqual(req.call_count, 3)
+            requests = [call[1][1][REQUEST_ITEMS]['CoalescedModel'] for call in req.mock_calls]
+            self.assertEqual(sorted(request.get('ConsistentRead', False) for request in requests), [False, False, True])
+
+            # a batch holds at most 100 keys
+            req.reset_mock()
+            results = await asyncio.gather(*[CoalescedModel.get('foo', '{}'.format(idx)) for idx in range(150)])
+            self.assertEqual([result.user_id for result in results], ['{}'.format(idx) for idx in range(150)])
+            self.assertEqual(
+                sorted(len(call[1][1][REQUEST_ITEMS]['CoalescedModel'][KEYS]) for call in req.mock_calls),
+                [50, 100]
+            )
+
+            # the coalescer holds the task sending a batch until it is done
+            coalescer = CoalescedModel._get_coalescer()
+            get = asyncio.ensure_future(CoalescedModel.get('foo', '1'))
+            await asyncio.sleep(0)
+            self.assertEqual(len(coalescer._sends), 1)
+            self.assertEqual((await get).user_id, '1')
+            await asyncio.sleep(0)
+            self.assertEqual(coalescer._sends, set())
+
+    @pytest.mark.asyncio
+    async def test_get_coalescing_error(self):
+        error = ClientError({'Error': {'Code': 'ValidationException', 'Message': 'Invalid'}}, 'BatchGetItem')
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=error)):
+            results = await asyncio.gather(
+                CoalescedModel.get('foo', '1'),
+                CoalescedModel.get('foo', '2'),
+                return_exceptions=True
+            )
+            self.assertTrue(all(isinstance(result, GetError) for result in results))
+
+    @pytest.mark.asyncio
+    async def test_item_cache(self):
+        """
+        Model.get with Meta.item_cache
+        """
+        item_cache = CachedModel.Meta.item_cache
+        item_cache.clear()
+        item_data = {'user_name': {'S': 'foo'}, 'user_id': {'S': 'bar'}, 'email': {'S': 'foo@example.com'}}
+
+        with patch(PATCH_METHOD) as req:
+            req.return_value = {ITEM: item_data}
+            first = await CachedModel.get('foo', 'bar')
+            second = await CachedModel.get('foo', 'bar')
+            self.assertEqual(req.call_count, 1)
+            self.assertEqual(second.email, 'foo@example.com')
+            # every hit builds a new instance
+            self.assertIsNot(first, second)
+
+            # consistent reads go to the table, projected reads are not cached
+            await CachedModel.get('foo', 'bar', consistent_read=True)
+            await CachedModel.get('foo', 'bar', attributes_to_get=['email'])
+            self.assertEqual(req.call_count, 3)
+
+            refreshed = CachedModel('foo', 'bar')
+            await refreshed.refresh()
+            self.assertEqual(refreshed.email, 'foo@example.com')
+            self.assertEqual(req.call_count, 3)
+
+            # local writes invalidate the entry
+            req.return_value = {}
+            await second.save()
+            req.return_value = {ITEM: item_data}
+            await CachedModel.get('foo', 'bar')
+            self.assertEqual(req.call_count, 5)
+
+            req.return_value = {}
+            await second.delete()
+            req.return_value = {ITEM: item_data}
+            await CachedModel.get('foo', 'bar')
+            self.assertEqual(req.call_count, 7)
+
+            req.return_value = {}
+            async with CachedModel.batch_write() as batch:
+                await batch.save(second)
+            req.return_value = {ITEM: item_data}
+            await CachedModel.get('foo', 'bar')
+            self.assertEqual(req.call_count, 9)
+
+        self.assertEqual(item_cache.stats['invalidations'], 3)
+        self.assertEqual(item_cache.stats['hits'], 2)
+
+    @pytest.mark.asyncio
+    async def test_negative_cache(self):
+        """
+        Model.get and Model.batch_get with Meta.negative_cache
+        """
+        negative_cache = NegativeCachedModel.Meta.negative_cache
+        negative_cache.clear()
+
+        with patch(PATCH_METHOD) as req:
+            req.return_value = {}
+            for _ in range(2):
+                with self.assertRaises(NegativeCachedModel.DoesNotExist):
+                    await NegativeCachedModel.get('foo', 'missing')
+            self.assertEqual(req.call_count, 1)
+
+            # consistent reads go to the table
+            with self.assertRaises(NegativeCachedModel.DoesNotExist):
+                await NegativeCachedModel.get('foo', 'missing', consistent_read=True)
+            self.assertEqual(req.call_count, 2)
+
+            # a local write invalidates the entry
+            await NegativeCachedModel('foo', 'missing').save()
+            req.return_value = {ITEM: {'user_name': {'S': 'foo'}, 'user_id': {'S': 'missing'}}}
+            self.assertEqual((await NegativeCachedModel.get('foo', 'missing')).user_id, 'missing')
+            self.assertEqual(req.call_count, 4)
+
+        async def fake_batch_get(operation_name, kwargs):
+            keys = kwargs[REQUEST_ITEMS]['NegativeCachedModel'][KEYS]
+            items = [key for key in keys if key['user_id']['S'] != 'absent']
+            return {RESPONSES: {'NegativeCachedModel': items}, UNPROCESSED_KEYS: {}}
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_batch_get)) as req:
+            items = [item async for item in NegativeCachedModel.batch_get([('foo', 'absent'), ('foo', 'present')])]
+            self.assertEqual([item.user_id for item in items], ['present'])
+
+            items = [item async for item in NegativeCachedModel.batch_get([('foo', 'absent'), ('foo', 'present')])]
+            self.assertEqual([item.user_id for item in items], ['present'])
+            keys = req.call_args[0][1][REQUEST_ITEMS]['NegativeCachedModel'][KEYS]
+            self.assertEqual(keys, [{'user_name': {'S': 'foo'}, 'user_id': {'S': 'present'}}])
+
+            # known-missing keys are not requested at all
+            items = [item async for item in NegativeCachedModel.batch_get([('foo', 'absent')])]
+            self.assertEqual(items, [])
+            self.assertEqual(req.call_count, 2)
+
+    @pytest.mark.asyncio
+    async def test_number_keys_match_returned_items(self):
+        """
+        Model.get and Model.batch_get with number keys not serialized as DynamoDB returns them
+        """
+        negative_cache = NumberKeyedModel.Meta.negative_cache
+        negative_cache.clear()
+
+        async def fake_batch_get(operation_name, kwargs):
+            request = kwargs[REQUEST_ITEMS]['NumberKeyedModel']
+            # the keys are requested even when they are not in attributes_to_get
+            if 'ProjectionExpression' in request:
+                self.assertIn('user_name', request['ExpressionAttributeNames'].values())
+                self.assertIn('user_id', request['ExpressionAttributeNames'].values())
+            items = [
+                {'user_name': key['user_name'], 'user_id': {'N': '{:g}'.format(float(key['user_id']['N']))}}
+                for key in request[KEYS]
+            ]
+            return {RESPONSES: {'NumberKeyedModel': items}, UNPROCESSED_KEYS: {}}
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_batch_get)) as req:
+            results = await asyncio.gather(NumberKeyedModel.get('foo', 1.0), NumberKeyedModel.get('foo', 1))
+            self.assertEqual([result.user_id for result in results], [1, 1])
+            # both calls are the same key
+            self.assertEqual(len(req.call_args[0][1][REQUEST_ITEMS]['NumberKeyedModel'][KEYS]), 1)
+
+            items = [
+                item async for item in NumberKeyedModel.batch_get([('foo', 2.0)], attributes_to_get=['email'])
+            ]
+            self.assertEqual([item.user_id for item in items], [2])
+            self.assertEqual(len(negative_cache), 0)
+
+    @pytest.mark.asyncio
+    async def test_query_cache(self):
+        """
+        Model.query and Index.query with Meta.query_cache
+        """
+        query_cache = QueryCachedModel.Meta.query_cache
+        query_cache.clear()
+
+        async def fake_query(operation_name, kwargs):
+            if operation_name != 'Query':
+                return {}
+            hash_key = kwargs['ExpressionAttributeValues'][':0']['S']
+            item = {'user_name': {'S': 'foo'}, 'user_id': {'S': '1'}, 'email': {'S': hash_key}}
+            return {CAMEL_COUNT: 1, SCANNED_COUNT: 1, ITEMS: [item]}
+
+        async def query(*args, **kwargs):
+            return [item async for item in await QueryCachedModel.query(*args, **kwargs)]
+
+        async def query_index(*args, **kwargs):
+            return [item async for item in await QueryCachedModel.email_index.query(*args, **kwargs)]
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_query)) as req:
+            self.assertEqual(len(await query('foo')), 1)
+            self.assertEqual(len(await query('foo')), 1)
+            self.assertEqual(req.call_count, 1)
+
+            # the conditions, page size and projection are part of the key
+            await query('foo', QueryCachedModel.user_id.startswith('1'))
+            await query('foo', QueryCachedModel.user_id.startswith('2'))
+            await query('foo', filter_condition=QueryCachedModel.email == 'x')
+            await query('foo', page_size=1)
+            await query('foo', attributes_to_get=['user_id'])
+            self.assertEqual(req.call_count, 6)
+            await query('foo', QueryCachedModel.user_id.startswith('2'))
+            self.assertEqual(req.call_count, 6)
+
+            # consistent reads go to the table
+            await query('foo', consistent_read=True)
+            self.assertEqual(req.call_count, 7)
+
+            self.assertEqual((await query_index('x@example.com'))[0].email, 'x@example.com')
+            await query_index('x@example.com')
+            await query('bar')
+            self.assertEqual(req.call_count, 9)
+
+            # a local write forgets the pages of its table and index hash keys
+            await QueryCachedModel('foo', '1', email='x@example.com').save()
+            self.assertEqual(req.call_count, 10)
+            await query('foo')
+            await query_index('x@example.com')
+            await query('bar')
+            self.assertEqual(req.call_count, 12)
+
+            # raw items changed by the consumer are not changed in the cache
+            item = (await query('foo', raw=True))[0]
+            item['email']['S'] = 'changed'
+            self.assertEqual((await query('foo', raw=True))[0]['email'], {'S': 'foo'})
+            self.assertEqual(req.call_count, 12)
+
+        self.assertEqual(query_cache.stats['invalidations'], 7)
+
+    @pytest.mark.asyncio
+    async def test_batch_get_unprocessed_exhausted(self):
+        await self.init_table_meta(UserModel, MODEL_TABLE_DATA)
+        retry_policy = UnprocessedRetryPolicy(max_attempts=2, base_backoff_ms=0)
+
+        async def fake_batch_get(operation_name, kwargs):
+            keys = kwargs[REQUEST_ITEMS][UserModel.Meta.table_name][KEYS]
+            return {
+                UNPROCESSED_KEYS: {UserModel.Meta.table_name: {KEYS: keys[1:]}},
+                RESPONSES: {UserModel.Meta.table_name: keys[:1]},
+            }
+
+        with patch(PATCH_METHOD, new=CoroutineMock(side_effect=fake_batch_get)) as req, \
+                patch.object(UserModel.Meta, 'unprocessed_retry_policy', retry_policy, create=True):
+            item_keys = [('hash-{}'.format(x), '{}'.format(x)) for x in range(5)]
+            items = []
+            with self.assertRaises(UnprocessedKeysError) as context:
+                async for item in UserModel.batch_get(item_keys):
+                    items.append(item)
+
+            self.assertEqual(len(req.mock_calls), 2)
+            self.assertEqual(len(items), 2)
+            self.assertEqual(len(context.exception.unprocessed_keys), 3)
+            self.assertEqual(retry_policy.stats[BATCH_GET_ITEM]['exhausted'], 1)
+
     @pytest.mark.asyncio
     async def test_index_queries(self):
         """
@@ -1,13 +1,17 @@
+import asyncio
+import gc
+
 import pytest
 
-from inpynamodb.pagination import RateLimiter
+from inpynamodb.pagination import RateLimiter, READ, WRITE, set_table_rate_limit, get_table_rate_limiter, \
+    PageIterator, ResultIterator, ParallelScanIterator
 
 
 class MockTime:
     def __init__(self):
         self.current_time = 0.0
 
-    def sleep(self, amount):
+    async def sleep(self, amount):
         self.current_time += amount
 
     def time(self):
@@ -33,13 +37,14 @@ def test_rate_limiter_exceptions():
         r.rate_limit = -1
 
 
-def test_basic_rate_limiting():
+@pytest.mark.asyncio
+async def test_basic_rate_limiting():
     mock_time = MockTime()
     r = RateLimiter(0.1, mock_time)
 
     # 100 operations
     for i in range(0, 100):
-        r.acquire()
+        await r.acquire()
         # Simulates an operation that takes 1 second
         mock_time.increment_time(1)
         r.consume(1)
@@ -49,13 +54,14 @@ def test_basic_rate_limiting():
     assert mock_time.time() == 991.0
 
 
-def test_basic_rate_limiting_small_increment():
+@pytest.mark.asyncio
+async def test_basic_rate_limiting_small_increment():
     mock_time = MockTime()
     r = RateLimiter(0.1, mock_time)
 
     # 100 operations
     for i in range(0, 100):
-        r.acquire()
+        await r.acquire()
         # Simulates an operation that takes 2 second
         mock_time.increment_time(2)
         r.consume(1)
@@ -65,16 +71,353 @@ def test_basic_rate_limiting_small_increment():
     assert mock_time.time() == 992.0
 
 
-def test_basic_rate_limiting_large_increment():
+@pytest.mark.asyncio
+async def test_basic_rate_limiting_large_increment():
     mock_time = MockTime()
     r = RateLimiter(0.1, mock_time)
 
     # 100 operations
     for i in range(0, 100):
-        r.acquire()
+        await r.acquire()
         # Simulates an operation that takes 2 second
         mock_time.increment_time(11)
         r.consume(1)
 
     # The operation takes longer than the minimum wait, so rate limiting should have no effect
     assert mock_time.time() == 1100.0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiting_burst():
+    mock_time = MockTime()
+    r = RateLimiter(1, mock_time, burst=5)
+
+    # an idle period fills the bucket up to the burst
+    await r.acquire()
+    mock_time.increment_time(100)
+    for i in range(0, 6):
+        await r.acquire()
+        r.consume(1)
+    assert mock_time.time() == 100.0
+
+    await r.acquire()
+    assert mock_time.time() == 101.0
+
+
+@pytest.mark.asyncio
+async def test_shared_rate_limiting():
+    mock_time = MockTime()
+    r = RateLimiter(10, mock_time)
+
+    async def operation():
+        for i in range(0, 10):
+            await r.acquire()
+            r.consume(5)
+
+    # 4 concurrent operations consuming 200 units in total
+    await asyncio.gather(*[operation() for _ in range(0, 4)])
+    assert mock_time.time() >= 19.0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiting_waiters_pass_one_at_a_time():
+    mock_time = MockTime()
+    r = RateLimiter(10, mock_time)
+    r.consume(10)
+    passed_at = []
+
+    async def operation():
+        await r.acquire()
+        passed_at.append(mock_time.time())
+
+    # the waiters don't all pass as soon as the bucket is paid back, before any of them consumed
+    await asyncio.gather(*[operation() for _ in range(0, 3)])
+    assert passed_at == pytest.approx([1.0, 1.1, 1.2])
+
+    for _ in range(0, 3):
+        r.consume(2)
+    # each consume charges the units above the one its acquire reserved
+    assert r._tokens == pytest.approx(-4.0)
+
+
+def test_table_rate_limiters():
+    try:
+        assert get_table_rate_limiter('table', READ) is None
+        rate_limiter = set_table_rate_limit('table', READ, 10)
+        assert get_table_rate_limiter('table', READ) is rate_limiter
+        assert get_table_rate_limiter('table', WRITE) is None
+        assert get_table_rate_limiter('other_table', READ) is None
+
+        assert set_table_rate_limit('table', READ, 20) is rate_limiter
+        assert rate_limiter.rate_limit == 20
+
+        with pytest.raises(ValueError):
+            set_table_rate_limit('table', 'scan', 10)
+    finally:
+        set_table_rate_limit('table', READ, None)
+    assert get_table_rate_limiter('table', READ) is None
+
+
+class MockOperation:
+    """
+    Returns `num_pages` pages of `page_size` items, recording when each page was requested
+    """
+    def __init__(self, num_pages, page_size=2, fail_on_page=None):
+        self.num_pages = num_pages
+        self.page_size = page_size
+        self.fail_on_page = fail_on_page
+        self.requested = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, **kwargs):
+        start = kwargs['exclusive_start_key'] or 0
+        self.requested.append(start)
+        await self.release.wait()
+        if start == self.fail_on_page:
+            raise ValueError("page {} failed".format(start))
+        page = {
+            'Count': self.page_size,
+            'ScannedCount': self.page_size,
+            'Items': [{'n': start * self.page_size + i} for i in range(self.page_size)],
+        }
+        if start + 1 < self.num_pages:
+            page['LastEvaluatedKey'] = start + 1
+        return page
+
+
+@pytest.mark.asyncio
+async def test_prefetch_pages():
+    operation = MockOperation(5)
+    page_iter = PageIterator(operation, (), {}, prefetch=2)
+
+    page = await page_iter.__anext__()
+    assert page['Items'] == [{'n': 0}, {'n': 1}]
+    assert page_iter.last_evaluated_key == 1
+    await asyncio.sleep(0.01)
+    # the first page was handed out, so two more pages are requested ahead
+    assert operation.requested == [0, 1, 2]
+
+    pages = [page] + [page async for page in page_iter]
+    assert [p['Items'][0]['n'] for p in pages] == [0, 2, 4, 6, 8]
+    assert operation.requested == [0, 1, 2, 3, 4]
+    assert page_iter.last_evaluated_key is None
+    assert page_iter.total_scanned_count == 10
+
+    # the exhausted iterator keeps raising StopAsyncIteration
+    for _ in range(2):
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(page_iter.__anext__(), 1)
+    assert operation.requested == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_bounded():
+    operation = MockOperation(10)
+    page_iter = PageIterator(operation, (), {}, prefetch=3)
+
+    await page_iter.__anext__()
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert operation.requested == [0, 1, 2, 3]
+    await page_iter.aclose()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_limit():
+    operation = MockOperation(10)
+    results = ResultIterator(operation, (), {}, limit=3, prefetch=4)
+
+    items = [item async for item in results]
+    assert items == [{'n': 0}, {'n': 1}, {'n': 2}]
+    # the second page holds the third item; nothing is requested past it
+    assert operation.requested == [0, 1]
+    assert results.page_iter.last_evaluated_key == 2
+
+
+@pytest.mark.asyncio
+async def test_prefetch_error():
+    operation = MockOperation(5, fail_on_page=2)
+    page_iter = PageIterator(operation, (), {}, prefetch=2)
+
+    await page_iter.__anext__()
+    await page_iter.__anext__()
+    with pytest.raises(ValueError):
+        await page_iter.__anext__()
+    # the error is raised again rather than waiting for a page which never comes
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(page_iter.__anext__(), 1)
+    assert operation.requested == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_pages_after_exhaustion():
+    operation = MockOperation(3)
+    results = ResultIterator(operation, (), {}, prefetch=2)
+
+    assert len([item async for item in results]) == 6
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(results.__anext__(), 1)
+    assert await asyncio.wait_for(_collect(results.pages()), 1) == []
+
+
+async def _collect(pages):
+    return [page async for page in pages]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_rate_limit():
+    mock_time = MockTime()
+    rate_limiter = RateLimiter(10, mock_time)
+    operation = MockOperation(3)
+
+    async def operation_with_capacity(**kwargs):
+        page = await operation(**kwargs)
+        page['ConsumedCapacity'] = {'CapacityUnits': 10}
+        return page
+
+    page_iter = PageIterator(operation_with_capacity, (), {}, rate_limit=rate_limiter, prefetch=2)
+    pages = [page async for page in page_iter]
+    assert len(pages) == 3
+    # the second and third pages waited a second each for the consumed capacity to be paid back
+    assert mock_time.time() == 2.0
+
+
+@pytest.mark.asyncio
+async def test_prefetch_aclose():
+    operation = MockOperation(5)
+    page_iter = PageIterator(operation, (), {}, prefetch=2)
+
+    await page_iter.__anext__()
+    operation.release.clear()
+    await asyncio.sleep(0)
+    task = page_iter._prefetch_task
+    assert not task.done()
+
+    await page_iter.aclose()
+    assert task.cancelled()
+
+
+def test_prefetch_invalid(capsys):
+    with pytest.raises(ValueError):
+        PageIterator(MockOperation(1), (), {}, prefetch=-1)
+    gc.collect()
+    # the iterator which failed to initialize is deleted quietly
+    assert 'Exception ignored' not in capsys.readouterr().err
+
+
+class MockSegmentedScan:
+    """
+    Returns `num_pages` pages of two items for every segment, recording the requests in flight
+    """
+    def __init__(self, num_pages, fail_on_segment=None):
+        self.num_pages = num_pages
+        self.fail_on_segment = fail_on_segment
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, segment, total_segments, exclusive_start_key, **kwargs):
+        start = exclusive_start_key['page'] if exclusive_start_key else 0
+        self.requested.append((segment, start))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+        finally:
+            self.in_flight -= 1
+        if segment == self.fail_on_segment:
+            raise ValueError("segment {} failed".format(segment))
+        page = {
+            'Count': 2,
+            'ScannedCount': 2,
+            'Items': [{'id': '{}-{}'.format(segment, start * 2 + i), 'page': start} for i in range(2)],
+        }
+        if start + 1 < self.num_pages:
+            page['LastEvaluatedKey'] = {'page': start + 1}
+        return page
+
+
+@pytest.mark.asyncio
+async def test_parallel_scan():
+    operation = MockSegmentedScan(3)
+    results = ParallelScanIterator(operation, (), {}, total_segments=4, concurrency=2)
+
+    items = [item['id'] async for item in results]
+    assert sorted(items) == sorted('{}-{}'.format(segment, i) for segment in range(4) for i in range(6))
+    assert len(operation.requested) == 12
+    assert operation.max_in_flight == 2
+    assert results.total_count == 24
+    assert await results.last_evaluated_keys == {}
+
+
+@pytest.mark.asyncio
+async def test_parallel_scan_backpressure():
+    operation = MockSegmentedScan(10)
+    results = ParallelScanIterator(operation, (), {}, total_segments=2, max_buffered_pages=1)
+
+    await results.__anext__()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    # one page being consumed, one buffered and one blocked on the buffer per segment
+    assert len(operation.requested) <= 4
+    await results.aclose()
+    assert all(task.done() for task in results._tasks)
+
+
+@pytest.mark.asyncio
+async def test_parallel_scan_resume():
+    operation = MockSegmentedScan(3)
+    results = ParallelScanIterator(operation, (), {}, total_segments=3, concurrency=1, limit=3)
+
+    items = [item['id'] async for item in results]
+    assert items == ['0-0', '0-1', '0-2']
+    # segment 0 stopped in the middle of its second page, the other segments did not start
+    assert await results.last_evaluated_keys == {0: {'page': 1}, 1: None, 2: None}
+
+    operation = MockSegmentedScan(2)
+    results = ParallelScanIterator(operation, (), {}, total_segments=3, last_evaluated_keys={0: {'page': 1}, 2: None})
+    items = [item['id'] async for item in results]
+    assert sorted(items) == ['0-2', '0-3', '2-0', '2-1', '2-2', '2-3']
+    assert sorted(operation.requested) == [(0, 1), (2, 0), (2, 1)]
+
+
+def test_parallel_scan_invalid(capsys):
+    operation = MockSegmentedScan(1)
+    with pytest.raises(ValueError):
+        ParallelScanIterator(operation, (), {}, total_segments=0)
+    with pytest.raises(ValueError):
+        ParallelScanIterator(operation, (), {}, total_segments=3, concurrency=0)
+    with pytest.raises(ValueError):
+        ParallelScanIterator(operation, (), {}, total_segments=3, last_evaluated_keys={3: None})
+    gc.collect()
+    # the iterators which failed to initialize are deleted quietly
+    assert 'Exception ignored' not in capsys.readouterr().err
+
+
+@pytest.mark.asyncio
+async def test_parallel_scan_error():
+    operation = MockSegmentedScan(10, fail_on_segment=1)
+    results = ParallelScanIterator(operation, (), {}, total_segments=3)
+
+    with pytest.raises(ValueError):
+        async for _ in results:
+            pass
+    assert all(task.done() for task in results._tasks)
+
+
+@pytest.mark.asyncio
+async def test_parallel_scan_rate_limit():
+    mock_time = MockTime()
+    operation = MockSegmentedScan(2)
+
+    async def operation_with_capacity(**kwargs):
+        page = await operation(**kwargs)
+        page['ConsumedCapacity'] = {'CapacityUnits': 10}
+        return page
+
+    results = ParallelScanIterator(operation_with_capacity, (), {}, total_segments=2,
+                                   rate_limit=RateLimiter(10, mock_time))
+    assert len([item async for item in results]) == 8
+    # the segments share the limit: the second pages wait for 20 units to be paid back
+    assert mock_time.time() >= 2.0
@@ -0,0 +1,113 @@
+"""
+Test profiling of the request phases
+"""
+import time
+
+import pytest
+from asynctest import TestCase, CoroutineMock
+from asynctest.mock import patch
+from pynamodb.attributes import UnicodeAttribute
+from pynamodb.connection.base import MetaTable
+
+from inpynamodb.connection import client_registry
+from inpynamodb.connection.base import AsyncConnection
+from inpynamodb.models import Model
+from inpynamodb.profiling import Profiler, PHASES, BUILD_KWARGS, SERIALIZE_EXPRESSIONS, DISPATCH, \
+    SERIALIZE_REQUEST, SIGN_REQUEST, HTTP, PARSE_RESPONSE, DESERIALIZE, is_profiling
+from tests.data import DESCRIBE_TABLE_DATA
+
+PATCH_METHOD = 'aiobotocore.client.AioBaseClient._make_api_call'
+
+
+class ProfiledModel(Model):
+    class Meta:
+        table_name = 'ProfiledModel'
+        local_meta_table = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = UnicodeAttribute(range_key=True)
+    email = UnicodeAttribute(null=True)
+
+
+class MockClock(object):
+    """
+    A perf_counter which advances one second per call
+    """
+    def __init__(self):
+        self.current_time = 0
+
+    def __call__(self):
+        self.current_time += 1
+        return self.current_time
+
+
+class MockHTTPResponse(object):
+    status_code = 200
+    raw_headers = [(b'content-type', b'application/x-amz-json-1.0')]
+    headers = {}
+
+    def __init__(self, body):
+        self._body = body
+
+    async def read(self):
+        return self._body
+
+
+class ProfilerTestCase(TestCase):
+
+    def test_profiler_context(self):
+        self.assertFalse(is_profiling())
+        with Profiler() as profiler:
+            self.assertTrue(is_profiling())
+        self.assertFalse(is_profiling())
+        self.assertEqual(profiler.snapshot(), [])
+
+    def test_report(self):
+        profiler = Profiler()
+        profiler.record('Thread', 'Query', {HTTP: 0.002})
+        lines = profiler.report().split('\n')
+        self.assertEqual(lines[0].split('\t'), ['table', 'operation', 'calls'] + list(PHASES))
+        self.assertEqual(lines[1].split('\t')[:3], ['Thread', 'Query', '1'])
+        self.assertEqual(lines[1].split('\t')[3 + PHASES.index(HTTP)], '2.000')
+
+    @pytest.mark.asyncio
+    async def test_query_phases(self):
+        items = [{'user_name': {'S': 'foo'}, 'user_id': {'S': str(i)}} for i in range(2)]
+
+        with patch(PATCH_METHOD) as req, patch.object(time, 'perf_counter', new=MockClock()):
+            req.return_value = {'Count': 2, 'ScannedCount': 2, 'Items': items}
+            with Profiler() as profiler:
+                results = [
+                    item async for item in await ProfiledModel.query('foo', filter_condition=ProfiledModel.email == 'x')
+                ]
+            self.assertEqual(len(results), 2)
+
+            # not recorded once the profiler is inactive
+            await ProfiledModel.query('foo')
+
+        entry, = profiler.snapshot()
+        self.assertEqual((entry['table'], entry['operation'], entry['calls']), ('ProfiledModel', 'Query', 1))
+        phases = entry['phases']
+        for phase in [BUILD_KWARGS, SERIALIZE_EXPRESSIONS, DISPATCH, DESERIALIZE]:
+            self.assertGreater(phases[phase], 0, phase)
+        self.assertEqual(phases[DESERIALIZE], 2)
+
+    @pytest.mark.asyncio
+    async def test_botocore_phases(self):
+        conn = AsyncConnection(region='us-east-1', aws_access_key_id='a', aws_secret_access_key='b')
+        conn.add_meta_table('Thread', MetaTable(DESCRIBE_TABLE_DATA['Table']))
+        response = MockHTTPResponse(b'{"Item": {"ForumName": {"S": "foo"}}}')
+
+        with patch('aiobotocore.endpoint.AioEndpoint._request', new=CoroutineMock(return_value=response)), \
+                patch.object(time, 'perf_counter', new=MockClock()):
+            try:
+                with Profiler() as profiler:
+                    data = await conn.get_item('Thread', 'foo', 'bar')
+            finally:
+                await client_registry.close()
+            self.assertEqual(data['Item'], {'ForumName': {'S': 'foo'}})
+
+        entry, = profiler.snapshot()
+        self.assertEqual((entry['table'], entry['operation']), ('Thread', 'GetItem'))
+        for phase in [BUILD_KWARGS, DISPATCH, SERIALIZE_REQUEST, SIGN_REQUEST, HTTP, PARSE_RESPONSE]:
+            self.assertGreater(entry['phases'][phase], 0, phase)
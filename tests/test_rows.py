@@ -0,0 +1,108 @@
+"""
+Test the read-only rows generated per Model class
+"""
+import pickle
+from typing import Optional
+
+import pytest
+from asynctest import TestCase
+from asynctest.mock import patch
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute, UTCDateTimeAttribute, \
+    MapAttribute, ListAttribute
+
+from inpynamodb.models import Model
+from inpynamodb.rows import Row, get_row_class
+
+PATCH_METHOD = 'aiobotocore.client.AioBaseClient._make_api_call'
+
+
+class Location(MapAttribute):
+    lat = NumberAttribute()
+    lng = NumberAttribute()
+
+
+class RowModel(Model):
+    class Meta:
+        table_name = 'RowModel'
+        local_meta_table = True
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = NumberAttribute(range_key=True)
+    email = UnicodeAttribute(attr_name='e', null=True)
+    visits = NumberAttribute(default=0)
+    active = BooleanAttribute(null=True)
+    created_at = UTCDateTimeAttribute(null=True)
+    location = Location(null=True)
+    history = ListAttribute(null=True)
+
+
+ITEMS = [
+    {
+        'user_name': {'S': 'foo'},
+        'user_id': {'N': '1'},
+        'e': {'S': 'foo@example.com'},
+        'active': {'BOOL': True},
+        'created_at': {'S': '2020-01-02T03:04:05.000000+0000'},
+        'location': {'M': {'lat': {'N': '1.5'}, 'lng': {'N': '2'}}},
+        'history': {'L': [{'S': 'login'}]},
+    },
+    {
+        'user_name': {'S': 'foo'},
+        'user_id': {'N': '2'},
+        'visits': {'N': '3'},
+    },
+]
+
+
+class RowTestCase(TestCase):
+
+    def test_row_class(self):
+        row_class = get_row_class(RowModel)
+        self.assertIs(get_row_class(RowModel), row_class)
+        self.assertTrue(issubclass(row_class, Row))
+        self.assertEqual(row_class.__name__, 'RowModelRow')
+        self.assertEqual(row_class.__slots__, tuple(RowModel.get_attributes()))
+        self.assertEqual(row_class.__annotations__['user_name'], str)
+        self.assertEqual(row_class.__annotations__['email'], Optional[str])
+        self.assertEqual(row_class.__annotations__['location'], Optional[Location])
+
+    def test_rows(self):
+        row_class = get_row_class(RowModel)
+        for item in ITEMS:
+            row = row_class.from_raw_data(item)
+            self.assertFalse(hasattr(row, '__dict__'))
+            model = row.to_model()
+            self.assertIsInstance(model, RowModel)
+            self.assertEqual(model._serialize(), RowModel.from_raw_data(item)._serialize())
+            self.assertEqual(pickle.loads(pickle.dumps(row)).to_model()._serialize(), model._serialize())
+
+        row = row_class.from_raw_data(ITEMS[1])
+        self.assertEqual((row.user_name, row.user_id, row.visits, row.email), ('foo', 2, 3, None))
+        self.assertEqual(row.to_dict(), {'user_name': 'foo', 'user_id': 2, 'visits': 3})
+        self.assertEqual(row_class.from_raw_data(ITEMS[0]).visits, 0)
+        self.assertEqual(row_class.from_raw_data(ITEMS[0]).location.lat, 1.5)
+        self.assertNotEqual(row, row_class.from_raw_data(ITEMS[0]))
+        self.assertEqual(row, row_class.from_raw_data(ITEMS[1]))
+        self.assertIn("user_name='foo'", repr(row))
+
+        with self.assertRaises(AttributeError):
+            row.visits = 4
+        with self.assertRaises(AttributeError):
+            del row.visits
+        with self.assertRaises(AttributeError):
+            row.other = 1
+
+    @pytest.mark.asyncio
+    async def test_scan_and_query_as_rows(self):
+        with patch(PATCH_METHOD) as req:
+            req.return_value = {'Count': 2, 'ScannedCount': 2, 'Items': ITEMS}
+            rows = [row async for row in await RowModel.scan(as_rows=True)]
+            self.assertEqual([row.user_id for row in rows], [1, 2])
+            self.assertTrue(all(isinstance(row, get_row_class(RowModel)) for row in rows))
+
+            pages = [page async for page in (await RowModel.query('foo', as_rows=True)).pages()]
+            self.assertEqual([[row.user_id for row in page] for page in pages], [[1, 2]])
+            self.assertEqual(pages[0][1], rows[1])
+
+        with self.assertRaises(ValueError):
+            await RowModel.scan(raw=True, as_rows=True)
@@ -0,0 +1,113 @@
+"""
+Test the serialize and deserialize functions generated per Model class
+"""
+from datetime import datetime
+
+from asynctest import TestCase
+from dateutil.tz import tzutc
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute, BinaryAttribute, \
+    UTCDateTimeAttribute, UnicodeSetAttribute, JSONAttribute, MapAttribute, ListAttribute, VersionAttribute
+from pynamodb.models import Model as PynamoDBModel
+
+from inpynamodb.models import Model
+from inpynamodb.serializers import ModelSerializer, get_serializer
+
+
+class Location(MapAttribute):
+    lat = NumberAttribute()
+    lng = NumberAttribute(null=True)
+
+
+class SerializedModel(Model):
+    class Meta:
+        table_name = 'SerializedModel'
+
+    user_name = UnicodeAttribute(hash_key=True)
+    user_id = NumberAttribute(range_key=True)
+    email = UnicodeAttribute(attr_name='e', null=True)
+    visits = NumberAttribute(default=0)
+    active = BooleanAttribute(default=lambda: True)
+    picture = BinaryAttribute(null=True)
+    created_at = UTCDateTimeAttribute(null=True)
+    tags = UnicodeSetAttribute(null=True)
+    settings = JSONAttribute(null=True)
+    location = Location(null=True)
+    history = ListAttribute(null=True)
+    version = VersionAttribute()
+
+
+class CustomInitModel(Model):
+    class Meta:
+        table_name = 'CustomInitModel'
+
+    user_name = UnicodeAttribute(hash_key=True)
+    visits = NumberAttribute(default=0)
+    location = Location(null=True)
+
+    def __init__(self, *args, **kwargs):
+        super(CustomInitModel, self).__init__(*args, **kwargs)
+        self.initialized = True
+
+
+ITEM = {
+    'user_name': {'S': 'foo'},
+    'user_id': {'N': '1'},
+    'e': {'S': 'foo@example.com'},
+    'active': {'BOOL': False},
+    'picture': {'B': 'AAE='},
+    'created_at': {'S': '2020-01-02T03:04:05.000000+0000'},
+    'tags': {'SS': ['a', 'b']},
+    'settings': {'S': '{"theme": "dark"}'},
+    'location': {'M': {'lat': {'N': '1.5'}}},
+    'history': {'L': [{'S': 'login'}, {'N': '2'}]},
+    'version': {'N': '3'},
+    'unknown': {'S': 'ignored'},
+}
+
+
+class ModelSerializerTestCase(TestCase):
+
+    def test_cached_per_class(self):
+        serializer = get_serializer(SerializedModel)
+        self.assertIsInstance(serializer, ModelSerializer)
+        self.assertIs(get_serializer(SerializedModel), serializer)
+        self.assertIsNot(get_serializer(CustomInitModel), serializer)
+
+    def test_deserialize(self):
+        for model in (SerializedModel, CustomInitModel):
+            item = model.from_raw_data(ITEM)
+            expected = PynamoDBModel.from_raw_data.__func__(model, ITEM)
+            self.assertEqual(item._serialize(), expected._serialize())
+            self.assertIsInstance(item.location, Location)
+            self.assertEqual(item.location.lat, 1.5)
+            self.assertEqual(item.visits, 0)
+
+        item = SerializedModel.from_raw_data(ITEM)
+        self.assertEqual(item.created_at, datetime(2020, 1, 2, 3, 4, 5, tzinfo=tzutc()))
+        self.assertIs(item.active, False)
+        self.assertEqual(item.version, 3)
+        self.assertTrue(CustomInitModel.from_raw_data(ITEM).initialized)
+
+        item = SerializedModel.from_raw_data({'user_name': {'S': 'foo'}, 'user_id': {'N': '2'}})
+        self.assertEqual(item.attribute_values, {'user_name': 'foo', 'user_id': 2, 'visits': 0, 'active': True})
+
+    def test_serialize(self):
+        item = SerializedModel.from_raw_data(ITEM)
+        for attr_map in (False, True):
+            for null_check in (False, True):
+                self.assertEqual(
+                    item._serialize(attr_map=attr_map, null_check=null_check),
+                    PynamoDBModel._serialize(item, attr_map=attr_map, null_check=null_check)
+                )
+
+        item = SerializedModel('foo', 1, email='', location=Location(lat=1))
+        self.assertEqual(item._serialize(null_check=False), PynamoDBModel._serialize(item, null_check=False))
+        self.assertNotIn('e', item._serialize(attr_map=True, null_check=False)['attributes'])
+        item.visits = None
+        with self.assertRaisesRegex(ValueError, "Attribute 'visits' cannot be None"):
+            item._serialize()
+        self.assertEqual(item._serialize(null_check=False), PynamoDBModel._serialize(item, null_check=False))
+
+        item.location = Location()
+        with self.assertRaisesRegex(ValueError, "Attribute 'lat' cannot be None"):
+            item._serialize(null_check=False)